@@ -9,13 +9,19 @@ class WetPropulsor(pyc.Cycle):
 
         design = self.options['design']
 
-        # NOTE: DEFAULT TABULAR thermo doesn't include WAR, so must use CEA here
-        # (or build your own thermo tables)
-        self.options['thermo_method'] = 'CEA'
-        self.options['thermo_data'] = pyc.species_data.wet_air
-
-        self.add_subsystem('fc', pyc.FlightConditions(composition=pyc.CEA_AIR_COMPOSITION, 
-                                                      reactant='Water',
+        if self.options['thermo_method'] == 'TABULAR': 
+            # the default TABULAR thermo doesn't include WAR, so the thermo_data must be 
+            # a table with a FAR and a WAR axis (e.g. pyc.load_wet_tab_spec())
+            COMPOSITION = pyc.TAB_WET_AIR_FUEL_COMPOSITION
+            REACTANT = 'WAR'
+        else: 
+            self.options['thermo_method'] = 'CEA'
+            self.options['thermo_data'] = pyc.species_data.wet_air
+            COMPOSITION = pyc.CEA_AIR_COMPOSITION
+            REACTANT = 'Water'
+
+        self.add_subsystem('fc', pyc.FlightConditions(composition=COMPOSITION, 
+                                                      reactant=REACTANT,
                                                       mix_ratio_name='WAR'))
 
         self.add_subsystem('inlet', pyc.Inlet())
@@ -99,9 +105,22 @@ def viewer(prob, pt):
 
 class MPWetPropulsor(pyc.MPCycle):
 
+    def initialize(self):
+        self.options.declare('thermo_method', default='CEA', values=('CEA', 'TABULAR'),
+                              desc='Method for computing thermodynamic properties of the points')
+        self.options.declare('thermo_data', default=None, allow_none=True, recordable=False,
+                              desc='tabular thermo data with a FAR and a WAR axis for the TABULAR thermo '
+                                   '(default: pyc.load_wet_tab_spec())')
+        super().initialize()
+
     def setup(self):
 
-        design = self.pyc_add_pnt('design', WetPropulsor(design=True, thermo_method='CEA'))
+        thermo = {'thermo_method': self.options['thermo_method']}
+        if thermo['thermo_method'] == 'TABULAR': 
+            thermo_data = self.options['thermo_data']
+            thermo['thermo_data'] = pyc.load_wet_tab_spec() if thermo_data is None else thermo_data
+
+        design = self.pyc_add_pnt('design', WetPropulsor(design=True, **thermo))
 
         self.set_input_defaults('design.fc.alt', 10000., units="m")
         self.set_input_defaults('design.fc.MN', .72)
@@ -116,7 +135,7 @@ class MPWetPropulsor(pyc.MPCycle):
         self.od_WARs = [.001,]
 
         for i, pt in enumerate(self.od_pts):
-            self.pyc_add_pnt('off_design', WetPropulsor(design=False, thermo_method='CEA'))
+            self.pyc_add_pnt('off_design', WetPropulsor(design=False, **thermo))
 
             self.set_input_defaults(pt+'.fc.alt', self.od_alts[i], units='m')
             self.set_input_defaults(pt+'.fc.MN', self.od_MNs[i])
@@ -129,6 +148,7 @@ class MPWetPropulsor(pyc.MPCycle):
         super().setup()
 
 if __name__ == "__main__":
+    import argparse
     import time
 
     import numpy as np
@@ -137,8 +157,13 @@ if __name__ == "__main__":
     from openmdao.api import Problem
     from openmdao.utils.units import convert_units as cu
 
+    parser = argparse.ArgumentParser(description='Runs the wet propulsor.')
+    parser.add_argument('--tabular', action='store_true',
+                        help='use the tabular wet air thermo, generating the table the first time')
+    args = parser.parse_args()
+
     prob = om.Problem()
-    prob.model = mp_wet_propulsor = MPWetPropulsor()
+    prob.model = mp_wet_propulsor = MPWetPropulsor(thermo_method='TABULAR' if args.tabular else 'CEA')
 
     prob.setup()
 
@@ -11,22 +11,29 @@ class WetTurbojet(pyc.Cycle):
 
         design = self.options['design']
 
-        # NOTE: DEFAULT TABULAR thermo doesn't include WAR, so must use CEA here
-        # (or build your own thermo tables)
-
-        self.options['thermo_method'] = 'CEA'
-        self.options['thermo_data'] = pyc.species_data.wet_air
+        if self.options['thermo_method'] == 'TABULAR': 
+            # the default TABULAR thermo doesn't include WAR, so the thermo_data must be 
+            # a table with a FAR and a WAR axis (e.g. pyc.load_wet_tab_spec())
+            COMPOSITION = pyc.TAB_WET_AIR_FUEL_COMPOSITION
+            REACTANT = 'WAR'
+            FUEL_TYPE = 'FAR'
+        else: 
+            self.options['thermo_method'] = 'CEA'
+            self.options['thermo_data'] = pyc.species_data.wet_air
+            COMPOSITION = pyc.CEA_AIR_COMPOSITION
+            REACTANT = 'Water'
+            FUEL_TYPE = 'JP-7'
 
         # Add engine elements
-        self.add_subsystem('fc', pyc.FlightConditions(composition=pyc.CEA_AIR_COMPOSITION, 
-                                                      reactant='Water',
+        self.add_subsystem('fc', pyc.FlightConditions(composition=COMPOSITION, 
+                                                      reactant=REACTANT,
                                                       mix_ratio_name='WAR')) 
 
         self.add_subsystem('inlet', pyc.Inlet())
         self.add_subsystem('comp', pyc.Compressor(map_data=pyc.AXI5),
                                     promotes_inputs=['Nmech'])
 
-        self.add_subsystem('burner', pyc.Combustor(fuel_type='JP-7'))
+        self.add_subsystem('burner', pyc.Combustor(fuel_type=FUEL_TYPE))
         self.add_subsystem('turb', pyc.Turbine(map_data=pyc.LPT2269),
                                     promotes_inputs=['Nmech'])
         self.add_subsystem('nozz', pyc.Nozzle(nozzType='CD', lossCoef='Cv'))
@@ -150,10 +157,23 @@ def viewer(prob, pt, file=sys.stdout):
 
 class MPWetTurbojet(pyc.MPCycle):
 
+    def initialize(self):
+        self.options.declare('thermo_method', default='CEA', values=('CEA', 'TABULAR'),
+                              desc='Method for computing thermodynamic properties of the points')
+        self.options.declare('thermo_data', default=None, allow_none=True, recordable=False,
+                              desc='tabular thermo data with a FAR and a WAR axis for the TABULAR thermo '
+                                   '(default: pyc.load_wet_tab_spec())')
+        super().initialize()
+
     def setup(self):
 
+        thermo = {'thermo_method': self.options['thermo_method']}
+        if thermo['thermo_method'] == 'TABULAR': 
+            thermo_data = self.options['thermo_data']
+            thermo['thermo_data'] = pyc.load_wet_tab_spec() if thermo_data is None else thermo_data
+
         # Create design instance of model
-        self.pyc_add_pnt('DESIGN', WetTurbojet(thermo_method='CEA'))
+        self.pyc_add_pnt('DESIGN', WetTurbojet(**thermo))
 
         self.set_input_defaults('DESIGN.fc.alt', 0.0, units='ft'),
         self.set_input_defaults('DESIGN.fc.MN', 0.000001),
@@ -175,7 +195,7 @@ class MPWetTurbojet(pyc.MPCycle):
         self.od_pwrs = [11000.0,]
 
         for i, pt in enumerate(self.od_pts):
-            self.pyc_add_pnt(pt, WetTurbojet(design=False, thermo_method='CEA'))
+            self.pyc_add_pnt(pt, WetTurbojet(design=False, **thermo))
 
             self.set_input_defaults(pt+'.fc.MN', self.od_MNs[i]),
             self.set_input_defaults(pt+'.fc.alt', self.od_alts[i], units='ft'),
@@ -190,13 +210,19 @@ class MPWetTurbojet(pyc.MPCycle):
 
 if __name__ == "__main__":
 
+    import argparse
     import time
     from openmdao.api import Problem, IndepVarComp
     from openmdao.utils.units import convert_units as cu
 
     prob = om.Problem()
 
-    prob.model = mp_wet_turbojet = MPWetTurbojet()
+    parser = argparse.ArgumentParser(description='Runs the wet turbojet.')
+    parser.add_argument('--tabular', action='store_true',
+                        help='use the tabular wet air thermo, generating the table the first time')
+    args = parser.parse_args()
+
+    prob.model = mp_wet_turbojet = MPWetTurbojet(thermo_method='TABULAR' if args.tabular else 'CEA')
 
     prob.setup()
 
@@ -1,7 +1,9 @@
 from pycycle.constants import (AIR_FUEL_MIX, AIR_MIX, WET_AIR_MIX, BTU_s2HP, HP_per_RPM_to_FT_LBF, 
                                R_UNIVERSAL_SI, R_UNIVERSAL_ENG, g_c, MIN_VALID_CONCENTRATION, 
                                T_STDeng, P_STDeng, P_REF, CEA_AIR_COMPOSITION, CEA_AIR_FUEL_COMPOSITION, 
-                               CEA_WET_AIR_COMPOSITION, AIR_JETA_TAB_SPEC, TAB_AIR_FUEL_COMPOSITION)
+                               CEA_WET_AIR_COMPOSITION, TAB_AIR_FUEL_COMPOSITION, TAB_WET_AIR_FUEL_COMPOSITION, 
+                               load_tab_spec, load_wet_tab_spec)
+from pycycle import constants
 
 from pycycle.thermo.cea import species_data
 
@@ -41,4 +43,11 @@ from pycycle.viewers import print_bleed, print_burner, print_compressor, print_f
                             plot_compressor_maps, plot_turbine_maps
 
 
-from pycycle.mp_cycle import MPCycle, Cycle
\ No newline at end of file
+from pycycle.mp_cycle import MPCycle, Cycle
+
+
+def __getattr__(name): 
+    # the default tabular thermo data is only loaded when it is first used (see pycycle.constants)
+    if name == 'AIR_JETA_TAB_SPEC': 
+        return constants.AIR_JETA_TAB_SPEC
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,368 @@
+"""
+Timing benchmarks for pyCycle models.
+
+The cases are the `benchmark*` methods of the unittest regression checks (`benchmark_*.py`,
+e.g. example_cycles/tests and example_cycles/N+3ref), so the same set of models that is checked
+for values is also timed. Each case runs in a fresh interpreter (so imports, the Properties cache
+and peak memory are per case) and records:
+
+    setup           time spent in `Problem.setup`
+    first_run       first `run_model` (or `run_driver`), including final_setup
+    warm_run        median time of re-running the converged model
+    compute_totals  median time of `compute_totals`, either of the driver responses or of the
+                    TSFC (or Fn) of every point with respect to the first point's flight MN
+    peak_memory     peak resident memory of the process, in MB
+
+Results are appended to a JSON history file, and compared against a stored baseline:
+
+    python -m pycycle.benchmarking --history bench_history.json --baseline bench_baseline.json
+    python -m pycycle.benchmarking simple_turbojet hbtf --save-baseline
+
+The exit status is 1 if any case regressed (or failed), so it can be used in CI.
+"""
+import argparse
+from contextlib import redirect_stdout
+import datetime
+import fnmatch
+import glob
+import importlib.util
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import unittest
+
+
+REPO_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_PATHS = [os.path.join(REPO_PATH, 'example_cycles', 'tests'),
+                 os.path.join(REPO_PATH, 'example_cycles', 'N+3ref')]
+
+METRICS = ('setup', 'first_run', 'warm_run', 'compute_totals', 'peak_memory')
+
+# a metric has regressed if it is both rtol (relative) and atol (absolute) worse than the baseline
+DEFAULT_RTOL = 0.2
+DEFAULT_ATOL = {'setup': 0.05, 'first_run': 0.05, 'warm_run': 0.01, 'compute_totals': 0.01, 'peak_memory': 10.}
+
+
+def find_cases(paths=None):
+    """
+    Returns {case name: (file, TestCase class name, method name)} for every `benchmark*` method
+    in the `benchmark*.py` files under `paths`.
+
+    The case name is the file name without the benchmark_ prefix, with the method name appended
+    when a file has more than one case.
+    """
+    cases = {}
+    for path in (DEFAULT_PATHS if paths is None else paths):
+        files = [path] if os.path.isfile(path) else sorted(glob.glob(os.path.join(path, 'benchmark*.py')))
+        for filename in files:
+            module = _load_module(filename)
+            found = []
+            for cls in vars(module).values():
+                if isinstance(cls, type) and issubclass(cls, unittest.TestCase) and cls.__module__ == module.__name__:
+                    found.extend((cls.__name__, name) for name in sorted(vars(cls)) if name.startswith('benchmark'))
+
+            base = os.path.splitext(os.path.basename(filename))[0]
+            if base.startswith('benchmark_'):
+                base = base[len('benchmark_'):]
+            for cls_name, method in found:
+                name = base if len(found) == 1 else f'{base}.{method}'
+                cases[name] = (filename, cls_name, method)
+
+    return cases
+
+
+def _load_module(filename):
+    # benchmark files import their model from the same directory (N+3ref) or from the
+    # package they live in (example_cycles.*), so both have to be importable
+    dirname = os.path.dirname(os.path.abspath(filename))
+    root = dirname
+    while os.path.isfile(os.path.join(root, '__init__.py')):
+        root = os.path.dirname(root)
+    for path in (dirname, root):
+        if path not in sys.path:
+            sys.path.insert(0, path)
+
+    name = '_pyc_bench_' + os.path.splitext(os.path.basename(filename))[0]
+    spec = importlib.util.spec_from_file_location(name, filename)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _peak_memory():
+    try:
+        import resource
+    except ImportError:  # windows
+        return None
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on linux, bytes on macOS
+    return maxrss/2**20 if sys.platform == 'darwin' else maxrss/2**10
+
+
+def _totals_of_wrt(prob):
+    if prob.driver._responses:
+        return None, None
+
+    model = prob.model
+    outputs = {meta['prom_name'] for meta in model.get_io_metadata(iotypes='output').values()}
+    for suffix in ('perf.TSFC', 'perf.Fn'):
+        of = sorted(name for name in outputs if name.endswith(suffix))
+        if of:
+            break
+    else:
+        return None, None
+
+    inputs = sorted({meta['prom_name'] for meta in model.get_io_metadata(iotypes='input').values()
+                     if meta['prom_name'].endswith(('fc.MN', 'fc.alt'))})
+    inputs = [name for name in inputs if model.get_source(name).startswith('_auto_ivc')]
+    if not inputs:
+        return None, None
+
+    return of, [inputs[0]]
+
+
+def run_case(filename, cls_name, method, num_warm=3):
+    """
+    Runs one benchmark case in this process and returns its metrics.
+    """
+    import openmdao.api as om
+
+    module = _load_module(filename)
+    test = getattr(module, cls_name)(method)
+
+    probs = []
+    times = {'setup': 0., 'first_run': None}
+    orig = {name: getattr(om.Problem, name) for name in ('setup', 'run_model', 'run_driver')}
+
+    def timed(name):
+        func = orig[name]
+
+        def wrapper(prob, *args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return func(prob, *args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - t0
+                if name == 'setup':
+                    times['setup'] += elapsed
+                    probs.append(prob)
+                elif times['first_run'] is None:
+                    times['first_run'] = elapsed
+
+        return wrapper
+
+    # an exception before the model ran is an error, after it is a failed value check, which does
+    # not stop the timings
+    result = {'error': None, 'check': None}
+    for name in orig:
+        setattr(om.Problem, name, timed(name))
+    try:
+        # the regression checks print a lot, only the metrics are of interest here
+        with redirect_stdout(io.StringIO()):
+            test.setUp()
+            try:
+                getattr(test, method)()
+            finally:
+                test.tearDown()
+    except Exception as err:
+        result['error' if times['first_run'] is None else 'check'] = f'{type(err).__name__}: {err}'
+    finally:
+        for name, func in orig.items():
+            setattr(om.Problem, name, func)
+
+    result.update(times)
+    if probs and result['error'] is None:
+        prob = probs[0]
+        with redirect_stdout(io.StringIO()):
+            prob.set_solver_print(level=-1)
+
+            warm = []
+            for i in range(num_warm):
+                t0 = time.perf_counter()
+                prob.run_model()
+                warm.append(time.perf_counter() - t0)
+            result['warm_run'] = statistics.median(warm)
+
+            of, wrt = _totals_of_wrt(prob)
+            if of is not None or prob.driver._responses:
+                totals = []
+                for i in range(num_warm):
+                    t0 = time.perf_counter()
+                    prob.compute_totals(of=of, wrt=wrt)
+                    totals.append(time.perf_counter() - t0)
+                result['compute_totals'] = statistics.median(totals)
+
+    result['peak_memory'] = _peak_memory()
+    return result
+
+
+def run_benchmarks(cases, num_warm=3, timeout=3600, out_stream=None):
+    """
+    Runs each (name, (file, class, method)) case of `cases` in a separate interpreter and returns
+    {name: metrics}.
+    """
+    env = dict(os.environ, OPENMDAO_REPORTS='0')
+    results = {}
+    for name, (filename, cls_name, method) in cases.items():
+        if out_stream is not None:
+            print(f'running {name} ...', file=out_stream, flush=True)
+        cmd = [sys.executable, '-m', 'pycycle.benchmarking', '--worker', filename, cls_name, method,
+               '--num-warm', str(num_warm)]
+        try:
+            proc = subprocess.run(cmd, capture_output=True, text=True, env=env, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            results[name] = {'error': f'timed out after {timeout} s'}
+            continue
+
+        lines = proc.stdout.strip().splitlines()
+        try:
+            results[name] = json.loads(lines[-1])
+        except (IndexError, ValueError):
+            results[name] = {'error': proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else
+                             f'exit status {proc.returncode}'}
+
+    return results
+
+
+def _environment():
+    import numpy
+    import openmdao
+
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_PATH, capture_output=True,
+                                text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+
+    return {'date': datetime.datetime.now().isoformat(timespec='seconds'), 'commit': commit,
+            'host': platform.node(), 'python': platform.python_version(), 'numpy': numpy.__version__,
+            'openmdao': openmdao.__version__}
+
+
+def append_history(filename, results):
+    """
+    Appends the results (with the environment they were run in) to a JSON history file.
+    """
+    history = []
+    if os.path.exists(filename):
+        with open(filename) as f:
+            history = json.load(f)
+    history.append({**_environment(), 'results': results})
+    with open(filename, 'w') as f:
+        json.dump(history, f, indent=2)
+    return history
+
+
+def compare(results, baseline, rtol=DEFAULT_RTOL, atol=None):
+    """
+    Returns a list of (case, metric, value, baseline value) for every metric that has regressed,
+    plus (case, 'error', message, None) for every case that failed to run.
+    """
+    atol = DEFAULT_ATOL if atol is None else atol
+    regressions = []
+    for name, result in results.items():
+        if result.get('error'):
+            regressions.append((name, 'error', result['error'], None))
+            continue
+        if name not in baseline:
+            continue
+        for metric in METRICS:
+            value = result.get(metric)
+            ref = baseline[name].get(metric)
+            if value is None or ref is None:
+                continue
+            if value > ref*(1 + rtol) and value - ref > atol.get(metric, 0.):
+                regressions.append((name, metric, value, ref))
+    return regressions
+
+
+def report(results, baseline=None, regressions=(), out_stream=sys.stdout):
+    """
+    Prints a table of the results, with the change from the baseline and regressions flagged.
+    """
+    flagged = {(name, metric) for name, metric, _, _ in regressions}
+    checks_failed = []
+    header = ''.join(f'{metric:>16}' for metric in METRICS)
+    print(f"{'case':<32}{header}", file=out_stream)
+
+    for name, result in results.items():
+        if result.get('error'):
+            print(f"{name[:31]:<32}  FAILED: {result['error']}", file=out_stream)
+            continue
+        line = f'{name[:31]:<32}'
+        if result.get('check'):
+            checks_failed.append(name)
+        for metric in METRICS:
+            value = result.get(metric)
+            if value is None:
+                line += f"{'-':>16}"
+                continue
+            cell = f'{value:.3f}'
+            ref = (baseline or {}).get(name, {}).get(metric)
+            if ref:
+                cell += f' {100*(value/ref - 1):+.0f}%'
+            if (name, metric) in flagged:
+                cell += '!'
+            line += f'{cell:>16}'
+        print(line, file=out_stream)
+
+    if checks_failed:
+        print(f"\nvalue checks failed (timings still recorded): {', '.join(checks_failed)}", file=out_stream)
+    if regressions:
+        print(f'\n{len(regressions)} regression(s) (times in s, memory in MB)', file=out_stream)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Time the pyCycle benchmark cases.')
+    parser.add_argument('cases', nargs='*', help='case names or glob patterns (default: all)')
+    parser.add_argument('--path', action='append', help='benchmark file or directory (repeatable); '
+                        'defaults to example_cycles/tests and example_cycles/N+3ref')
+    parser.add_argument('--num-warm', type=int, default=3, help='number of warm re-runs and compute_totals')
+    parser.add_argument('--history', default='bench_history.json', help='JSON history file to append to')
+    parser.add_argument('--baseline', default='bench_baseline.json', help='baseline JSON file to compare to')
+    parser.add_argument('--save-baseline', action='store_true', help='store these results as the new baseline')
+    parser.add_argument('--rtol', type=float, default=DEFAULT_RTOL, help='relative regression tolerance')
+    parser.add_argument('--list', action='store_true', help='list the cases and exit')
+    parser.add_argument('--worker', nargs=3, metavar=('FILE', 'CLASS', 'METHOD'), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        print(json.dumps(run_case(*args.worker, num_warm=args.num_warm)))
+        return 0
+
+    cases = find_cases(args.path)
+    if args.cases:
+        cases = {name: case for name, case in cases.items()
+                 if any(fnmatch.fnmatch(name, pattern) for pattern in args.cases)}
+
+    if args.list:
+        for name, (filename, cls_name, method) in cases.items():
+            print(f'{name:<32}{os.path.relpath(filename)}:{cls_name}.{method}')
+        return 0
+
+    results = run_benchmarks(cases, num_warm=args.num_warm, out_stream=sys.stdout)
+    append_history(args.history, results)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    regressions = compare(results, baseline, rtol=args.rtol)
+    report(results, baseline, regressions)
+
+    if args.save_baseline:
+        baseline.update({name: result for name, result in results.items() if not result.get('error')})
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=2)
+
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -3,6 +3,8 @@ import os
 import os.path
 import pickle
 
+import numpy as np
+
 class DeprecatedDict(dict): 
 
     def __init__(self, old_name, new_name, *args, **kwargs): 
@@ -26,15 +28,86 @@ CEA_WET_AIR_COMPOSITION = {'Ar':3.21320739e-04, 'C':1.09451485e-05, 'H':6.862162
 CEA_CO2_CO_O2_COMPOSITION = {'C':0.02272237, 'O':0.04544473}
 
 TAB_AIR_FUEL_COMPOSITION = {'FAR': 0.0}
+TAB_WET_AIR_FUEL_COMPOSITION = {'FAR': 0.0, 'WAR': 0.0}
 # A little fancy code to find the default thermo data in the python package, wherever its installed
 pkg_path = os.path.dirname(os.path.realpath(__file__))
 tab_spec_path = os.path.join(pkg_path, 'thermo', 'tabular', 'air_jetA.pkl')
-with open(tab_spec_path, 'rb') as spec_data:
-    AIR_JETA_TAB_SPEC = pickle.load(spec_data)
+
+# tabular thermo data, unpickled on first use and kept (with the modification times it was read at)
+# until its files change
+_tab_specs = {}
+
+
+class TabSpec(dict): 
+    """
+    The dict of a tabular thermo table (its axes and properties by name). Unlike a plain dict 
+    it takes attributes, so the tabular thermo can keep the stacked tables of its lookups 
+    on it, and they go away with it.
+    """
+
+    def __reduce__(self): 
+        # only the table itself, not the stacked copies kept on it
+        return TabSpec, (dict(self), )
+
+
+def _tab_spec_mtime(path): 
+    if os.path.isdir(path): 
+        return tuple(os.stat(os.path.join(path, name)).st_mtime_ns for name in ('axes.npz', 'table.npy'))
+    return os.stat(path).st_mtime_ns
+
+def load_tab_spec(path=tab_spec_path): 
+    """
+    Returns the tabular thermo data stored in the given pickle file (or table directory), 
+    only reading it the first time it is asked for and again when its files have changed.
+
+    A directory written by pycycle.thermo.tabular.generate.save_table is memory mapped 
+    instead: its stacked table is kept as 'table' (with its 'table_axes' and 
+    'table_properties'), and each property is a view of it.
+    """
+    path = os.path.realpath(path)
+    mtime = _tab_spec_mtime(path)
+    if path not in _tab_specs or _tab_specs[path][0] != mtime: 
+        if os.path.isdir(path): 
+            with np.load(os.path.join(path, 'axes.npz')) as data: 
+                names = tuple(str(name) for name in data['names'])
+                props = tuple(str(name) for name in data['properties'])
+                spec = TabSpec((name, data[name]) for name in names)
+            table = np.load(os.path.join(path, 'table.npy'), mmap_mode='r')
+            spec.update({name: table[..., i] for i, name in enumerate(props)})
+            spec.update(table=table, table_axes=names, table_properties=props)
+        else: 
+            with open(path, 'rb') as spec_data:
+                spec = TabSpec(pickle.load(spec_data))
+        _tab_specs[path] = (mtime, spec)
+    return _tab_specs[path][1]
+
+# tabular thermo data of the CEA wet air with JP-7, over FAR and WAR (the default table has no WAR axis). 
+# The entropy goes with log(T), so the temperatures are spaced geometrically
+wet_tab_spec_path = os.path.join(pkg_path, 'thermo', 'tabular', 'air_jp7_wet')
+WET_TAB_GRID = dict(T=np.geomspace(150., 2500., 40), P=np.geomspace(1., 1e7, 71), FAR=np.linspace(0., 0.05, 6), 
+                    fuel='JP-7', mixes={'WAR': ('Water', np.linspace(0., 0.03, 4))})
+
+def load_wet_tab_spec(path=wet_tab_spec_path): 
+    """
+    Returns the wet air tabular thermo data (see load_tab_spec), generating it over 
+    WET_TAB_GRID and saving it at `path` the first time it is asked for.
+    """
+    # imported here, because the table generation needs the CEA thermo, which imports this module
+    from pycycle.thermo.cea import species_data
+    from pycycle.thermo.tabular.generate import load_table
+    return load_table(path, thermo_data=species_data.wet_air, **WET_TAB_GRID)
+
+def __getattr__(name): 
+    # AIR_JETA_TAB_SPEC is loaded lazily, so importing pycycle doesn't 
+    # pay for unpickling the table in runs that never use TABULAR thermo
+    if name == 'AIR_JETA_TAB_SPEC': 
+        return load_tab_spec()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 THERMO_DEFAULT_COMPOSITIONS = {
     'CEA': CEA_AIR_COMPOSITION, 
+    'FROZEN': CEA_AIR_COMPOSITION, 
     'TABULAR': TAB_AIR_FUEL_COMPOSITION
 }
 
@@ -69,4 +142,4 @@ P_REF = 1.01325 # 1 atm
 # P_REF = 1.0162 # Not sure why, but this seems to match the SP set to the TP better
 
 
-ALLOWED_THERMOS = ('CEA', 'TABULAR')
\ No newline at end of file
+ALLOWED_THERMOS = ('CEA', 'FROZEN', 'TABULAR')
\ No newline at end of file
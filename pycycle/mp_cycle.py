@@ -8,6 +8,7 @@ import networkx as nx
 from pycycle.element_base import Element
 from pycycle.thermo.cea import species_data
 from pycycle.constants import ALLOWED_THERMOS
+from pycycle.parallel_points import ParallelPointsSolver
 
 
 class Cycle(om.Group): 
@@ -22,6 +23,9 @@ class Cycle(om.Group):
         self.options.declare('thermo_data', default=species_data.janaf,
                               desc='thermodynamic data set.', 
                               recordable=False)
+        self.options.declare('element_thermo_methods', default={}, types=dict,
+                              desc='Methods for computing the thermodynamic properties of individual elements (or sub-cycles), '
+                                   'by name, in place of thermo_method (e.g. FROZEN for the cold section of a CEA cycle)')
 
         self._elements = set()
 
@@ -63,13 +67,16 @@ class Cycle(om.Group):
         if isinstance(subsys, Element): 
             self._elements.add(subsys)
             if 'thermo_method' in subsys.options:
-                subsys.options['thermo_method'] = self.options['thermo_method']
+                subsys.options['thermo_method'] = self._thermo_method(name)
 
             self._flow_graph.add_node(name, type='element')
 
         #TODO: Find some way to error check based on _base_class_super_called to let user know they forgot a call to super
         return super().add_subsystem(name, subsys, **kwargs)
 
+    def _thermo_method(self, name): 
+        return self.options['element_thermo_methods'].get(name, self.options['thermo_method'])
+
 
     def setup(self): 
 
@@ -88,12 +95,19 @@ class Cycle(om.Group):
         visited = set() # use a set, because checking "in" on a queue is slow
 
 
+        for name, method in self.options['element_thermo_methods'].items(): 
+            if name not in self._children: 
+                raise ValueError(f'{self.msginfo}: element_thermo_methods is given for `{name}`, '
+                                 'but there is no element with that name.')
+            if method not in ALLOWED_THERMOS: 
+                raise ValueError(f'{self.msginfo}: the thermo method `{method}` of `{name}` must be one of {ALLOWED_THERMOS}.')
+
         # loop over all child subsystems and push down cycle level options 
         cycle_level_options = ['thermo_method', 'thermo_data', 'design']
         for child_name, child in self._children.items():
             for opt in cycle_level_options: 
                 if opt in child.options: 
-                    child.options[opt] = self.options[opt]
+                    child.options[opt] = self._thermo_method(child_name) if opt == 'thermo_method' else self.options[opt]
 
 
         # note: three kinds of nodes in graph, elements, in_ports, out_ports. 
@@ -202,8 +216,20 @@ class MPCycle(om.Group):
         self._od_pnts= []
         self._des_od_connections = []
         self._use_default_des_od_conns = False
+        self._od_group = None
+        # kept so worker processes can rebuild the model when they cannot be forked
+        self._init_kwargs = kwargs
         super(MPCycle, self).__init__(**kwargs)
 
+    def initialize(self):
+        self.options.declare('parallel_od', default=False, types=bool,
+                              desc='If True, the off-design points are placed in a ParallelGroup (named od_pnts, '
+                                   'with its inputs and outputs promoted). Under MPI they are distributed over the '
+                                   'processors, otherwise they are run in local worker processes.')
+        self.options.declare('od_num_procs', default=None, types=int, allow_none=True,
+                              desc='Number of local worker processes for the off-design points when not running under MPI. '
+                                   'Defaults to one per point, up to the number of cpus. 1 runs them in process.')
+
 
     def pyc_add_cycle_param(self, name, val, units=None): 
 
@@ -241,11 +267,46 @@ class MPCycle(om.Group):
             self.add_subsystem(name, pnt, **kwargs)
             self._des_pnt = pnt
         elif pnt.options['design'] is False:
-            self.add_subsystem(name, pnt, **kwargs)
+            if self.options['parallel_od']:
+                if self._od_group is None: 
+                    self._od_group = self.add_subsystem('od_pnts', om.ParallelGroup(), promotes=['*'])
+                self._od_group.add_subsystem(name, pnt, **kwargs)
+                # keep the points reachable as attributes of the cycle, as in the serial layout
+                setattr(self, name, pnt)
+            else: 
+                self.add_subsystem(name, pnt, **kwargs)
             self._od_pnts.append(pnt)
             
         return pnt
 
+    def _get_subsystem(self, name):
+        system = super()._get_subsystem(name)
+        if system is None and self._od_group is not None: 
+            system = self._od_group._get_subsystem(name)
+        return system
+
+    def _od_waves(self):
+        """
+        Groups the off-design points into waves that only depend on the points in earlier waves 
+        (e.g. a part power point that is connected to the thrust of a full power point).
+        """
+        graph = nx.DiGraph()
+        graph.add_nodes_from(pnt.name for pnt in self._od_pnts)
+        for tgt, (src, _, _) in self._manual_connections.items(): 
+            src_pnt = src.split('.')[0]
+            tgt_pnt = tgt.split('.')[0]
+            if src_pnt != tgt_pnt and src_pnt in graph and tgt_pnt in graph: 
+                graph.add_edge(src_pnt, tgt_pnt)
+
+        if not nx.is_directed_acyclic_graph(graph): 
+            cycles = [sorted(c) for c in nx.simple_cycles(graph)]
+            raise ValueError(f'{self.msginfo}: The off-design points {cycles[0]} are connected to each other in a loop, '
+                             'so they can not be run in parallel. Set parallel_od=False.')
+
+        # keep the points in the order they were added within each wave
+        order = {pnt.name: i for i, pnt in enumerate(self._od_pnts)}
+        return [sorted(wave, key=order.get) for wave in nx.topological_generations(graph)]
+
 
     def configure(self): 
         # after all child pts have been set up, 
@@ -257,7 +318,7 @@ class MPCycle(om.Group):
         
             self.promotes(self._des_pnt.name, inputs=[param])
             for pnt in self._od_pnts: 
-                self.promotes(pnt.name, inputs=[param])
+                (self._od_group or self).promotes(pnt.name, inputs=[param])
 
 
         for src, target in self._des_od_connections: 
@@ -276,4 +337,15 @@ class MPCycle(om.Group):
                 except AttributeError: 
                     pass # no des-to-od conns defined
 
-
+        if self._od_group is not None: 
+            waves = self._od_waves()
+            if self.comm.size > 1: 
+                if len(waves) > 1: 
+                    # one Jacobi pass per wave lets the values propagate through the connected points
+                    self._od_group.nonlinear_solver = om.NonlinearBlockJac(maxiter=len(waves), atol=1e-300, rtol=1e-300, 
+                                                                           err_on_non_converge=False)
+                    self._od_group.nonlinear_solver.options['iprint'] = -1
+            else: 
+                self._od_group.nonlinear_solver = ParallelPointsSolver(waves=waves, 
+                                                                       rebuild=(type(self), self._init_kwargs, 'od_pnts'), 
+                                                                       num_procs=self.options['od_num_procs'])
@@ -0,0 +1,222 @@
+"""
+Process based execution of the independent points of a multi-point model, for use without MPI.
+"""
+import multiprocessing
+import os
+import weakref
+
+import openmdao.api as om
+from openmdao.recorders.recording_iteration_stack import Recording
+
+
+def _point_solvers(pnt):
+    """
+    The nonlinear solvers of a point and of its subsystems, by system path.
+    """
+    return {s.pathname: s.nonlinear_solver for s in pnt.system_iter(include_self=True, recurse=True)
+            if s.nonlinear_solver is not None}
+
+
+def _solver_options(pnt):
+    """
+    The options of the nonlinear solvers of a point (and of their line searches), by system path.
+    """
+    options = {}
+    for path, solver in _point_solvers(pnt).items():
+        linesearch = getattr(solver, 'linesearch', None)
+        options[path] = (dict(solver.options.items()),
+                         None if linesearch is None else dict(linesearch.options.items()))
+    return options
+
+
+def _set_solver_options(pnt, options):
+    for path, solver in _point_solvers(pnt).items():
+        solver_opts, ls_opts = options[path]
+        for name, val in solver_opts.items():
+            solver.options[name] = val
+        if ls_opts is not None:
+            for name, val in ls_opts.items():
+                solver.linesearch.options[name] = val
+
+
+def _points_worker(conn, group, rebuild):
+    """
+    Worker loop. Holds a replica of the points: with the fork start method it is the forked copy of
+    the group itself, otherwise the model is rebuilt from (class, init kwargs, group path).
+    """
+    if group is None:
+        cls, init_kwargs, group_path = rebuild
+        prob = om.Problem(cls(**init_kwargs), reports=False)
+        prob.setup(check=False)
+        prob.set_solver_print(level=-1)
+        prob.final_setup()
+        group = prob.model._get_subsystem(group_path)
+
+    while True:
+        jobs = conn.recv()
+        if jobs is None:
+            break
+
+        # the vectors arrive in the scaled state of the parent solve, so the points are run
+        # without entering the scaling context again
+        results = []
+        for name, inputs, outputs, options in jobs:
+            pnt = group._get_subsystem(name)
+            # the solver options of the parent may have changed since the worker was started
+            _set_solver_options(pnt, options)
+            pnt._inputs.set_val(inputs)
+            pnt._outputs.set_val(outputs)
+            try:
+                pnt._solve_nonlinear()
+                err = None
+            except Exception as e:
+                err = (isinstance(e, om.AnalysisError), f'{type(e).__name__}: {e}')
+            iter_counts = {path: solver._iter_count for path, solver in _point_solvers(pnt).items()}
+            results.append((name, pnt._inputs.asarray(copy=True), pnt._outputs.asarray(copy=True), iter_counts, err))
+        conn.send(results)
+
+
+def _stop_workers(workers):
+    for proc, conn in workers:
+        try:
+            conn.send(None)
+        except (OSError, BrokenPipeError):
+            pass
+    for proc, conn in workers:
+        proc.join(timeout=5)
+        if proc.is_alive():
+            proc.terminate()
+    workers.clear()
+
+
+class ParallelPointsSolver(om.NonlinearRunOnce):
+    """
+    Runs the points (subsystems) of a group once, distributing them over local worker processes.
+
+    Each worker holds a replica of the model. For every solve, the inputs, current outputs and
+    nonlinear solver options of each point are sent to the worker that owns it, the point is
+    converged there and the outputs and solver iteration counts are copied back. Points connected to each other are run in dependency order ("waves"); the
+    points within a wave run concurrently.
+
+    Under complex step, or with a single process, the points are run in this process.
+    """
+
+    SOLVER = 'NL: PYC POINTS'
+
+    def __init__(self, waves=None, rebuild=None, **kwargs):
+        super().__init__(**kwargs)
+
+        # lists of point names; each wave only depends on the ones before it
+        self.waves = waves
+        # (class, init kwargs, path of the group from the class instance) to replicate the model
+        # in the workers when processes cannot be forked
+        self.rebuild = rebuild
+
+        self._workers = []
+        self._owner = {}
+        self._finalizer = weakref.finalize(self, _stop_workers, self._workers)
+
+    def _declare_options(self):
+        super()._declare_options()
+
+        self.options.declare('num_procs', default=None, types=int, allow_none=True,
+                             desc='Number of worker processes. Defaults to one per point, up to the number of cpus. '
+                                  '1 runs the points in this process.')
+
+    def _setup_solvers(self, system, depth):
+        super()._setup_solvers(system, depth)
+        # the workers hold replicas of the previous setup
+        _stop_workers(self._workers)
+
+    def _num_procs(self, num_points):
+        num_procs = self.options['num_procs']
+        if num_procs is None:
+            num_procs = os.cpu_count() or 1
+        return max(1, min(num_procs, num_points))
+
+    def _start_workers(self, system, names):
+        methods = multiprocessing.get_all_start_methods()
+        fork = 'fork' in methods
+        if not fork and self.rebuild is None:
+            raise RuntimeError(f'{system.msginfo}: processes cannot be forked on this platform, '
+                               'so the model must be rebuildable in the workers.')
+
+        ctx = multiprocessing.get_context('fork' if fork else 'spawn')
+        num_procs = self._num_procs(len(names))
+        for i in range(num_procs):
+            parent_conn, child_conn = ctx.Pipe()
+            # with fork the group is inherited by the worker rather than pickled
+            proc = ctx.Process(target=_points_worker, args=(child_conn, system if fork else None, self.rebuild),
+                               daemon=True)
+            proc.start()
+            child_conn.close()
+            self._workers.append((proc, parent_conn))
+
+        self._owner = {name: i % num_procs for i, name in enumerate(names)}
+
+    def solve(self):
+        """
+        Run the solver.
+        """
+        system = self._system()
+        points = {s.name: s for s in system._subsystems_myproc}
+        waves = self.waves if self.waves is not None else [list(points)]
+
+        with Recording('ParallelPoints', 0, self) as rec:
+            if system.under_complex_step or self._num_procs(len(points)) == 1:
+                for wave in waves:
+                    for name in wave:
+                        system._transfer('nonlinear', 'fwd', name)
+                        points[name]._solve_nonlinear()
+            else:
+                if not self._workers:
+                    self._start_workers(system, list(points))
+
+                errors = []
+                for wave in waves:
+                    for name in wave:
+                        system._transfer('nonlinear', 'fwd', name)
+                    errors.extend(self._solve_remote([points[name] for name in wave]))
+
+                # bring the state of the local copies (e.g. the active species of the equilibrium
+                # solves) up to date with the converged outputs
+                for pnt in points.values():
+                    pnt._apply_nonlinear()
+
+                if errors:
+                    analysis = all(is_analysis for is_analysis, _ in errors)
+                    msg = '\n'.join(msg for _, msg in errors)
+                    raise (om.AnalysisError if analysis else RuntimeError)(msg)
+
+            rec.abs = 0.0
+            rec.rel = 0.0
+
+    def _solve_remote(self, pnts):
+        jobs = [[] for _ in self._workers]
+        for pnt in pnts:
+            jobs[self._owner[pnt.name]].append((pnt.name, pnt._inputs.asarray(copy=True),
+                                                pnt._outputs.asarray(copy=True), _solver_options(pnt)))
+
+        busy = [(proc, conn) for (proc, conn), job in zip(self._workers, jobs) if job]
+        for (proc, conn), job in zip(self._workers, jobs):
+            if job:
+                conn.send(job)
+
+        errors = []
+        for proc, conn in busy:
+            try:
+                results = conn.recv()
+            except EOFError:
+                _stop_workers(self._workers)
+                raise RuntimeError(f'{self.msginfo}: worker process {proc.pid} died.')
+            for name, inputs, outputs, iter_counts, err in results:
+                pnt = self._system()._get_subsystem(name)
+                # the inputs inside the point were updated by its own transfers
+                pnt._inputs.set_val(inputs)
+                pnt._outputs.set_val(outputs)
+                # so the iterations of the points can be read from the solvers as in a serial run
+                for path, solver in _point_solvers(pnt).items():
+                    solver._iter_count = iter_counts[path]
+                if err is not None:
+                    errors.append((err[0], f'{pnt.msginfo}: {err[1]}'))
+        return errors
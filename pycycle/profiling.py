@@ -0,0 +1,466 @@
+"""
+Profiling tools for the import and setup of pyCycle models.
+
+`SetupProfiler` times (and optionally measures the memory of) the phases of `Problem.setup`
+and `Problem.final_setup` that pyCycle is responsible for, per element:
+
+    with SetupProfiler(memory=True) as prof:
+        prob.setup()
+        prob.final_setup()
+
+    prof.report()                   # table, slowest first
+    prof.to_json('setup_prof.json') # machine readable
+
+The phases are:
+
+    setup           `setup` of every Element, Cycle and MPCycle class (only their own body,
+                    children are set up afterwards by OpenMDAO)
+    flow_graph      `Cycle.setup`, the flow-graph traversal that propagates the port data
+    output_ports    `pyc_setup_output_ports` of every element
+    des_od_connect  `MPCycle.configure`, the design to off-design connections
+    properties      construction of the thermo `Properties`
+    map_training    building the interpolants of every MetaModelStructuredComp (maps and tables)
+    connections     OpenMDAO connection resolution
+    problem_setup   everything else in the model setup (`Problem.setup`)
+    final_setup     everything else in the model final setup (vectors, solvers, recorders)
+
+Times are reported both inclusive of, and exclusive of ("self"), any nested phases, so the self
+times of all phases add up to the total. The last four phases time private OpenMDAO methods; the
+ones this version of OpenMDAO doesn't have are not timed (see `SetupProfiler.skipped`). Memory is the net change in allocated memory
+(inclusive), measured with tracemalloc.
+
+`profile_imports` reports where the time of importing a module (pycycle.api by default) goes.
+
+`RunProfiler` instruments a model that has already been set up, recording the call counts and
+cumulative time of the compute/linearize methods of every component and the iteration counts of
+every nonlinear solver, aggregated by class and by element:
+
+    prob.setup()
+    with RunProfiler(prob) as prof:
+        prob.run_model()
+
+    prof.report()
+"""
+from collections import defaultdict
+import functools
+import json
+import subprocess
+import sys
+import time
+import tracemalloc
+import warnings
+
+import openmdao.api as om
+from openmdao.core.component import Component
+from openmdao.core.explicitcomponent import ExplicitComponent
+from openmdao.core.group import Group
+from openmdao.core.implicitcomponent import ImplicitComponent
+
+from pycycle.element_base import Element
+from pycycle.mp_cycle import Cycle, MPCycle
+from pycycle.thermo.cea import species_data
+
+
+def _all_subclasses(cls):
+    subclasses = [cls]
+    for sub in cls.__subclasses__():
+        subclasses.extend(_all_subclasses(sub))
+    return subclasses
+
+
+def _pathname(obj, args, kwargs):
+    return obj.pathname
+
+
+def _properties_key(obj, args, kwargs):
+    thermo_data = args[0] if args else kwargs.get('thermo_data_module')
+    init_elements = args[1] if len(args) > 1 else kwargs.get('init_elements')
+    name = getattr(thermo_data, '__name__', str(thermo_data)).split('.')[-1]
+    elements = ','.join(sorted(init_elements)) if init_elements else ''
+    return f'{name}[{elements}]'
+
+
+def _no_key(obj, args, kwargs):
+    return ''
+
+
+class SetupProfiler(object):
+    """
+    Context manager that instruments the setup phases of pyCycle models.
+
+    The instrumentation is only installed inside the `with` block, and only on the classes that
+    exist when it is entered, so user Cycle and Element classes must be defined before then.
+    """
+
+    def __init__(self, memory=False):
+        self.memory = memory
+
+        self._patched = []
+        self._stack = []
+        self._data = defaultdict(lambda: [0, 0., 0., 0])
+        self._started_tracemalloc = False
+        self.total_time = 0.
+        # the OpenMDAO methods that could not be instrumented
+        self.skipped = []
+
+    def _targets(self):
+        targets = []
+
+        for cls in set(_all_subclasses(Element) + _all_subclasses(Cycle) + _all_subclasses(MPCycle)):
+            if 'setup' in cls.__dict__:
+                phase = 'flow_graph' if cls is Cycle else 'setup'
+                targets.append((cls, 'setup', phase, _pathname))
+            if 'pyc_setup_output_ports' in cls.__dict__:
+                targets.append((cls, 'pyc_setup_output_ports', 'output_ports', _pathname))
+
+        targets.append((MPCycle, 'configure', 'des_od_connect', _pathname))
+        targets.append((species_data.Properties, '__init__', 'properties', _properties_key))
+
+        # openmdao internals, only timed as a whole. The model's methods are wrapped rather than
+        # the Problem's, since openmdao hooks (e.g. reports) rebind those on the instance.
+        # These are private, so they are only wrapped where this version of openmdao defines them.
+        private = [(om.MetaModelStructuredComp, ('_setup_var_data', ), 'map_training', _pathname),
+                   (Group, ('_setup_global_connections', '_setup_connections'), 'connections', _pathname),
+                   (Group, ('_setup', ), 'problem_setup', _no_key),
+                   (Group, ('_final_setup', ), 'final_setup', _no_key)]
+        self.skipped = []
+        for cls, names, phase, key in private:
+            found = [name for name in names if name in cls.__dict__]
+            if found:
+                targets.extend((cls, name, phase, key) for name in found)
+            else:
+                self.skipped.append(f'{cls.__name__}.{names[-1]}')
+
+        return targets
+
+    def _wrap(self, func, phase, key):
+        prof = self
+
+        @functools.wraps(func)
+        def wrapper(obj, *args, **kwargs):
+            prof._start()
+            try:
+                return func(obj, *args, **kwargs)
+            finally:
+                prof._stop(phase, key(obj, args, kwargs), type(obj).__name__)
+
+        return wrapper
+
+    def _start(self):
+        mem = tracemalloc.get_traced_memory()[0] if self.memory else 0
+        # [start time, time spent in nested phases, starting memory]
+        self._stack.append([time.perf_counter(), 0., mem])
+
+    def _stop(self, phase, path, class_name):
+        t0, child_time, mem0 = self._stack.pop()
+        elapsed = time.perf_counter() - t0
+
+        if self._stack:
+            self._stack[-1][1] += elapsed
+        else:
+            self.total_time += elapsed
+
+        record = self._data[phase, path, class_name]
+        record[0] += 1
+        record[1] += elapsed
+        record[2] += elapsed - child_time
+        if self.memory:
+            record[3] += tracemalloc.get_traced_memory()[0] - mem0
+
+    def __enter__(self):
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+
+        for cls, name, phase, key in self._targets():
+            func = cls.__dict__[name]
+            self._patched.append((cls, name, func))
+            setattr(cls, name, self._wrap(func, phase, key))
+
+        if self.skipped:
+            warnings.warn(f"SetupProfiler: {', '.join(self.skipped)} not found in this version of OpenMDAO, "
+                          "so that part of the setup is only counted in the enclosing phases.")
+
+        return self
+
+    def __exit__(self, *args):
+        for cls, name, func in reversed(self._patched):
+            setattr(cls, name, func)
+        self._patched = []
+
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+    @property
+    def records(self):
+        """
+        One dict per (phase, path, class), slowest (self time) first.
+        """
+        records = [{'phase': phase, 'path': path, 'class': class_name, 'calls': calls,
+                    'time': t, 'self_time': self_t, 'memory': mem if self.memory else None}
+                   for (phase, path, class_name), (calls, t, self_t, mem) in self._data.items()]
+        return sorted(records, key=lambda r: r['self_time'], reverse=True)
+
+    def phase_totals(self):
+        """
+        Self time (and memory) of each phase, summed over all paths.
+        """
+        totals = {}
+        for r in self.records:
+            total = totals.setdefault(r['phase'], {'calls': 0, 'self_time': 0., 'memory': 0 if self.memory else None})
+            total['calls'] += r['calls']
+            total['self_time'] += r['self_time']
+            if self.memory and r['phase'] not in ('problem_setup', 'final_setup', 'connections'):
+                total['memory'] += r['memory']
+        return totals
+
+    def to_json(self, filename=None):
+        """
+        Returns the profile as a json-compatible dict, also writing it to `filename` if given.
+        """
+        data = {'total_time': self.total_time, 'phases': self.phase_totals(), 'records': self.records}
+        if filename is not None:
+            with open(filename, 'w') as f:
+                json.dump(data, f, indent=2)
+        return data
+
+    def report(self, out_stream=sys.stdout, top=30):
+        """
+        Prints the per-phase totals and the `top` slowest (phase, path) entries.
+        """
+        mem_header = f"{'memory (MB)':>12}" if self.memory else ''
+
+        def mem_str(mem):
+            return f'{mem/2**20:12.2f}' if self.memory else ''
+
+        print(f'total setup time: {self.total_time:.4f} s', file=out_stream)
+        print(file=out_stream)
+        print(f"{'phase':<16}{'calls':>8}{'self (s)':>12}{'%':>8}{mem_header}", file=out_stream)
+        for phase, total in sorted(self.phase_totals().items(), key=lambda item: -item[1]['self_time']):
+            frac = 100*total['self_time']/self.total_time if self.total_time else 0.
+            print(f"{phase:<16}{total['calls']:>8}{total['self_time']:>12.4f}{frac:>8.1f}{mem_str(total['memory'])}",
+                  file=out_stream)
+
+        print(file=out_stream)
+        print(f"{'phase':<16}{'path':<40}{'class':<28}{'calls':>6}{'time (s)':>11}{'self (s)':>11}{mem_header}",
+              file=out_stream)
+        for r in self.records[:top]:
+            print(f"{r['phase']:<16}{r['path'][-39:]:<40}{r['class'][:27]:<28}{r['calls']:>6}"
+                  f"{r['time']:>11.4f}{r['self_time']:>11.4f}{mem_str(r['memory'])}", file=out_stream)
+
+
+def profile_setup(prob, memory=False, final_setup=True, **setup_kwargs):
+    """
+    Runs `prob.setup` (and `prob.final_setup`) under a SetupProfiler and returns the profiler.
+    """
+    with SetupProfiler(memory=memory) as prof:
+        prob.setup(**setup_kwargs)
+        if final_setup:
+            prob.final_setup()
+    return prof
+
+
+def profile_imports(module='pycycle.api', top=20):
+    """
+    Imports `module` in a fresh interpreter with `-X importtime` and returns
+    (total seconds, list of (module, self seconds, cumulative seconds)) with the `top`
+    entries by self time.
+    """
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                          capture_output=True, text=True, check=True)
+
+    entries = []
+    total = 0.
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        name = name.rstrip()
+        entries.append((name.strip(), int(self_us)*1e-6, int(cumulative_us)*1e-6))
+        if name.strip() == module and not name.startswith('  '):
+            total = int(cumulative_us)*1e-6
+
+    entries.sort(key=lambda e: e[1], reverse=True)
+    return total, entries[:top]
+
+
+RUN_METHODS = ('compute', 'compute_partials', 'apply_nonlinear', 'solve_nonlinear', 'linearize', 'solve_linear')
+
+
+def _overrides(comp, name):
+    # only methods that actually do work are timed, not the empty openmdao defaults
+    func = getattr(type(comp), name, None)
+    return func is not None and all(func is not getattr(base, name, None)
+                                    for base in (Component, ExplicitComponent, ImplicitComponent))
+
+
+class RunProfiler(object):
+    """
+    Context manager that times the component methods and counts the nonlinear solver
+    iterations of a model while it runs.
+
+    Works on any set up Problem or System (a Cycle, an MPCycle or a plain Group); the
+    instrumentation is attached to the instances, so nothing in the model has to change.
+    """
+
+    def __init__(self, prob_or_system, methods=RUN_METHODS):
+        self.model = getattr(prob_or_system, 'model', prob_or_system)
+        self.methods = methods
+
+        self._patched = []
+        # (path, class, method) -> [calls, time]
+        self._comp_data = defaultdict(lambda: [0, 0.])
+        # solver owner path -> [class, solves, iterations, time]
+        self._solver_data = {}
+        self._element_of = {}
+        self.total_time = 0.
+
+    def _element_path(self, path):
+        # the innermost pyCycle element that contains path
+        parts = path.split('.')
+        for i in range(len(parts), 0, -1):
+            prefix = '.'.join(parts[:i])
+            if prefix in self._elements:
+                return prefix
+        return ''
+
+    def _wrap_method(self, comp, name):
+        func = getattr(comp, name)
+        record = None
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record[1] += time.perf_counter() - t0
+                record[0] += 1
+
+        record = self._comp_data[comp.pathname, type(comp).__name__, name]
+        return wrapper
+
+    def _wrap_solver(self, solver, path):
+        func = solver.solve
+        record = self._solver_data[path] = [type(solver).__name__, 0, 0, 0.]
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record[3] += time.perf_counter() - t0
+                record[2] += getattr(solver, '_iter_count', 0)
+                record[1] += 1
+
+        return wrapper
+
+    def __enter__(self):
+        self._elements = set()
+        systems = list(self.model.system_iter(include_self=True, recurse=True))
+        for system in systems:
+            if isinstance(system, Element):
+                self._elements.add(system.pathname)
+
+        for system in systems:
+            if isinstance(system, Component):
+                for name in self.methods:
+                    if _overrides(system, name):
+                        self._patched.append((system, name))
+                        setattr(system, name, self._wrap_method(system, name))
+
+            solver = system.nonlinear_solver
+            if solver is not None and not isinstance(solver, om.NonlinearRunOnce):
+                self._patched.append((solver, 'solve'))
+                solver.solve = self._wrap_solver(solver, system.pathname)
+
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        self.total_time += time.perf_counter() - self._t0
+
+        for obj, name in self._patched:
+            del obj.__dict__[name]
+        self._patched = []
+
+    @property
+    def records(self):
+        """
+        One dict per (component path, method), slowest first.
+        """
+        records = [{'path': path, 'element': self._element_path(path), 'class': class_name,
+                    'method': method, 'calls': calls, 'time': t}
+                   for (path, class_name, method), (calls, t) in self._comp_data.items() if calls]
+        return sorted(records, key=lambda r: r['time'], reverse=True)
+
+    def _aggregate(self, keys):
+        totals = {}
+        for r in self.records:
+            total = totals.setdefault(tuple(r[k] for k in keys), {'calls': 0, 'time': 0.})
+            total['calls'] += r['calls']
+            total['time'] += r['time']
+        return dict(sorted(totals.items(), key=lambda item: -item[1]['time']))
+
+    def by_class(self):
+        """
+        Calls and time per (class, method).
+        """
+        return self._aggregate(('class', 'method'))
+
+    def by_element(self):
+        """
+        Calls and time per element path, summed over all components and methods inside it.
+        """
+        return {key[0]: total for key, total in self._aggregate(('element',)).items()}
+
+    def solvers(self):
+        """
+        Number of solves, total iterations and time of each nonlinear solver, by owning system path.
+        """
+        return {path: {'solver': s_class, 'solves': solves, 'iterations': iters, 'time': t}
+                for path, (s_class, solves, iters, t) in self._solver_data.items() if solves}
+
+    def to_json(self, filename=None):
+        """
+        Returns the profile as a json-compatible dict, also writing it to `filename` if given.
+        """
+        data = {'total_time': self.total_time,
+                'by_class': [{'class': c, 'method': m, **total} for (c, m), total in self.by_class().items()],
+                'by_element': [{'element': e, **total} for e, total in self.by_element().items()],
+                'solvers': [{'path': path, **stats} for path, stats in self.solvers().items()],
+                'records': self.records}
+        if filename is not None:
+            with open(filename, 'w') as f:
+                json.dump(data, f, indent=2)
+        return data
+
+    def report(self, out_stream=sys.stdout, top=20):
+        """
+        Prints the `top` entries by class, by element and by solver.
+        """
+        total = self.total_time
+
+        def frac(t):
+            return 100*t/total if total else 0.
+
+        print(f'total run time: {total:.4f} s', file=out_stream)
+        print(file=out_stream)
+        print(f"{'class':<32}{'method':<18}{'calls':>10}{'time (s)':>12}{'%':>8}", file=out_stream)
+        for (class_name, method), t in list(self.by_class().items())[:top]:
+            print(f"{class_name[:31]:<32}{method:<18}{t['calls']:>10}{t['time']:>12.4f}{frac(t['time']):>8.1f}",
+                  file=out_stream)
+
+        print(file=out_stream)
+        print(f"{'element':<40}{'calls':>10}{'time (s)':>12}{'%':>8}", file=out_stream)
+        for element, t in list(self.by_element().items())[:top]:
+            print(f"{element[-39:]:<40}{t['calls']:>10}{t['time']:>12.4f}{frac(t['time']):>8.1f}", file=out_stream)
+
+        print(file=out_stream)
+        print(f"{'solver':<40}{'class':<20}{'solves':>8}{'iters':>8}{'time (s)':>12}", file=out_stream)
+        solvers = sorted(self.solvers().items(), key=lambda item: -item[1]['time'])
+        for path, s in solvers[:top]:
+            print(f"{path[-39:]:<40}{s['solver']:<20}{s['solves']:>8}{s['iterations']:>8}{s['time']:>12.4f}",
+                  file=out_stream)
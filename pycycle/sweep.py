@@ -0,0 +1,398 @@
+"""
+Flight envelope sweeps of the off-design points of a model, e.g. for deck generation.
+
+The envelope points (MN, alt, dTs, throttle) are split into continuation chains: sequences of
+nearby points where each one starts from the converged solution of the previous one. The chains
+are independent, each starting from the state of the problem when the sweep started, so they can
+be run in worker processes that each hold a copy of the set up problem:
+
+    prob.setup()
+    # set the design inputs and initial guesses, then
+    table = run_sweep(prob, ['OD_full_pwr', 'OD_part_pwr'], envelope, throttle='OD_part_pwr.PC',
+                      outputs=['OD_part_pwr.perf.Fn', 'OD_part_pwr.perf.TSFC'], num_procs=4)
+    table['OD_part_pwr.perf.TSFC']
+
+The results of a sweep do not depend on the number of processes.
+"""
+import multiprocessing
+import os
+import time
+
+import numpy as np
+
+import openmdao.api as om
+
+from pycycle.parallel_points import ParallelPointsSolver, _stop_workers
+
+
+FLIGHT_VARS = (('MN', 'fc.MN', None), ('alt', 'fc.alt', 'ft'), ('dTs', 'fc.dTs', 'degR'))
+
+ORDERS = ('alt', 'mach', 'nearest', 'given')
+
+
+class SweepTable(object):
+    """
+    Results of a sweep. Rows are in the order the points were given; the columns (MN, alt, dTs,
+    throttle and the outputs) are stored in one float array, with failed points set to NaN.
+
+    Attributes
+    ----------
+    columns : list of str
+        Column names.
+    data : ndarray
+        (num_points, num_columns) array of values.
+    converged : ndarray of bool
+        False for the points that raised an AnalysisError or did not converge.
+    chain : ndarray of int
+        Index of the continuation chain each point was run in.
+    iterations : ndarray of int
+        Iterations of the point solvers.
+    time : ndarray
+        Wall time of each point.
+    """
+
+    def __init__(self, columns, data, converged, chain, iterations, time):
+        self.columns = list(columns)
+        self.data = data
+        self.converged = converged
+        self.chain = chain
+        self.iterations = iterations
+        self.time = time
+
+    def __len__(self):
+        return self.data.shape[0]
+
+    def __getitem__(self, name):
+        try:
+            return self.data[:, self.columns.index(name)]
+        except ValueError:
+            raise KeyError(f"'{name}' is not a column of the sweep table. Columns are {self.columns}.")
+
+    def to_csv(self, filename):
+        header = ','.join(self.columns + ['converged', 'chain', 'iterations', 'time'])
+        extra = np.column_stack([self.converged, self.chain, self.iterations, self.time])
+        np.savetxt(filename, np.hstack([self.data, extra]), delimiter=',', header=header, comments='')
+
+    def save(self, filename):
+        np.savez(filename, columns=np.array(self.columns), data=self.data, converged=self.converged,
+                 chain=self.chain, iterations=self.iterations, time=self.time)
+
+    @classmethod
+    def load(cls, filename):
+        with np.load(filename) as f:
+            return cls(f['columns'].tolist(), f['data'], f['converged'], f['chain'], f['iterations'], f['time'])
+
+
+def _serpentine(idxs, points, major, minor, major_start, minor_start):
+    """
+    Orders points by the `major` column, starting from the end nearest `major_start`, and within
+    equal `major` values by the `minor` column, alternating direction so consecutive points stay close.
+    """
+    major_vals = np.unique(points[idxs, major])
+    if abs(major_vals[-1] - major_start) < abs(major_vals[0] - major_start):
+        major_vals = major_vals[::-1]
+
+    ordered = []
+    descending = None
+    for val in major_vals:
+        line = [i for i in idxs if points[i, major] == val]
+        line.sort(key=lambda i: points[i, minor])
+        if descending is None:
+            # the first line starts at the end nearest the reference
+            descending = abs(points[line[-1], minor] - minor_start) < abs(points[line[0], minor] - minor_start)
+        if descending:
+            line.reverse()
+        ordered.extend(line)
+        descending = not descending
+    return ordered
+
+
+def continuation_chains(points, order='alt', start=None, num_chains=None):
+    """
+    Splits the envelope points into continuation chains.
+
+    Parameters
+    ----------
+    points : array_like
+        (num_points, 4) array of MN, alt, dTs and throttle values.
+    order : str
+        'alt': one chain per (alt, dTs), sweeping MN and, at each MN, the throttle.
+        'mach': one chain per (MN, dTs), sweeping alt and, at each alt, the throttle.
+        'nearest': the nearest neighbour path through all points (in ranges normalized units).
+        'given': the points in the order they were given.
+    start : array_like or None
+        MN, alt, dTs and throttle the problem is converged at. Each chain starts at the end
+        nearest to it. Defaults to the first point.
+    num_chains : int or None
+        For 'nearest' and 'given', split the single path into this many chains.
+
+    Returns
+    -------
+    list of list of int
+        Point indices of each chain, in run order.
+    """
+    points = np.atleast_2d(np.asarray(points, dtype=float))
+    n = points.shape[0]
+    if order not in ORDERS:
+        raise ValueError(f"Unknown sweep order '{order}'. Must be one of {ORDERS}.")
+    if n == 0:
+        return []
+    start = points[0] if start is None else np.asarray(start, dtype=float)
+
+    if order in ('alt', 'mach'):
+        group_col, major = (1, 0) if order == 'alt' else (0, 1)
+        chains = []
+        for key in np.unique(points[:, [group_col, 2]], axis=0):
+            idxs = [i for i in range(n) if points[i, group_col] == key[0] and points[i, 2] == key[1]]
+            chains.append(_serpentine(idxs, points, major, 3, start[major], start[3]))
+        # nearest groups to the reference first
+        chains.sort(key=lambda c: (abs(points[c[0], group_col] - start[group_col]), abs(points[c[0], 2] - start[2])))
+        return chains
+
+    if order == 'given':
+        path = list(range(n))
+    else:
+        span = np.ptp(points, axis=0)
+        span[span == 0] = 1.
+        scaled = np.nan_to_num(points / span)
+        current = np.nan_to_num(start / span)
+        remaining = list(range(n))
+        path = []
+        while remaining:
+            dist = np.linalg.norm(scaled[remaining] - current, axis=1)
+            nxt = remaining.pop(int(np.argmin(dist)))
+            path.append(nxt)
+            current = scaled[nxt]
+
+    num_chains = min(num_chains or 1, n)
+    return [chain.tolist() for chain in np.array_split(np.array(path), num_chains)]
+
+
+def _top_solvers(system):
+    """
+    The outermost solvers that iterate, below and including `system`.
+    """
+    solver = system.nonlinear_solver
+    if solver is not None and not isinstance(solver, om.NonlinearRunOnce):
+        return [solver]
+    solvers = []
+    for sub in system._subsystems_myproc:
+        if isinstance(sub, om.Group):
+            solvers.extend(_top_solvers(sub))
+        elif sub.nonlinear_solver is not None and not isinstance(sub.nonlinear_solver, om.NonlinearRunOnce):
+            solvers.append(sub.nonlinear_solver)
+    return solvers
+
+
+def _points_solvers(model):
+    """
+    The ParallelPointsSolvers of the model (e.g. of an MPCycle with parallel_od).
+    """
+    return [s.nonlinear_solver for s in model.system_iter(include_self=True, recurse=True, typ=om.Group)
+            if isinstance(s.nonlinear_solver, ParallelPointsSolver)]
+
+
+# state of the sweep in this process
+_worker = {}
+
+
+def _init_worker(prob, pnts, throttle, throttle_units, outputs, in_process_points=False):
+    if callable(prob) and not isinstance(prob, om.Problem):
+        prob = prob()
+    prob.final_setup()
+
+    model = prob.model
+
+    points_procs = []
+    if in_process_points:
+        # the sweep processes run the points themselves. Point workers forked before them would be
+        # shared by all of them (and a pool process cannot start its own)
+        for solver in _points_solvers(model):
+            _stop_workers(solver._workers)
+            points_procs.append((solver, solver.options['num_procs']))
+            solver.options['num_procs'] = 1
+    solvers = [s for pnt in pnts for s in _top_solvers(model._get_subsystem(pnt))]
+
+    # sizes of the recorded values, taken from the reference state so they are known even if no point converges
+    sizes = [np.size(prob.get_val(name, units=units)) for name, units in outputs]
+
+    _worker.update(prob=prob, pnts=pnts, throttle=throttle, throttle_units=throttle_units, outputs=outputs,
+                   solvers=solvers, sizes=sizes, points_procs=points_procs,
+                   reference=(model._inputs.asarray(copy=True), model._outputs.asarray(copy=True)))
+
+
+def _restore(state):
+    model = _worker['prob'].model
+    model._inputs.set_val(state[0])
+    model._outputs.set_val(state[1])
+
+
+def _run_chain(args):
+    chain_idx, idxs, points = args
+    prob = _worker['prob']
+    model = prob.model
+    solvers = _worker['solvers']
+
+    # every chain starts from the same state, so the results do not depend on how the chains
+    # are distributed over the workers
+    _restore(_worker['reference'])
+    last_good = _worker['reference']
+
+    # an unconverged point raises, so it is not used as the start of the next one
+    err_flags = [s.options['err_on_non_converge'] for s in solvers]
+    for s in solvers:
+        s.options['err_on_non_converge'] = True
+
+    rows = []
+    try:
+        for i, point in zip(idxs, points):
+            for pnt in _worker['pnts']:
+                for (_, name, units), val in zip(FLIGHT_VARS, point[:3]):
+                    prob.set_val(f'{pnt}.{name}', val, units=units)
+            if _worker['throttle'] is not None:
+                prob.set_val(_worker['throttle'], point[3], units=_worker['throttle_units'])
+
+            t0 = time.perf_counter()
+            try:
+                prob.run_model()
+                converged = True
+            except om.AnalysisError:
+                converged = False
+            dt = time.perf_counter() - t0
+            iterations = sum(s._iter_count for s in solvers)
+
+            if converged:
+                # get_val can return views of the vectors, which are overwritten by the next point
+                values = [np.array(prob.get_val(name, units=units), dtype=float).ravel()
+                          for name, units in _worker['outputs']]
+                last_good = (model._inputs.asarray(copy=True), model._outputs.asarray(copy=True))
+            else:
+                values = None
+                _restore(last_good)
+
+            rows.append((i, chain_idx, converged, iterations, dt, values))
+    finally:
+        for s, flag in zip(solvers, err_flags):
+            s.options['err_on_non_converge'] = flag
+
+    return _worker['sizes'], rows
+
+
+def run_sweep(prob, pnts, points, throttle=None, outputs=(), order='alt', num_chains=None,
+              num_procs=1, throttle_units=None, start=None):
+    """
+    Runs a set up problem over the points of a flight envelope.
+
+    Parameters
+    ----------
+    prob : Problem or callable
+        Problem that has been set up, with its design inputs and initial guesses set. A function
+        returning such a problem can be given instead; it is called in each worker process (it must
+        be picklable when processes cannot be forked).
+    pnts : str or list of str
+        Points whose flight conditions (fc.MN, fc.alt and fc.dTs) are set, e.g. the off-design
+        points of an MPCycle.
+    points : array_like
+        (num_points, 4) array of MN, alt (ft), dTs (degR) and throttle values. Without a throttle,
+        (num_points, 3) is allowed.
+    throttle : str or None
+        Input set to the throttle value of each point (e.g. 'OD_part_pwr.PC' or a Fn_target).
+    outputs : list of str or (str, units)
+        Values recorded in the table. Array values give one column per entry.
+    order : str
+        Continuation order, see `continuation_chains`.
+    num_chains : int or None
+        Number of chains for the 'nearest' and 'given' orders.
+    num_procs : int or None
+        Worker processes. None uses one per cpu; 1 runs the sweep in this process. With more than one,
+        points that are run in worker processes of their own (e.g. with parallel_od) are run in the
+        sweep processes instead.
+    throttle_units : str or None
+        Units of the throttle values.
+    start : array_like or None
+        MN, alt, dTs and throttle the problem is converged at, used to order the chains. Defaults to
+        the current values of the problem, or to the first point when a function is given.
+
+    Returns
+    -------
+    SweepTable
+        The results, in the order of `points`.
+    """
+    if isinstance(pnts, str):
+        pnts = [pnts]
+    outputs = [(o, None) if isinstance(o, str) else tuple(o) for o in outputs]
+
+    points = np.atleast_2d(np.asarray(points, dtype=float))
+    if points.shape[1] == 3:
+        points = np.hstack([points, np.full((points.shape[0], 1), np.nan)])
+    if points.shape[1] != 4:
+        raise ValueError(f'Sweep points must be (MN, alt, dTs, throttle), but they have {points.shape[1]} values.')
+    if throttle is None and not np.all(np.isnan(points[:, 3])):
+        raise ValueError('Throttle values were given for the sweep points, but no throttle variable.')
+
+    if num_procs is None:
+        num_procs = os.cpu_count() or 1
+
+    init_args = (prob, pnts, throttle, throttle_units, outputs, num_procs != 1)
+    fork = 'fork' in multiprocessing.get_all_start_methods()
+
+    sizes = []
+    local = isinstance(prob, om.Problem) or num_procs == 1
+    if local:
+        if num_procs != 1 and not fork:
+            raise RuntimeError('Processes cannot be forked on this platform. Pass a function that '
+                               'returns the set up problem to run the sweep in parallel.')
+        # forked workers inherit this state
+        _init_worker(*init_args)
+        sizes = _worker['sizes']
+
+        if start is None:
+            # each chain starts at the end nearest to the point the problem is converged at
+            ref_prob = _worker['prob']
+            start = [ref_prob.get_val(f'{pnts[0]}.{name}', units=units).ravel()[0] for _, name, units in FLIGHT_VARS]
+            start.append(ref_prob.get_val(throttle, units=throttle_units).ravel()[0] if throttle is not None else np.nan)
+
+    chains = continuation_chains(points, order=order, start=start, num_chains=num_chains)
+    jobs = [(c, idxs, points[idxs]) for c, idxs in enumerate(chains)]
+
+    try:
+        if num_procs == 1:
+            results = [_run_chain(job) for job in jobs]
+        else:
+            ctx = multiprocessing.get_context('fork' if fork else 'spawn')
+            pool_args = {} if local else {'initializer': _init_worker, 'initargs': init_args}
+            with ctx.Pool(max(1, min(num_procs, len(jobs))), **pool_args) as pool:
+                results = pool.map(_run_chain, jobs, chunksize=1)
+    finally:
+        if local:
+            # leave the problem as it was found
+            _restore(_worker['reference'])
+            for solver, procs in _worker['points_procs']:
+                solver.options['num_procs'] = procs
+        _worker.clear()
+
+    if not local and results:
+        # only the workers have set up the problem
+        sizes = results[0][0]
+    rows = [row for _, chain_rows in results for row in chain_rows]
+    n = points.shape[0]
+
+    columns = ['MN', 'alt', 'dTs', 'throttle']
+    for (name, _), size in zip(outputs, sizes):
+        columns.extend([name] if size == 1 else [f'{name}[{j}]' for j in range(size)])
+
+    data = np.full((n, len(columns)), np.nan)
+    data[:, :4] = points
+    converged = np.zeros(n, dtype=bool)
+    chain = np.zeros(n, dtype=int)
+    iterations = np.zeros(n, dtype=int)
+    times = np.zeros(n)
+    for i, c, conv, iters, dt, values in rows:
+        converged[i] = conv
+        chain[i] = c
+        iterations[i] = iters
+        times[i] = dt
+        if values is not None and values:
+            data[i, 4:] = np.concatenate(values)
+
+    return SweepTable(columns, data, converged, chain, iterations, times)
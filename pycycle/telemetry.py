@@ -0,0 +1,291 @@
+"""
+Convergence telemetry for the nested nonlinear solvers of pyCycle models.
+
+Every nonlinear solve inside a model (the cycle Newton, ChemEq, FlightConditions, the Mixer and
+Nozzle internal solvers, the static Ps solves, ...) is logged with its path, nesting depth,
+iteration count, residual norm history, linesearch backtracks, convergence status and wall time.
+Solves are grouped by the top level run (`run_model` or a driver iteration) they happened in:
+
+    prob.setup()
+    with SolverTelemetry(prob, 'telemetry.jsonl') as telemetry:
+        for alt in altitudes:
+            telemetry.tag = f'alt={alt}'
+            prob['fc.alt'] = alt
+            prob.run_model()
+
+    summarize('telemetry.jsonl')
+
+The residual norms and iteration counts come from private attributes of the OpenMDAO solvers.
+Where a version of OpenMDAO doesn't have them, the iterations are counted from the norms when
+there are any (0 otherwise), and the convergence status of a solve without norms is None.
+
+Records are written as JSON lines, or to a sqlite database when the file name ends in
+.db, .sqlite or .sqlite3 (or with fmt='sqlite'). Both are appended to, so several problems
+(or processes, one file each) can log to the same place.
+"""
+from collections import defaultdict
+import json
+import os
+import sqlite3
+import time
+import warnings
+
+import openmdao.api as om
+
+
+SQLITE_EXTENSIONS = ('.db', '.sqlite', '.sqlite3')
+
+_RUN_FIELDS = ('run', 'tag', 'start', 'time', 'solves', 'iterations', 'unconverged')
+_SOLVE_FIELDS = ('run', 'seq', 'path', 'parent', 'depth', 'solver', 'iterations', 'backtracks',
+                 'converged', 'error', 'time', 'residuals')
+
+# the private OpenMDAO solver attributes the residual norms and iteration counts are taken from
+_NORM_METHOD = '_iter_get_norm'
+_ITER_COUNT = '_iter_count'
+
+
+def _fmt(filename, fmt):
+    if fmt is None:
+        fmt = 'sqlite' if os.path.splitext(filename)[1] in SQLITE_EXTENSIONS else 'jsonl'
+    if fmt not in ('jsonl', 'sqlite'):
+        raise ValueError(f"Unknown telemetry format '{fmt}'. Must be 'jsonl' or 'sqlite'.")
+    return fmt
+
+
+class _JSONLinesSink(object):
+
+    def __init__(self, filename):
+        self._f = open(filename, 'a')
+
+    def write(self, runs, solves):
+        for record in solves:
+            self._f.write(json.dumps({'type': 'solve', **record}) + '\n')
+        for record in runs:
+            self._f.write(json.dumps({'type': 'run', **record}) + '\n')
+        self._f.flush()
+
+    def close(self):
+        self._f.close()
+
+
+class _SQLiteSink(object):
+
+    def __init__(self, filename):
+        self._con = con = sqlite3.connect(filename)
+        con.execute('CREATE TABLE IF NOT EXISTS runs (run INTEGER, tag TEXT, start REAL, time REAL, '
+                    'solves INTEGER, iterations INTEGER, unconverged INTEGER)')
+        con.execute('CREATE TABLE IF NOT EXISTS solves (run INTEGER, seq INTEGER, path TEXT, parent TEXT, '
+                    'depth INTEGER, solver TEXT, iterations INTEGER, backtracks INTEGER, converged INTEGER, '
+                    'error TEXT, time REAL, residuals TEXT)')
+        con.commit()
+
+    def write(self, runs, solves):
+        self._con.executemany(f"INSERT INTO solves VALUES ({','.join('?'*len(_SOLVE_FIELDS))})",
+                              [tuple(json.dumps(r[k]) if k == 'residuals' else r[k] for k in _SOLVE_FIELDS)
+                               for r in solves])
+        self._con.executemany(f"INSERT INTO runs VALUES ({','.join('?'*len(_RUN_FIELDS))})",
+                              [tuple(r[k] for k in _RUN_FIELDS) for r in runs])
+        self._con.commit()
+
+    def close(self):
+        self._con.close()
+
+
+class SolverTelemetry(object):
+    """
+    Context manager that logs every nonlinear solve of a set up Problem (or System).
+
+    Attributes
+    ----------
+    tag : str or None
+        Written with each run record, e.g. to label the points of a sweep.
+    """
+
+    def __init__(self, prob_or_system, filename, fmt=None, tag=None):
+        self.model = getattr(prob_or_system, 'model', prob_or_system)
+        self.filename = filename
+        self.fmt = _fmt(filename, fmt)
+        self.tag = tag
+
+        self._patched = []
+        self._stack = []
+        self._solves = []
+        self._run = None
+        self._num_runs = 0
+        # the private solver attributes that could not be used
+        self.missing = set()
+
+    def _patch(self, obj, name, wrapper):
+        self._patched.append((obj, name))
+        setattr(obj, name, wrapper)
+
+    def _instrument_solver(self, solver, path):
+        solve = solver.solve
+        current = [None]
+
+        def solve_wrapper():
+            parent = self._stack[-1] if self._stack else None
+            entry = current[0] = {'run': self._run['run'] if self._run else None, 'seq': None,
+                                  'path': path, 'parent': parent['path'] if parent else None,
+                                  'depth': len(self._stack), 'solver': type(solver).__name__,
+                                  'iterations': 0, 'backtracks': 0, 'converged': False, 'error': None,
+                                  'time': 0., 'residuals': []}
+            self._stack.append(entry)
+            t0 = time.perf_counter()
+            try:
+                return solve()
+            except Exception as err:
+                entry['error'] = type(err).__name__
+                raise
+            finally:
+                entry['time'] = time.perf_counter() - t0
+                res = entry['residuals']
+                entry['iterations'] = getattr(solver, _ITER_COUNT, max(len(res) - 1, 0))
+                self._stack.pop()
+                current[0] = None
+
+                if not hasattr(solver, _NORM_METHOD):
+                    entry['converged'] = None
+                elif entry['error'] is None and res:
+                    norm0 = res[0] if res[0] != 0. else 1.
+                    entry['converged'] = bool(res[-1] <= solver.options['atol'] or
+                                              res[-1]/norm0 <= solver.options['rtol'])
+                self._finish_solve(entry)
+
+        self._patch(solver, 'solve', solve_wrapper)
+
+        for name in (_NORM_METHOD, _ITER_COUNT):
+            if not hasattr(solver, name):
+                self.missing.add(f'{type(solver).__name__}.{name}')
+
+        if hasattr(solver, _NORM_METHOD):
+            get_norm = getattr(solver, _NORM_METHOD)
+
+            def norm_wrapper():
+                norm = get_norm()
+                if current[0] is not None:
+                    current[0]['residuals'].append(float(norm))
+                return norm
+
+            self._patch(solver, _NORM_METHOD, norm_wrapper)
+
+        linesearch = getattr(solver, 'linesearch', None)
+        if linesearch is not None:
+            ls_solve = linesearch.solve
+
+            def ls_wrapper():
+                try:
+                    return ls_solve()
+                finally:
+                    if current[0] is not None:
+                        current[0]['backtracks'] += getattr(linesearch, _ITER_COUNT, 0)
+
+            self._patch(linesearch, 'solve', ls_wrapper)
+
+    def _finish_solve(self, entry):
+        if self._run is None:
+            self._sink.write([], [entry])
+        else:
+            entry['seq'] = len(self._solves)
+            self._solves.append(entry)
+
+    def _instrument_run(self):
+        run_solve_nonlinear = self.model.run_solve_nonlinear
+
+        def run_wrapper():
+            # re-entrant calls (e.g. from a nested problem) belong to the outer run
+            if self._run is not None:
+                return run_solve_nonlinear()
+
+            self._run = run = {'run': self._num_runs, 'tag': self.tag, 'start': time.time()}
+            self._num_runs += 1
+            self._solves = []
+            t0 = time.perf_counter()
+            try:
+                return run_solve_nonlinear()
+            finally:
+                run['time'] = time.perf_counter() - t0
+                run['solves'] = len(self._solves)
+                run['iterations'] = sum(s['iterations'] for s in self._solves)
+                run['unconverged'] = sum(s['converged'] is False for s in self._solves)
+                self._sink.write([run], self._solves)
+                self._run = None
+                self._solves = []
+
+        self._patch(self.model, 'run_solve_nonlinear', run_wrapper)
+
+    def __enter__(self):
+        self._sink = _SQLiteSink(self.filename) if self.fmt == 'sqlite' else _JSONLinesSink(self.filename)
+
+        self._instrument_run()
+        for system in self.model.system_iter(include_self=True, recurse=True):
+            solver = system.nonlinear_solver
+            if solver is not None and not isinstance(solver, om.NonlinearRunOnce):
+                self._instrument_solver(solver, system.pathname)
+
+        if self.missing:
+            warnings.warn(f"SolverTelemetry: {', '.join(sorted(self.missing))} not found in this version of "
+                          "OpenMDAO, so the residual norms or iteration counts of those solves are incomplete.")
+
+        return self
+
+    def __exit__(self, *args):
+        for obj, name in reversed(self._patched):
+            del obj.__dict__[name]
+        self._patched = []
+        self._sink.close()
+
+
+def read_telemetry(filename, fmt=None):
+    """
+    Returns (runs, solves), two lists of dicts, from a telemetry file.
+    """
+    runs = []
+    solves = []
+
+    if _fmt(filename, fmt) == 'sqlite':
+        con = sqlite3.connect(filename)
+        try:
+            for row in con.execute(f"SELECT {','.join(_RUN_FIELDS)} FROM runs"):
+                runs.append(dict(zip(_RUN_FIELDS, row)))
+            for row in con.execute(f"SELECT {','.join(_SOLVE_FIELDS)} FROM solves"):
+                record = dict(zip(_SOLVE_FIELDS, row))
+                if record['converged'] is not None:
+                    record['converged'] = bool(record['converged'])
+                record['residuals'] = json.loads(record['residuals'])
+                solves.append(record)
+        finally:
+            con.close()
+    else:
+        with open(filename) as f:
+            for line in f:
+                record = json.loads(line)
+                (runs if record.pop('type') == 'run' else solves).append(record)
+
+    return runs, solves
+
+
+def summarize(filename_or_solves, fmt=None):
+    """
+    Aggregates the solves (a telemetry file, or the solves from `read_telemetry`) by solver path:
+    number of solves, total and maximum iterations, backtracks, unconverged solves and wall time.
+    Sorted by total time, so the solves that dominate the runtime come first.
+
+    Time is inclusive of any nested solves.
+    """
+    solves = filename_or_solves
+    if isinstance(solves, str):
+        solves = read_telemetry(solves, fmt)[1]
+
+    totals = defaultdict(lambda: {'solves': 0, 'iterations': 0, 'max_iterations': 0, 'backtracks': 0,
+                                  'unconverged': 0, 'time': 0.})
+    for s in solves:
+        total = totals[s['path']]
+        total['solves'] += 1
+        total['iterations'] += s['iterations']
+        total['max_iterations'] = max(total['max_iterations'], s['iterations'])
+        total['backtracks'] += s['backtracks']
+        total['unconverged'] += s['converged'] is False
+        total['time'] += s['time']
+
+    return dict(sorted(totals.items(), key=lambda item: -item[1]['time']))
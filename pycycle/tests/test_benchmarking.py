@@ -0,0 +1,93 @@
+import io
+import json
+import os
+import tempfile
+import unittest
+
+from pycycle.benchmarking import find_cases, run_benchmarks, compare, report, append_history, METRICS
+
+
+BENCHMARK_FILE = """
+import unittest
+
+import openmdao.api as om
+
+import pycycle.api as pyc
+
+
+class FlowStartTestCase(unittest.TestCase):
+
+    def benchmark_case1(self):
+        prob = om.Problem()
+        prob.model = cycle = pyc.Cycle()
+        cycle.options['thermo_method'] = 'CEA'
+        cycle.options['thermo_data'] = pyc.species_data.janaf
+        cycle.add_subsystem('flow_start', pyc.FlowStart())
+        cycle.add_subsystem('duct', pyc.Duct())
+        cycle.pyc_connect_flow('flow_start.Fl_O', 'duct.Fl_I')
+        prob.setup()
+
+        prob.set_val('flow_start.P', 17., units='psi')
+        prob.set_val('flow_start.T', 500., units='degR')
+        prob.set_val('flow_start.W', 100., units='lbm/s')
+        prob.set_val('duct.dPqP', 0.02)
+        prob.run_model()
+
+    def benchmark_case2(self):
+        raise RuntimeError('broken')
+"""
+
+
+class BenchmarkingTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.tmp.name, 'benchmark_flow_start.py')
+        with open(self.filename, 'w') as f:
+            f.write(BENCHMARK_FILE)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_benchmark(self):
+        cases = find_cases([self.tmp.name])
+        self.assertEqual(sorted(cases), ['flow_start.benchmark_case1', 'flow_start.benchmark_case2'])
+
+        results = run_benchmarks(cases, num_warm=2)
+
+        good = results['flow_start.benchmark_case1']
+        self.assertIsNone(good['error'])
+        for metric in ('setup', 'first_run', 'warm_run', 'peak_memory'):
+            self.assertGreater(good[metric], 0.)
+        # no driver responses and no perf element, so no totals
+        self.assertNotIn('compute_totals', good)
+
+        self.assertIn('RuntimeError: broken', results['flow_start.benchmark_case2']['error'])
+
+        history_file = os.path.join(self.tmp.name, 'history.json')
+        append_history(history_file, results)
+        append_history(history_file, results)
+        with open(history_file) as f:
+            history = json.load(f)
+        self.assertEqual(len(history), 2)
+        self.assertEqual(history[1]['results'], results)
+
+        baseline = {'flow_start.benchmark_case1': {metric: good[metric]/10. for metric in METRICS if metric in good}}
+        regressions = compare(results, baseline, atol={})
+        flagged = {(name, metric) for name, metric, _, _ in regressions}
+        self.assertEqual(flagged, {('flow_start.benchmark_case1', 'setup'), ('flow_start.benchmark_case1', 'first_run'),
+                                   ('flow_start.benchmark_case1', 'warm_run'),
+                                   ('flow_start.benchmark_case1', 'peak_memory'),
+                                   ('flow_start.benchmark_case2', 'error')})
+
+        # within tolerance against itself
+        self.assertEqual(compare({'flow_start.benchmark_case1': good}, {'flow_start.benchmark_case1': good}), [])
+
+        stream = io.StringIO()
+        report(results, baseline, regressions, out_stream=stream)
+        self.assertIn('FAILED', stream.getvalue())
+        self.assertIn('5 regression(s)', stream.getvalue())
+
+
+if __name__ == "__main__":
+    unittest.main()
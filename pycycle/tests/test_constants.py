@@ -0,0 +1,49 @@
+import os
+import pickle
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from pycycle import constants
+
+
+class TabSpecTestCase(unittest.TestCase):
+
+    def test_lazy_load(self):
+
+        # run in a fresh interpreter, since other tests may have already loaded the table
+        code = ("import pycycle.api as pyc, pycycle.constants as c; "
+                "assert not c._tab_specs; "
+                "spec = pyc.AIR_JETA_TAB_SPEC; "
+                "assert len(c._tab_specs) == 1; "
+                "assert c.AIR_JETA_TAB_SPEC is spec")
+        subprocess.run([sys.executable, '-c', code], check=True)
+
+    def test_cached(self):
+
+        self.assertIs(constants.AIR_JETA_TAB_SPEC, constants.load_tab_spec())
+        self.assertIs(constants.load_tab_spec(constants.tab_spec_path), constants.load_tab_spec())
+
+        with self.assertRaises(AttributeError):
+            constants.NOT_A_CONSTANT
+
+    def test_reloaded_on_change(self):
+
+        with tempfile.TemporaryDirectory() as tmp:
+            filename = os.path.join(tmp, 'spec.pkl')
+            with open(filename, 'wb') as f:
+                pickle.dump({'T': [1.]}, f)
+            spec = constants.load_tab_spec(filename)
+            self.assertIs(constants.load_tab_spec(filename), spec)
+
+            # a regenerated table is read again
+            with open(filename, 'wb') as f:
+                pickle.dump({'T': [2.]}, f)
+            mtime = os.stat(filename).st_mtime_ns
+            os.utime(filename, ns=(mtime + 10**9, mtime + 10**9))
+            self.assertEqual(constants.load_tab_spec(filename)['T'], [2.])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,183 @@
+import unittest
+import warnings
+
+import openmdao.api as om
+from openmdao.utils.assert_utils import assert_near_equal
+
+from pycycle.mp_cycle import Cycle, MPCycle
+from pycycle.parallel_points import ParallelPointsSolver
+from pycycle.thermo.cea.species_data import janaf
+from pycycle.elements.flow_start import FlowStart
+from pycycle.elements.duct import Duct
+from pycycle.elements.combustor import Combustor
+
+
+class DuctPnt(Cycle):
+
+    def setup(self):
+        self.options['thermo_method'] = 'CEA'
+        self.options['thermo_data'] = janaf
+        design = self.options['design']
+
+        self.add_subsystem('fs', FlowStart())
+        self.add_subsystem('duct', Duct())
+        self.pyc_connect_flow('fs.Fl_O', 'duct.Fl_I')
+
+        if design:
+            self.set_input_defaults('duct.MN', 0.4)
+
+        super().setup()
+
+
+class MPDuct(MPCycle):
+
+    def initialize(self):
+        self.options.declare('coupled', default=False)
+        super().initialize()
+
+    def setup(self):
+        self.pyc_add_pnt('DESIGN', DuctPnt(design=True))
+        for name in ('OD0', 'OD1', 'OD2'):
+            self.pyc_add_pnt(name, DuctPnt(design=False))
+
+        self.pyc_add_cycle_param('duct.dPqP', 0.02)
+        self.pyc_use_default_des_od_conns()
+
+        if self.options['coupled']:
+            self.connect('OD1.duct.Fl_O:tot:P', 'OD2.fs.P')
+
+
+class BurnerPnt(Cycle):
+
+    def setup(self):
+        self.options['thermo_data'] = janaf
+
+        self.add_subsystem('fs', FlowStart())
+        self.add_subsystem('duct', Duct())
+        self.add_subsystem('burner', Combustor(fuel_type='Jet-A(g)'))
+        self.pyc_connect_flow('fs.Fl_O', 'duct.Fl_I')
+        self.pyc_connect_flow('duct.Fl_O', 'burner.Fl_I')
+
+        self.set_input_defaults('duct.MN', 0.3)
+        self.set_input_defaults('burner.MN', 0.2)
+        self.set_input_defaults('burner.Fl_I:FAR', 0.025)
+
+        super().setup()
+
+
+def run_mp_duct(**kwargs):
+    prob = om.Problem(reports=False)
+    prob.model = MPDuct(**kwargs)
+    prob.setup(check=False)
+    prob.set_solver_print(level=-1)
+
+    for name, W, T, P in (('DESIGN', 100., 520., 15.),
+                          ('OD0', 90., 530., 14.), ('OD1', 80., 540., 13.), ('OD2', 70., 550., 12.)):
+        prob.set_val(f'{name}.fs.W', W, units='lbm/s')
+        prob.set_val(f'{name}.fs.T', T, units='degR')
+        if name != 'OD2' or not kwargs.get('coupled'):
+            prob.set_val(f'{name}.fs.P', P, units='psi')
+
+    prob.run_model()
+    return prob
+
+
+class MPCycleTestCase(unittest.TestCase):
+
+    def check_results(self, prob, expected):
+        for name in ('OD0', 'OD1', 'OD2'):
+            for var in ('duct.Fl_O:tot:P', 'duct.Fl_O:stat:MN', 'duct.Fl_O:stat:area'):
+                assert_near_equal(prob.get_val(f'{name}.{var}'), expected.get_val(f'{name}.{var}'), 1e-8)
+
+    def test_parallel_od(self):
+        serial = run_mp_duct()
+
+        for num_procs in (3, 1):
+            with self.subTest(num_procs=num_procs):
+                prob = run_mp_duct(parallel_od=True, od_num_procs=num_procs)
+
+                od_group = prob.model.od_pnts
+                self.assertIsInstance(od_group, om.ParallelGroup)
+                self.assertIsInstance(od_group.nonlinear_solver, ParallelPointsSolver)
+                self.assertEqual(od_group.nonlinear_solver.waves, [['OD0', 'OD1', 'OD2']])
+
+                # the points stay reachable from the cycle
+                self.assertIs(prob.model.OD1, od_group.OD1)
+                self.assertIs(prob.model._get_subsystem('OD1.duct'), od_group.OD1.duct)
+
+                # the design area and the cycle parameter reach the off-design points
+                assert_near_equal(prob.get_val('OD2.duct.area', units='inch**2'),
+                                  prob.get_val('DESIGN.duct.Fl_O:stat:area', units='inch**2'), 1e-10)
+                assert_near_equal(prob.get_val('OD2.duct.Fl_O:tot:P', units='psi'), 12.*0.98, 1e-8)
+
+                self.check_results(prob, serial)
+
+                # a second run reuses the workers
+                prob.set_val('OD0.fs.W', 95., units='lbm/s')
+                prob.run_model()
+                self.assertGreater(prob.get_val('OD0.duct.Fl_O:stat:MN'), serial.get_val('OD0.duct.Fl_O:stat:MN'))
+                # the iterations of the point solvers are reported as in a serial run
+                solver = prob.model.OD0.fs.exit_static.nonlinear_solver
+                self.assertGreater(solver._iter_count, 0)
+
+                # solver options changed after the workers were started are used
+                solver.options['maxiter'] = 1
+                solver.options['err_on_non_converge'] = True
+                prob.set_val('OD0.fs.T', 700., units='degR')
+                with self.assertRaises(om.AnalysisError):
+                    prob.run_model()
+
+    def test_parallel_od_coupled(self):
+        serial = run_mp_duct(coupled=True)
+        prob = run_mp_duct(coupled=True, parallel_od=True, od_num_procs=2)
+
+        self.assertEqual(prob.model.od_pnts.nonlinear_solver.waves, [['OD0', 'OD1'], ['OD2']])
+        assert_near_equal(prob.get_val('OD2.fs.P', units='psi'), 13.*0.98, 1e-8)
+        self.check_results(prob, serial)
+
+
+class ElementThermoTestCase(unittest.TestCase):
+
+    def run_burner(self, **kwargs):
+        prob = om.Problem(BurnerPnt(**kwargs), reports=False)
+        prob.setup(check=False)
+        prob.set_solver_print(level=-1)
+
+        prob.set_val('fs.P', 200., units='psi')
+        prob.set_val('fs.T', 1400., units='degR')
+        prob.set_val('fs.W', 50., units='lbm/s')
+        prob.set_val('duct.dPqP', 0.02)
+        with warnings.catch_warnings(record=True) as w:
+            warnings.simplefilter('always')
+            prob.run_model()
+
+        frozen_warnings = [str(warn.message) for warn in w if 'frozen thermo' in str(warn.message)]
+        return prob, frozen_warnings
+
+    def test_frozen_cold_section(self):
+        cea, _ = self.run_burner(thermo_method='CEA')
+        mixed, mixed_warnings = self.run_burner(thermo_method='CEA',
+                                                element_thermo_methods={'fs': 'FROZEN', 'duct': 'FROZEN'})
+
+        self.assertEqual(mixed.model.duct.options['thermo_method'], 'FROZEN')
+        self.assertEqual(mixed.model.burner.options['thermo_method'], 'CEA')
+        self.assertEqual(mixed_warnings, [])
+        # the cold air barely dissociates, so only the burner needs the equilibrium
+        for var in ('duct.Fl_O:tot:P', 'burner.Fl_O:tot:T', 'burner.Fl_O:stat:area'):
+            assert_near_equal(mixed.get_val(var), cea.get_val(var), 1e-5)
+
+        # a frozen burner can not form the combustion products
+        frozen, frozen_warnings = self.run_burner(thermo_method='FROZEN')
+        self.assertGreater(abs(frozen.get_val('burner.Fl_O:tot:T')[0] - cea.get_val('burner.Fl_O:tot:T')[0]), 100.)
+        self.assertTrue(frozen_warnings)
+
+    def test_unknown_element(self):
+        prob = om.Problem(BurnerPnt(element_thermo_methods={'compressor': 'FROZEN'}), reports=False)
+        with self.assertRaises(ValueError) as cm:
+            prob.setup(check=False)
+        self.assertIn('element_thermo_methods is given for `compressor`, but there is no element with that name.',
+                      str(cm.exception))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,139 @@
+import io
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import openmdao.api as om
+
+from pycycle.mp_cycle import Cycle
+from pycycle.thermo.cea.species_data import janaf
+from pycycle.elements.flow_start import FlowStart
+from pycycle.elements.duct import Duct
+from pycycle.profiling import SetupProfiler, RunProfiler, profile_setup, profile_imports
+
+
+def _build_problem():
+    prob = om.Problem()
+    prob.model = cycle = Cycle()
+    cycle.options['thermo_method'] = 'CEA'
+    cycle.options['thermo_data'] = janaf
+
+    cycle.add_subsystem('flow_start', FlowStart())
+    cycle.add_subsystem('duct', Duct())
+    cycle.pyc_connect_flow('flow_start.Fl_O', 'duct.Fl_I')
+    return prob
+
+
+class SetupProfilerTestCase(unittest.TestCase):
+
+    def test_profile_setup(self):
+        setup = Cycle.__dict__['setup']
+        prob = _build_problem()
+
+        prof = profile_setup(prob, memory=True)
+
+        # instrumentation is removed on exit
+        self.assertIs(Cycle.__dict__['setup'], setup)
+
+        phases = prof.phase_totals()
+        for phase in ('flow_graph', 'setup', 'output_ports', 'problem_setup', 'final_setup'):
+            self.assertIn(phase, phases)
+
+        paths = {(r['phase'], r['path']) for r in prof.records}
+        self.assertIn(('setup', 'flow_start'), paths)
+        self.assertIn(('output_ports', 'duct'), paths)
+
+        # self times add up to the total
+        self.assertAlmostEqual(sum(p['self_time'] for p in phases.values()), prof.total_time, places=6)
+
+        stream = io.StringIO()
+        prof.report(out_stream=stream)
+        self.assertIn('flow_graph', stream.getvalue())
+
+        with tempfile.TemporaryDirectory() as tmp:
+            filename = os.path.join(tmp, 'prof.json')
+            prof.to_json(filename)
+            with open(filename) as f:
+                data = json.load(f)
+        self.assertEqual(len(data['records']), len(prof.records))
+
+    def test_exception_restores(self):
+        setup = Cycle.__dict__['setup']
+        with self.assertRaises(RuntimeError):
+            with SetupProfiler():
+                self.assertIsNot(Cycle.__dict__['setup'], setup)
+                raise RuntimeError()
+        self.assertIs(Cycle.__dict__['setup'], setup)
+
+    def test_missing_openmdao_methods(self):
+        # a version of openmdao without the private methods the profiler wraps
+        class Group(om.Group):
+            pass
+
+        prob = _build_problem()
+        with mock.patch('pycycle.profiling.Group', Group), \
+                mock.patch('pycycle.profiling.om.MetaModelStructuredComp', Group):
+            with self.assertWarns(UserWarning) as cm:
+                prof = profile_setup(prob)
+        self.assertEqual(prof.skipped, ['Group._setup_var_data', 'Group._setup_connections', 'Group._setup',
+                                        'Group._final_setup'])
+        self.assertIn('Group._setup_connections, Group._setup', str(cm.warning))
+
+        # the pyCycle phases are still timed
+        phases = prof.phase_totals()
+        for phase in ('flow_graph', 'setup', 'output_ports'):
+            self.assertIn(phase, phases)
+        for phase in ('problem_setup', 'final_setup', 'connections', 'map_training'):
+            self.assertNotIn(phase, phases)
+        self.assertAlmostEqual(sum(p['self_time'] for p in phases.values()), prof.total_time, places=6)
+
+    def test_profile_imports(self):
+        total, entries = profile_imports('pycycle.constants', top=5)
+        self.assertGreater(total, 0.)
+        self.assertLessEqual(len(entries), 5)
+        self.assertTrue(any(name == 'pycycle.constants' for name, _, _ in profile_imports('pycycle.constants', top=None)[1]))
+
+
+class RunProfilerTestCase(unittest.TestCase):
+
+    def test_run_profile(self):
+        prob = _build_problem()
+        prob.setup()
+        prob.set_solver_print(level=-1)
+        prob.final_setup()
+
+        with RunProfiler(prob) as prof:
+            prob.run_model()
+
+        by_class = prof.by_class()
+        self.assertIn(('ChemEq', 'linearize'), by_class)
+        self.assertGreater(by_class['ChemEq', 'apply_nonlinear']['calls'], 0)
+
+        by_element = prof.by_element()
+        self.assertIn('flow_start', by_element)
+        self.assertIn('duct', by_element)
+        self.assertTrue(all(r['element'] in ('flow_start', 'duct') for r in prof.records))
+
+        solvers = prof.solvers()
+        self.assertEqual(solvers['flow_start.totals.base_thermo.chem_eq']['solver'], 'NewtonSolver')
+        self.assertGreater(solvers['flow_start.totals.base_thermo.chem_eq']['iterations'], 0)
+
+        data = json.loads(json.dumps(prof.to_json()))
+        self.assertEqual(len(data['records']), len(prof.records))
+
+        stream = io.StringIO()
+        prof.report(out_stream=stream)
+        self.assertIn('ChemEq', stream.getvalue())
+
+        # instrumentation is removed on exit
+        for system in prob.model.system_iter(recurse=True):
+            self.assertNotIn('compute', system.__dict__)
+            self.assertNotIn('linearize', system.__dict__)
+            if system.nonlinear_solver is not None:
+                self.assertNotIn('solve', system.nonlinear_solver.__dict__)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,208 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+import openmdao.api as om
+from openmdao.utils.assert_utils import assert_near_equal
+
+from pycycle.mp_cycle import Cycle, MPCycle
+from pycycle.thermo.cea.species_data import janaf
+from pycycle.elements.flight_conditions import FlightConditions
+from pycycle.elements.duct import Duct
+from pycycle.sweep import continuation_chains, run_sweep, SweepTable
+
+
+class InletPnt(Cycle):
+
+    def setup(self):
+        self.options['thermo_method'] = 'CEA'
+        self.options['thermo_data'] = janaf
+
+        self.add_subsystem('fc', FlightConditions())
+        self.add_subsystem('duct', Duct())
+        self.pyc_connect_flow('fc.Fl_O', 'duct.Fl_I')
+
+        if self.options['design']:
+            self.set_input_defaults('duct.MN', 0.4)
+
+        super().setup()
+
+
+class MPInlet(MPCycle):
+
+    def setup(self):
+        self.pyc_add_pnt('DESIGN', InletPnt(design=True))
+        self.pyc_add_pnt('OD', InletPnt(design=False))
+        self.pyc_use_default_des_od_conns()
+
+
+class MPInlets(MPInlet):
+
+    def setup(self):
+        super().setup()
+        self.pyc_add_pnt('OD1', InletPnt(design=False))
+
+
+def build_problem(cls=MPInlet, **kwargs):
+    prob = om.Problem(cls(**kwargs), reports=False)
+    prob.setup(check=False)
+    prob.set_solver_print(level=-1)
+
+    for pnt in ('DESIGN', 'OD'):
+        prob.set_val(f'{pnt}.fc.MN', 0.5)
+        prob.set_val(f'{pnt}.fc.alt', 10000., units='ft')
+        prob.set_val(f'{pnt}.fc.W', 100., units='lbm/s')
+
+    prob.run_model()
+    return prob
+
+
+ENVELOPE = [(MN, alt, dTs, W) for alt in (0., 10000.) for dTs in (0., 15.)
+            for MN in (0.3, 0.5) for W in (80., 100.)]
+
+
+class ContinuationChainsTestCase(unittest.TestCase):
+
+    def test_orders(self):
+        points = np.array(ENVELOPE)
+
+        chains = continuation_chains(points, order='alt', start=(0.5, 10000., 0., 100.))
+        # one chain per (alt, dTs), the reference altitude first
+        self.assertEqual(len(chains), 4)
+        self.assertEqual(sorted(i for c in chains for i in c), list(range(len(points))))
+        first = points[chains[0]]
+        assert_near_equal(first[:, 1], np.full(4, 10000.))
+        assert_near_equal(first[:, 2], np.zeros(4))
+        # starting nearest the reference and sweeping the throttle back and forth
+        assert_near_equal(first[:, [0, 3]], np.array([[0.5, 100.], [0.5, 80.], [0.3, 80.], [0.3, 100.]]))
+
+        chains = continuation_chains(points, order='mach')
+        self.assertEqual(len(chains), 4)
+        for chain in chains:
+            self.assertEqual(len(set(points[chain, 0])), 1)
+
+        chains = continuation_chains(points, order='nearest', num_chains=3)
+        self.assertEqual([len(c) for c in chains], [6, 5, 5])
+        self.assertEqual(chains[0][0], 0)
+
+        self.assertEqual(continuation_chains(points, order='given'), [list(range(len(points)))])
+
+        with self.assertRaises(ValueError) as cm:
+            continuation_chains(points, order='spiral')
+        self.assertIn("Unknown sweep order 'spiral'", str(cm.exception))
+
+
+class RunSweepTestCase(unittest.TestCase):
+
+    def test_sweep(self):
+        prob = build_problem()
+        MN_ref = prob.get_val('OD.duct.Fl_O:stat:MN').copy()
+
+        outputs = ['OD.duct.Fl_O:stat:MN', ('OD.fc.Fl_O:tot:P', 'psi')]
+        serial = run_sweep(prob, 'OD', ENVELOPE, throttle='OD.fc.W', throttle_units='lbm/s', outputs=outputs)
+
+        self.assertEqual(serial.columns, ['MN', 'alt', 'dTs', 'throttle', 'OD.duct.Fl_O:stat:MN', 'OD.fc.Fl_O:tot:P'])
+        self.assertEqual(len(serial), len(ENVELOPE))
+        self.assertTrue(np.all(serial.converged))
+        self.assertTrue(np.all(serial.iterations > 0))
+
+        # rows are in the given order, and each one matches a standalone run of the point
+        prob.set_val('OD.fc.MN', 0.3)
+        prob.set_val('OD.fc.alt', 0., units='ft')
+        prob.set_val('OD.fc.dTs', 15., units='degR')
+        prob.set_val('OD.fc.W', 80., units='lbm/s')
+        prob.run_model()
+        row = ENVELOPE.index((0.3, 0., 15., 80.))
+        assert_near_equal(serial['OD.duct.Fl_O:stat:MN'][row], prob.get_val('OD.duct.Fl_O:stat:MN')[0], 1e-6)
+        assert_near_equal(serial['OD.fc.Fl_O:tot:P'][row], prob.get_val('OD.fc.Fl_O:tot:P', units='psi')[0], 1e-6)
+
+        # the problem is left as it was found
+        prob = build_problem()
+        run_sweep(prob, 'OD', ENVELOPE[:4], throttle='OD.fc.W', throttle_units='lbm/s', outputs=outputs)
+        assert_near_equal(prob.get_val('OD.fc.MN'), 0.5, 1e-12)
+        assert_near_equal(prob.get_val('OD.duct.Fl_O:stat:MN'), MN_ref, 1e-12)
+
+        # the results do not depend on the number of processes
+        for proc_input, start in ((prob, None), (build_problem, (0.5, 10000., 0., 100.))):
+            parallel = run_sweep(proc_input, 'OD', ENVELOPE, throttle='OD.fc.W', throttle_units='lbm/s',
+                                 outputs=outputs, num_procs=2, start=start)
+            assert_near_equal(parallel.data, serial.data, 1e-10)
+            assert_near_equal(parallel.chain, serial.chain)
+
+    def test_failed_point(self):
+        prob = build_problem()
+        # the duct chokes at the second point
+        points = [(0.5, 10000., 0., 100.), (0.5, 10000., 0., 400.), (0.5, 10000., 0., 90.)]
+        table = run_sweep(prob, 'OD', points, throttle='OD.fc.W', throttle_units='lbm/s',
+                          outputs=['OD.duct.Fl_O:stat:MN'], order='given')
+
+        self.assertEqual(table.converged.tolist(), [True, False, True])
+        self.assertTrue(np.isnan(table['OD.duct.Fl_O:stat:MN'][1]))
+        # the next point restarts from the last converged one
+        self.assertLess(table.iterations[2], 20)
+
+        # the point solvers are left as they were
+        self.assertFalse(prob.model.OD.fc.conv.nonlinear_solver.options['err_on_non_converge'])
+
+        # the columns are still there when no point converges
+        table = run_sweep(prob, 'OD', points[1:2], throttle='OD.fc.W', throttle_units='lbm/s',
+                          outputs=['OD.duct.Fl_O:stat:MN', 'OD.duct.Fl_O:tot:composition'])
+        num_element = prob.get_val('OD.duct.Fl_O:tot:composition').size
+        self.assertEqual(table.columns[4:], ['OD.duct.Fl_O:stat:MN'] +
+                         [f'OD.duct.Fl_O:tot:composition[{j}]' for j in range(num_element)])
+        self.assertFalse(np.any(table.converged))
+        self.assertTrue(np.all(np.isnan(table.data[:, 4:])))
+
+    def test_parallel_od(self):
+        # the off-design points of the model run in worker processes of their own
+        points = ENVELOPE + [(0.5, 10000., 0., 400.)]
+        kwargs = dict(throttle='OD.fc.W', throttle_units='lbm/s', outputs=['OD.duct.Fl_O:stat:MN'])
+        serial = run_sweep(build_problem(MPInlets), 'OD', points, **kwargs)
+
+        prob = build_problem(MPInlets, parallel_od=True, od_num_procs=2)
+        points_solver = prob.model.od_pnts.nonlinear_solver
+        for num_procs in (1, 2):
+            with self.subTest(num_procs=num_procs):
+                table = run_sweep(prob, 'OD', points, num_procs=num_procs, **kwargs)
+
+                self.assertEqual(table.converged.tolist(), [True]*len(ENVELOPE) + [False])
+                assert_near_equal(table.data, serial.data, 1e-10)
+                # the iterations are those of the point solvers of the sweep process
+                self.assertTrue(np.all(table.iterations > 0))
+                if num_procs > 1:
+                    # the sweep processes ran the points themselves, rather than sharing the workers
+                    # forked from this process
+                    self.assertEqual(points_solver._workers, [])
+                # the points of the model run in their own workers again after the sweep
+                self.assertEqual(points_solver.options['num_procs'], 2)
+
+    def test_table_io(self):
+        prob = build_problem()
+        table = run_sweep(prob, 'OD', [(0.5, 10000., 0.), (0.4, 10000., 0.)], outputs=['OD.duct.Fl_O:stat:MN'])
+        self.assertTrue(np.all(np.isnan(table['throttle'])))
+
+        with tempfile.TemporaryDirectory() as tmp:
+            filename = os.path.join(tmp, 'sweep.npz')
+            table.save(filename)
+            loaded = SweepTable.load(filename)
+            self.assertEqual(loaded.columns, table.columns)
+            assert_near_equal(loaded['OD.duct.Fl_O:stat:MN'], table['OD.duct.Fl_O:stat:MN'])
+
+            filename = os.path.join(tmp, 'sweep.csv')
+            table.to_csv(filename)
+            with open(filename) as f:
+                self.assertEqual(f.readline().strip().split(',')[-5:],
+                                 ['OD.duct.Fl_O:stat:MN', 'converged', 'chain', 'iterations', 'time'])
+
+        with self.assertRaises(KeyError):
+            table['perf.Fn']
+
+        with self.assertRaises(ValueError) as cm:
+            run_sweep(prob, 'OD', [(0.5, 10000., 0., 1.)])
+        self.assertEqual(str(cm.exception), 'Throttle values were given for the sweep points, but no throttle variable.')
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,114 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import openmdao.api as om
+
+from pycycle.mp_cycle import Cycle
+from pycycle.thermo.cea.species_data import janaf
+from pycycle.elements.flow_start import FlowStart
+from pycycle.elements.duct import Duct
+from pycycle.telemetry import SolverTelemetry, read_telemetry, summarize
+
+
+class SolverTelemetryTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.prob = prob = om.Problem()
+        prob.model = cycle = Cycle()
+        cycle.options['thermo_method'] = 'CEA'
+        cycle.options['thermo_data'] = janaf
+
+        cycle.add_subsystem('flow_start', FlowStart())
+        cycle.add_subsystem('duct', Duct())
+        cycle.pyc_connect_flow('flow_start.Fl_O', 'duct.Fl_I')
+
+        prob.setup()
+        prob.set_solver_print(level=-1)
+        prob.set_val('flow_start.P', 17., units='psi')
+        prob.set_val('flow_start.T', 500., units='degR')
+        prob.set_val('flow_start.W', 100., units='lbm/s')
+        prob.set_val('duct.dPqP', 0.02)
+
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _run(self, filename, fmt=None):
+        with SolverTelemetry(self.prob, filename, fmt=fmt, tag='first') as telemetry:
+            self.prob.run_model()
+            telemetry.tag = 'second'
+            self.prob.run_model()
+
+        runs, solves = read_telemetry(filename, fmt)
+
+        self.assertEqual([r['run'] for r in runs], [0, 1])
+        self.assertEqual([r['tag'] for r in runs], ['first', 'second'])
+        self.assertEqual(sum(r['solves'] for r in runs), len(solves))
+        self.assertEqual(runs[0]['unconverged'], 0)
+
+        chem_eq = [s for s in solves if s['path'] == 'flow_start.totals.base_thermo.chem_eq']
+        self.assertTrue(chem_eq)
+        for s in chem_eq:
+            self.assertEqual(s['solver'], 'NewtonSolver')
+            self.assertTrue(s['converged'])
+            self.assertEqual(s['parent'], 'flow_start.totals')
+            self.assertEqual(s['depth'], 1)
+            # one norm for the initial residual and one per iteration
+            self.assertEqual(len(s['residuals']), s['iterations'] + 1)
+            self.assertLessEqual(s['residuals'][-1], s['residuals'][0])
+
+        summary = summarize(filename, fmt)
+        self.assertEqual(summary['flow_start.totals.base_thermo.chem_eq']['solves'], len(chem_eq))
+
+        # instrumentation is removed on exit
+        self.assertNotIn('run_solve_nonlinear', self.prob.model.__dict__)
+
+        return runs, solves
+
+    def test_jsonl(self):
+        self._run(os.path.join(self.tmp.name, 'telemetry.jsonl'))
+
+    def test_sqlite(self):
+        filename = os.path.join(self.tmp.name, 'telemetry.db')
+        runs, solves = self._run(filename)
+
+        # a second session appends
+        with SolverTelemetry(self.prob, filename):
+            self.prob.run_model()
+        runs2, solves2 = read_telemetry(filename)
+        self.assertEqual(len(runs2), 3)
+        self.assertEqual(len(solves2), len(solves) + runs2[-1]['solves'])
+
+    def test_missing_solver_attributes(self):
+        # a version of openmdao whose solvers have renamed the private attributes telemetry uses
+        filename = os.path.join(self.tmp.name, 'telemetry.db')
+        with mock.patch('pycycle.telemetry._NORM_METHOD', '_renamed_get_norm'), \
+                mock.patch('pycycle.telemetry._ITER_COUNT', '_renamed_count'):
+            with self.assertWarns(UserWarning) as cm:
+                with SolverTelemetry(self.prob, filename):
+                    self.prob.run_model()
+        self.assertIn('NewtonSolver._renamed_count', str(cm.warning))
+        self.assertIn('NewtonSolver._renamed_get_norm', str(cm.warning))
+
+        runs, solves = read_telemetry(filename)
+        chem_eq = [s for s in solves if s['path'] == 'flow_start.totals.base_thermo.chem_eq']
+        self.assertTrue(chem_eq)
+        for s in chem_eq:
+            # the solves are still logged, without what they can't be told
+            self.assertIsNone(s['converged'])
+            self.assertEqual(s['residuals'], [])
+            self.assertEqual(s['iterations'], 0)
+            self.assertGreater(s['time'], 0.)
+        self.assertEqual(runs[0]['unconverged'], 0)
+        self.assertEqual(summarize(solves)['flow_start.totals.base_thermo.chem_eq']['unconverged'], 0)
+
+    def test_bad_fmt(self):
+        with self.assertRaises(ValueError):
+            SolverTelemetry(self.prob, 'telemetry.out', fmt='csv')
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,3 +1,6 @@
+from collections import OrderedDict
+import weakref
+
 import numpy as np
 
 import openmdao.api as om
@@ -7,6 +10,8 @@ from pycycle.constants import P_REF, R_UNIVERSAL_ENG, MIN_VALID_CONCENTRATION, C
 from pycycle.thermo.cea import species_data
 from pycycle.thermo.cea.props_rhs import PropsRHS
 from pycycle.thermo.cea.props_calcs import PropsCalcs
+from pycycle.thermo.cea.props_solve import PropsSolve
+from pycycle.thermo.cea.vec_utils import node_shape, block_rows_cols
 
 
 
@@ -14,27 +19,27 @@ class ThermoCalcs(om.Group):
 
     def initialize(self):
         self.options.declare('thermo', desc='thermodynamic data object', recordable=False)
+        self.options.declare('num_nodes', default=1, types=int,
+                             desc='number of independent states to compute properties for')
 
     def setup(self):
         thermo = self.options['thermo']
+        num_nodes = self.options['num_nodes']
 
-        num_element = thermo.num_element
-
-        self.add_subsystem('TP2ls', PropsRHS(thermo), promotes_inputs=('T', 'n', 'n_moles', 'composition'))
+        self.add_subsystem('TP2ls', PropsRHS(thermo, num_nodes=num_nodes), promotes_inputs=('T', 'n', 'n_moles', 'composition'))
 
-        ne1 = num_element+1
-        self.add_subsystem('ls2t', om.LinearSystemComp(size=ne1))
-        self.add_subsystem('ls2p', om.LinearSystemComp(size=ne1))
+        # both systems share lhs_TP, so they are solved together with a single factorization per node
+        self.add_subsystem('ls2tp', PropsSolve(thermo=thermo, num_nodes=num_nodes))
 
-        self.add_subsystem('tp2props', PropsCalcs(thermo=thermo),
+        self.add_subsystem('tp2props', PropsCalcs(thermo=thermo, num_nodes=num_nodes),
                            promotes_inputs=['n', 'n_moles', 'T', 'P'],
                            promotes_outputs=['h', 'S', 'gamma', 'Cp', 'Cv', 'rho', 'R']
                            )
-        self.connect('TP2ls.lhs_TP', ['ls2t.A', 'ls2p.A'])
-        self.connect('TP2ls.rhs_T', 'ls2t.b')
-        self.connect('TP2ls.rhs_P', 'ls2p.b')
-        self.connect('ls2t.x', 'tp2props.result_T')
-        self.connect('ls2p.x', 'tp2props.result_P')
+        self.connect('TP2ls.lhs_TP', 'ls2tp.lhs_TP')
+        self.connect('TP2ls.rhs_T', 'ls2tp.rhs_T')
+        self.connect('TP2ls.rhs_P', 'ls2tp.rhs_P')
+        self.connect('ls2tp.result_T', 'tp2props.result_T')
+        self.connect('ls2tp.result_P', 'tp2props.result_P')
 
 
 def _resid_weighting(n):
@@ -42,62 +47,210 @@ def _resid_weighting(n):
     return (1 / (1 + np.exp(-1e5 * n)) - .5) * 2
 
 
+class EquilibriumCache(object):
+    """
+    LRU cache of converged equilibrium states (n, pi), used to warm start ChemEq solves.
+
+    States are stored under a key quantized to bins of `T_tol`, `lnP_tol` and `b0_tol`
+    (relative to the largest element of b0), so near identical states share one entry.
+    Lookups return the nearest cached neighbour, measured in those same bin units.
+    The scaled states are kept in a preallocated array, one row per slot, so a lookup
+    is a single vectorized distance computation.
+    """
+
+    def __init__(self, maxsize=512, T_tol=5., lnP_tol=0.02, b0_tol=1e-3):
+        self.maxsize = maxsize
+        self.T_tol = T_tol
+        self.lnP_tol = lnP_tol
+        self.b0_tol = b0_tol
+
+        # key -> slot, in LRU order
+        self._entries = OrderedDict()
+        self._keys = [None]*maxsize
+        self._values = [None]*maxsize
+        self._states = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _scaled_state(self, T, P, b0):
+        return np.hstack((T/self.T_tol, np.log(P)/self.lnP_tol, b0/(self.b0_tol*np.max(np.abs(b0)))))
+
+    def store(self, T, P, b0, n, pi):
+        state = self._scaled_state(T, P, b0)
+        key = tuple(np.round(state).astype(int))
+
+        if self._states is None:
+            self._states = np.empty((self.maxsize, len(state)))
+
+        slot = self._entries.get(key)
+        if slot is None:
+            if len(self._entries) < self.maxsize:
+                slot = len(self._entries)
+            else:
+                # reuse the slot of the least recently used entry
+                _, slot = self._entries.popitem(last=False)
+            self._entries[key] = slot
+            self._keys[slot] = key
+
+        self._entries.move_to_end(key)
+        self._states[slot] = state
+        self._values[slot] = (n.copy(), pi.copy())
+
+    def nearest(self, T, P, b0):
+        """returns the cached (n, pi) closest to the given state, or None if the cache is empty"""
+        if not self._entries:
+            return None
+
+        state = self._scaled_state(T, P, b0)
+        slot = np.argmin(np.sum(np.abs(self._states[:len(self._entries)] - state), axis=1))
+
+        self._entries.move_to_end(self._keys[slot])
+        return self._values[slot]
+
+
+# caches of converged equilibrium states, one per thermo data object and shared by every ChemEq using it.
+# They are kept here rather than on the (shared, read-only) Properties, and go away with it.
+_EQ_CACHES = weakref.WeakKeyDictionary()
+
+
+def equilibrium_cache(thermo):
+    """Returns the cache of converged equilibrium states for the given Properties, creating it if needed"""
+    try:
+        return _EQ_CACHES[thermo]
+    except KeyError:
+        eq_cache = _EQ_CACHES[thermo] = EquilibriumCache()
+        return eq_cache
+
+
 class ChemEq(om.ImplicitComponent):
     """ Find the equilibirum composition for a given gaseous mixture """
 
     def guess_nonlinear(self, inputs, outputs, resids):
         norm = resids.get_norm()
         if norm > 1e-2 or norm==0.0 or np.any(outputs['n'] < 0):
-            outputs['n'] = self.n_init
+            if self.options['warm_start']:
+                self._warm_start(inputs, outputs)
+            else:
+                outputs['n'] = self.n_init
+
+    def _warm_start(self, inputs, outputs):
+        """ start each node from the nearest converged state in the shared cache, if there is one """
+        thermo = self.options['thermo']
+        num_nodes = self.options['num_nodes']
+
+        T = inputs['T']
+        P = inputs['P']
+        composition = inputs['composition'].reshape((num_nodes, thermo.num_element))
+        n = np.array(outputs['n']).reshape((num_nodes, thermo.num_prod))
+        pi = np.array(outputs['pi']).reshape((num_nodes, thermo.num_element))
+
+        n[:] = self.n_init
+        for i in range(num_nodes):
+            guess = self._eq_cache.nearest(T[i], P[i], composition[i])
+            if guess is not None:
+                n[i], pi[i] = guess
+
+        outputs['n'] = n.reshape(outputs['n'].shape)
+        outputs['pi'] = pi.reshape(outputs['pi'].shape)
 
     def initialize(self):
         self.options.declare('thermo', desc='thermodynamic data object', recordable=False)
+        self.options.declare('num_nodes', default=1, types=int,
+                             desc='number of independent equilibrium states solved together in this component')
+        self.options.declare('prune_trace_species', default=False, types=bool,
+                             desc='If True, the newton linear solves leave out the trace species of the nodes close '
+                                  'enough to convergence for them to be removed, instead of solving for the full set '
+                                  'of products')
+        self.options.declare('warm_start', default=False, types=bool,
+                             desc='If True, converged states are stored in a cache on the thermo object (shared by every '
+                                  'ChemEq using it) and new solves start from the nearest cached state instead of n_init')
+        self.options.declare('formulation', default='full', values=('full', 'reduced'),
+                             desc='full: newton iteration on all the species concentrations and lagrange multipliers. '
+                                  'reduced: the species corrections are eliminated and only an (num_element+1) system is '
+                                  'solved for each iteration (the CEA reduced Gordon-McBride iteration). '
+                                  'The reduced iteration always runs in `solve_nonlinear`, with its settings in `fused_newton_options`')
+        self.options.declare('fused_newton', default=False, types=bool,
+                             desc='If True, the equilibrium is converged by a newton iteration written directly on numpy '
+                                  'arrays in `solve_nonlinear`, instead of an OpenMDAO NewtonSolver. '
+                                  'Its settings are in `fused_newton_options`')
+
+        self.fused_newton_options = om.OptionsDictionary()
+        self.fused_newton_options.declare('maxiter', default=100, types=int, desc='maximum number of newton iterations')
+        self.fused_newton_options.declare('atol', default=1e-7, desc='absolute tolerance on the (scaled) residual norm of each node. '
+                                          'For the reduced formulation, the tolerance on the relative corrections (see `_newton_reduced`)')
+        self.fused_newton_options.declare('rtol', default=1e-7, desc='tolerance on the residual norm of each node, relative to its initial norm')
+        self.fused_newton_options.declare('stall_limit', default=4, types=int,
+                                          desc='number of iterations with an unchanged relative norm (within stall_tol) after which a node is stopped')
+        self.fused_newton_options.declare('stall_tol', default=1e-10, desc='threshold below which the relative norm is considered unchanged')
+        self.fused_newton_options.declare('iprint', default=0, types=int,
+                                          desc='0 reports nodes that fail to converge, 1 also reports the iteration count, -1 is silent')
 
     def setup(self):
 
-        newton = self.nonlinear_solver = om.NewtonSolver()
-        newton.options['maxiter'] = 100
-        newton.options['iprint'] = 2
-        newton.options['atol'] = 1e-7
-        newton.options['rtol'] = 1e-7
-        newton.options['stall_limit'] = 4
-        newton.options['stall_tol'] = 1e-10
-        newton.options['solve_subsystems'] = True
-        newton.options['reraise_child_analysiserror'] = False
-
-        self.options['assembled_jac_type'] = 'dense'
-        self.linear_solver = om.DirectSolver(assemble_jac=True)
-
-        ln_bt = newton.linesearch = om.BoundsEnforceLS()
-        # ln_bt = newton.linesearch = om.ArmijoGoldsteinLS()
-        # ln_bt.options['maxiter'] = 2
-        ln_bt.options['iprint'] = -1
-        # ln_bt.options['print_bound_enforce'] = True
+        num_nodes = self.options['num_nodes']
+
+        if not (self.options['fused_newton'] or self.options['formulation'] == 'reduced'):
+            newton = self.nonlinear_solver = om.NewtonSolver()
+            newton.options['maxiter'] = 100
+            newton.options['iprint'] = 2
+            newton.options['atol'] = 1e-7
+            newton.options['rtol'] = 1e-7
+            newton.options['stall_limit'] = 4
+            newton.options['stall_tol'] = 1e-10
+            newton.options['solve_subsystems'] = True
+            newton.options['reraise_child_analysiserror'] = False
+
+            ln_bt = newton.linesearch = om.BoundsEnforceLS()
+            # ln_bt = newton.linesearch = om.ArmijoGoldsteinLS()
+            # ln_bt.options['maxiter'] = 2
+            ln_bt.options['iprint'] = -1
+            # ln_bt.options['print_bound_enforce'] = True
+
+        # convergence of the last fused newton solve, per node
+        self.newton_iters = 0
+        self.newton_converged = np.zeros(num_nodes, dtype=bool)
+
+        if self.options['prune_trace_species']:
+            # smaller dense solves over the active species only, see `solve_linear`
+            self.linear_solver = om.LinearUserDefined()
+        else:
+            # the nodes are independent, so the Jacobian is block diagonal
+            # and a sparse factorization is effectively a batched dense one
+            if num_nodes == 1:
+                self.options['assembled_jac_type'] = 'dense'
+            else:
+                self.options['assembled_jac_type'] = 'csc'
+            self.linear_solver = om.DirectSolver(assemble_jac=True)
+
+        thermo = self.options['thermo']
 
         # Once the concentration of a species reaches its minimum, we
         # can essentially remove it from the problem. This switch controls
-        # whether to do this.
-        self.remove_trace_species = False
+        # whether to do this. It is tracked separately for each node.
+        self.remove_trace_species = np.zeros(num_nodes, dtype=bool)
+        self._trace = np.zeros((num_nodes, thermo.num_prod), dtype=bool)
 
         # multiply a damping function that scales down the residual for trace species
         self.use_trace_damping = True
 
-        thermo = self.options['thermo']
-
         num_prod = thermo.num_prod
         num_element = thermo.num_element
 
         # Input vars
-        self.add_input('composition', val=thermo.b0, desc='moles of atoms present in mixture')
+        self.add_input('composition', val=np.tile(thermo.b0, num_nodes).reshape(node_shape(num_nodes, num_element)),
+                       desc='moles of atoms present in mixture')
 
-        self.add_input('P', val=1.0, units="bar", desc="Pressure")
+        self.add_input('P', val=1.0, units="bar", desc="Pressure", shape=num_nodes)
 
-        self.add_input('T', val=400., units="degK", desc="Temperature")
+        self.add_input('T', val=400., units="degK", desc="Temperature", shape=num_nodes)
 
         # State vars
         self.n_init = np.ones(num_prod) / num_prod / 10  # initial guess for n
+        if num_nodes > 1:
+            self.n_init = np.tile(self.n_init, (num_nodes, 1))
 
-        self.add_output('n', shape=num_prod,
+        self.add_output('n', shape=node_shape(num_nodes, num_prod),
                         val=self.n_init,
                         desc="mole fractions of the mixture",
                         lower=MIN_VALID_CONCENTRATION,
@@ -105,17 +258,19 @@ class ChemEq(om.ImplicitComponent):
                         res_ref=10000.
                         )
 
-        self.add_output('pi', val=np.ones(num_element),
+        self.add_output('pi', val=np.ones(node_shape(num_nodes, num_element)),
                         desc="modified lagrange multipliers from the Gibbs lagrangian")
 
         # Explicit Outputs
-        self.add_output('n_moles', lower=1e-10, val=0.034, shape=1,
+        self.add_output('n_moles', lower=1e-10, val=0.034, shape=num_nodes,
                         desc="1/molecular weight of gas")
 
-        # allocate the newton Jacobian
+        # allocate the newton Jacobian, one block per node
         self.size = size = num_prod + num_element
 
-        self._dRdy = np.zeros((size, size))
+        self._dRdy = np.zeros((num_nodes, size, size))
+
+        self._eq_cache = equilibrium_cache(thermo) if self.options['warm_start'] else None
         self._rhs = np.zeros(size)  # used for solve_linear
 
         # Cached stuff for speed
@@ -130,27 +285,42 @@ class ChemEq(om.ImplicitComponent):
         # self.deriv_options['type'] = 'fd'
         # self.deriv_options['step_size'] = 1e-5
 
-        self.declare_partials('n', ['n', 'pi', 'P', 'T'])
-        self.declare_partials('pi', ['n', 'composition'])
-        self.declare_partials('n_moles', 'n')
-        self.declare_partials('n_moles', 'n_moles', val=-1)
+        rows, cols = block_rows_cols(num_nodes, num_prod, num_prod)
+        self.declare_partials('n', 'n', rows=rows, cols=cols)
+        rows, cols = block_rows_cols(num_nodes, num_prod, num_element)
+        self.declare_partials('n', 'pi', rows=rows, cols=cols)
+        rows, cols = block_rows_cols(num_nodes, num_prod, 1)
+        self.declare_partials('n', ['P', 'T'], rows=rows, cols=cols)
+
+        rows, cols = block_rows_cols(num_nodes, num_element, num_prod)
+        self.declare_partials('pi', 'n', rows=rows, cols=cols)
+        ar = np.arange(num_nodes*num_element)
+        self.declare_partials('pi', 'composition', rows=ar, cols=ar, val=-1.)
+
+        rows, cols = block_rows_cols(num_nodes, 1, num_prod)
+        self.declare_partials('n_moles', 'n', rows=rows, cols=cols, val=1.)
+        ar = np.arange(num_nodes)
+        self.declare_partials('n_moles', 'n_moles', rows=ar, cols=ar, val=-1.)
 
     def apply_nonlinear(self, inputs, outputs, resids):
         thermo = self.options['thermo']
+        num_nodes = self.options['num_nodes']
+        num_prod = thermo.num_prod
+        num_element = thermo.num_element
 
         T = inputs['T']
         P = inputs['P'] / P_REF
-        composition = inputs['composition']
-        n = outputs['n']
-        n_moles = np.sum(n)
-        pi = outputs['pi']
+        composition = inputs['composition'].reshape((num_nodes, num_element))
+        n = outputs['n'].reshape((num_nodes, num_prod))
+        n_moles = np.sum(n, axis=1)
+        pi = outputs['pi'].reshape((num_nodes, num_element))
 
         # Output equation for n_moles
         resids['n_moles'] = n_moles - outputs['n_moles']
 
         try:
-            self.H0_T = H0_T = thermo.H0(T)
-            self.S0_T = S0_T = thermo.S0(T)
+            H0_T, S0_T, _, _, _, _ = thermo.evaluate_all(T)
+            self.H0_T, self.S0_T = H0_T, S0_T
         except:
             raise AnalysisError('Bad Temp')
             # T[:] = 500.
@@ -159,90 +329,313 @@ class ChemEq(om.ImplicitComponent):
         # np.seterr(all='warn')
         # self.mu = H0_T - S0_T + np.log(n) + np.log(P) - np.log(n_moles)
 
+        resids_n, resids_pi = self._gibbs_resids(P, composition, n, pi)
+
+        # this keeps our vector.__setitem__ calls to a minimum
+        resids['n'] = resids_n.reshape(outputs['n'].shape)
+        resids['pi'] = resids_pi.reshape(outputs['pi'].shape)
+
+        # the newton converges when its residuals get below atol, so the nodes that meet it are cached
+        # here, with the residual scaling the newton norm is taken with
+        if self._eq_cache is not None and self.nonlinear_solver is not None and not self.under_complex_step:
+            res_ref = self._var_rel2meta['n']['res_ref']
+            norms = np.sqrt(np.sum((resids_n.real/res_ref)**2, axis=1) + np.sum(resids_pi.real**2, axis=1) +
+                            resids['n_moles'].real**2)
+            converged = norms < self.nonlinear_solver.options['atol']
+            self._cache_states(np.nonzero(converged)[0], inputs, composition, n, pi)
+
+    def _cache_states(self, nodes, inputs, composition, n, pi):
+        for i in nodes:
+            self._eq_cache.store(inputs['T'][i], inputs['P'][i], composition[i], n[i], pi[i])
+
+    def _gibbs_resids(self, P, composition, n, pi):
+        """ Residuals of the Gibbs (n) and mass balance (pi) equations, on (num_nodes, ...) arrays.
+        Uses the H0_T and S0_T cached for the current temperatures and updates the trace species tracking."""
+
+        thermo = self.options['thermo']
+        n_moles = np.sum(n, axis=1)
+        H0_T, S0_T = self.H0_T, self.S0_T
+
         try:
             np.seterr(all='raise')
-            self.mu = H0_T - S0_T + np.log(n) + np.log(P) - np.log(n_moles)
+            self.mu = H0_T - S0_T + np.log(n) + np.log(P)[:, np.newaxis] - np.log(n_moles)[:, np.newaxis]
             np.seterr(all='warn')
         except:
             print('ChemEQ error in: ', self.pathname)
             print('n', n)
             print('P', P)
             print('n_moles', n_moles)
-            self.mu = H0_T - S0_T + np.log(n) + np.log(1e-5) - np.log(n_moles)
+            self.mu = H0_T - S0_T + np.log(n) + np.log(1e-5) - np.log(n_moles)[:, np.newaxis]
             np.seterr(all='warn')
 
-        resids_n = (self.mu - np.sum(pi * thermo.aij.T, axis=1))
+        resids_n = self.mu - pi.dot(thermo.aij)
         if self.use_trace_damping:
-            self.weights = _resid_weighting(n * n_moles)
+            self.weights = _resid_weighting(n * n_moles[:, np.newaxis])
             resids_n *= self.weights
 
         # Zero out resids when a concentration drops too low.
-        if self.remove_trace_species:
+        if np.any(self.remove_trace_species):
             # for j, composition in enumerate(n):
             #     if composition <= 1.0e-10:
             #         resids['n'][j] = 0.0
-            self._trace = np.where(n <= MIN_VALID_CONCENTRATION+1e-20)
+            self._trace = (n <= MIN_VALID_CONCENTRATION+1e-20) & self.remove_trace_species[:, np.newaxis]
             resids_n[self._trace] = 0.
 
-        # this keeps our vector.__setitem__ calls to a minimum
-        resids['n'] = resids_n
-
         # residuals from the conservation of mass
-        resids['pi'] = np.sum(thermo.aij * n, axis=1) - composition
+        resids_pi = n.dot(thermo.aij.T) - composition
+
+        self.remove_trace_species = np.linalg.norm(resids_n, axis=1) < 1e-4
+
+        return resids_n, resids_pi
+
+    def solve_nonlinear(self, inputs, outputs):
+        """ Only used when `fused_newton` is True, or `formulation` is 'reduced'.
+        Converges every node on plain numpy arrays, without an OpenMDAO solver.
+        T, P and composition are fixed during the solve, so the species properties are only evaluated once."""
+
+        thermo = self.options['thermo']
+        num_nodes = self.options['num_nodes']
+        num_prod = thermo.num_prod
+        num_element = thermo.num_element
+        options = self.fused_newton_options
+        res_ref = self._var_rel2meta['n']['res_ref']
 
-        if np.linalg.norm(resids['n']) < 1e-4:
-            self.remove_trace_species = True
+        P = inputs['P'] / P_REF
+        composition = inputs['composition'].reshape((num_nodes, num_element))
+
+        try:
+            self.H0_T, self.S0_T, _, _, _, _ = thermo.evaluate_all(inputs['T'])
+        except:
+            raise om.AnalysisError('Bad Temp')
+
+        def node_norms(n, pi):
+            flagged = self.remove_trace_species
+            resids_n, resids_pi = self._gibbs_resids(P, composition, n, pi)
+            if np.any(self.remove_trace_species & ~flagged):
+                # drop the trace species of newly flagged nodes right away
+                resids_n, resids_pi = self._gibbs_resids(P, composition, n, pi)
+            norms = np.sqrt(np.sum((resids_n/res_ref)**2, axis=1) + np.sum(resids_pi**2, axis=1))
+            return np.hstack((resids_n, resids_pi)), norms.real
+
+        n = outputs['n'].reshape((num_nodes, num_prod)).copy()
+        pi = outputs['pi'].reshape((num_nodes, num_element)).copy()
+
+        # same restart logic as guess_nonlinear
+        resids, norms = node_norms(n, pi)
+        if np.any(norms > 1e-2) or np.any(n.real < 0):
+            if self.options['warm_start']:
+                self._warm_start(inputs, outputs)
+            else:
+                outputs['n'] = self.n_init
+            n = outputs['n'].reshape((num_nodes, num_prod)).copy()
+            pi = outputs['pi'].reshape((num_nodes, num_element)).copy()
+            resids, norms = node_norms(n, pi)
+
+        if self.options['formulation'] == 'reduced':
+            n, pi, iters, converged = self._newton_reduced(P, composition, n, pi)
+            # leave the trace species tracking consistent with the converged state
+            node_norms(n, pi)
+            measure = 'corrections'
         else:
-            self.remove_trace_species = False
+            n, pi, iters, converged, norms = self._newton_full(n, pi, resids, norms, node_norms)
+            measure = 'norms'
+
+        self.newton_iters = iters
+        self.newton_converged = converged
+
+        if options['iprint'] > 0:
+            print(f'{self.pathname} fused newton: {iters} iterations')
+        if options['iprint'] >= 0 and not np.all(converged):
+            print(f'{self.pathname} fused newton failed to converge (or stalled on) nodes {np.nonzero(~converged)[0]} '
+                  f'in {iters} iterations' + (f', norms: {norms[~converged]}' if measure == 'norms' else ''))
+
+        outputs['n'] = n.reshape(outputs['n'].shape)
+        outputs['pi'] = pi.reshape(outputs['pi'].shape)
+        outputs['n_moles'] = np.sum(n, axis=1)
+
+        if self.options['warm_start'] and not self.under_complex_step:
+            self._cache_states(np.nonzero(converged)[0], inputs, composition, n, pi)
+
+    def _newton_full(self, n, pi, resids, norms, node_norms):
+        """ Newton iteration on the full (n, pi) equations of every node.
+        Steps that leave the bounds on n are clipped back to them, like the BoundsEnforceLS of the default solver.
+        Nodes are dropped from the iteration as they converge."""
+
+        num_nodes, num_prod = n.shape
+        options = self.fused_newton_options
+
+        norm0 = np.where(norms == 0., 1., norms)
+        converged = (norms < options['atol']) | (norms/norm0 < options['rtol'])
+
+        y = np.hstack((n, pi))
+        n = y[:, :num_prod]
+        pi = y[:, num_prod:]
+        iters = 0
+
+        # nodes are also dropped if their relative norm stalls, like the stall_limit of the default solver
+        stall_norm = norms/norm0
+        stall_count = np.zeros(num_nodes, dtype=int)
+        done = converged.copy()
+
+        while not np.all(done) and iters < options['maxiter']:
+            self._calc_dRdy(n, self.under_complex_step)
+            if np.any(self.remove_trace_species):
+                self._remove_trace_jac()
+            active = np.nonzero(~done)[0]
+
+            if self.options['prune_trace_species']:
+                self._update_active_set()
+                for i in active:
+                    idx = self._active_idx[i]
+                    y[i, idx] -= np.linalg.solve(self._dRdy[i][np.ix_(idx, idx)], resids[i, idx])
+            else:
+                y[active] -= np.linalg.solve(self._dRdy[active], resids[active][:, :, np.newaxis])[:, :, 0]
+
+            # bound control, in place
+            n[n.real < MIN_VALID_CONCENTRATION] = MIN_VALID_CONCENTRATION
+            n[n.real > 1e2] = 1e2
+
+            resids, norms = node_norms(n, pi)
+            converged |= (norms < options['atol']) | (norms/norm0 < options['rtol'])
+            iters += 1
+
+            stalled = np.abs(stall_norm - norms/norm0) <= options['stall_tol']
+            stall_count = np.where(stalled, stall_count + 1, 0)
+            stall_norm = np.where(stalled, stall_norm, norms/norm0)
+            done = converged | (stall_count >= options['stall_limit'])
+
+        return n, pi, iters, converged, norms
+
+    def _newton_reduced(self, P, composition, n, pi):
+        """ The reduced Gordon-McBride iteration (NASA RP-1311, eqs 2.24 and 2.26 for a TP problem).
+        The species corrections are eliminated, so each node only solves an (num_element+1) system for
+        the lagrange multipliers (pi) and the correction to the total moles. The same system is assembled
+        by PropsRHS for the derivatives. Steps are damped with the CEA control factors.
+
+        Species that reach the minimum concentration and still want to shrink are held there, out of the system.
+
+        Nodes are converged when every n_j*|dln(n_j)|/sum(n), the total moles correction and the
+        mass balance error (relative to the largest element) are below fused_newton_options['atol']."""
 
-    def linearize(self, inputs, outputs, J):
+        thermo = self.options['thermo']
+        aij = thermo.aij
+        num_nodes, num_prod = n.shape
+        num_element = thermo.num_element
+        options = self.fused_newton_options
+        tol = options['atol']
+
+        G0_lnP = self.H0_T - self.S0_T + np.log(P)[:, np.newaxis]
+        b_scale = np.max(np.abs(composition.real), axis=1)
+
+        # the total moles are carried separately during the iteration, as in CEA
+        n = n.copy()
+        n_tot = np.sum(n, axis=1)
+
+        A = np.zeros((num_nodes, num_element+1, num_element+1), dtype=n.dtype)
+        rhs = np.empty((num_nodes, num_element+1), dtype=n.dtype)
+
+        converged = np.zeros(num_nodes, dtype=bool)
+        # species held at the minimum concentration because they want to keep shrinking.
+        # they still count in the mass balance, but are not part of the newton system
+        fixed = np.zeros((num_nodes, num_prod), dtype=bool)
+        iters = 0
+        while iters < options['maxiter']:
+            active = np.nonzero(~converged)[0]
+            na = n[active]
+            mu = G0_lnP[active] + np.log(na) - np.log(n_tot[active])[:, np.newaxis]
+            b = na.dot(aij.T)
+            sum_n = np.sum(na, axis=1)
+
+            n_free = np.where(fixed[active], 0., na)
+            b_free = n_free.dot(aij.T)
+
+            # for i in range(num_element):
+            #     for k in range(num_element):
+            #         A[i, k] = np.sum(aij[k]*aij[i]*n)
+            # vectorization of this for loop for speed
+            A[active, :num_element, :num_element] = np.einsum('ikj,nj->nik', thermo.aij_prod, n_free)
+            A[active, :num_element, num_element] = b_free
+            A[active, num_element, :num_element] = b_free
+            A[active, num_element, num_element] = np.sum(n_free, axis=1) - n_tot[active]
+
+            rhs[active, :num_element] = composition[active] - b + (n_free*mu).dot(aij.T)
+            rhs[active, num_element] = n_tot[active] - sum_n + np.sum(n_free*mu, axis=1)
+
+            x = np.linalg.solve(A[active], rhs[active][:, :, np.newaxis])[:, :, 0]
+            pi[active] = x[:, :num_element]
+            dln_ntot = x[:, num_element]
+            dln_n = -mu + x[:, :num_element].dot(aij) + dln_ntot[:, np.newaxis]
+
+            iters += 1
+
+            at_min = (na.real <= MIN_VALID_CONCENTRATION) & (dln_n.real < 0)
+            dln_n[at_min] = 0.
+            fixed[active] = at_min
+
+            done = ((np.max(np.abs(na*dln_n), axis=1) <= tol*sum_n.real) &
+                    (np.abs(n_tot[active]*dln_ntot) <= tol*sum_n.real) &
+                    (np.max(np.abs(composition[active] - b), axis=1) <= tol*b_scale[active]))
+
+            # CEA control factors: limit the major species corrections, and keep trace species
+            # that are growing from jumping past a mole fraction of 1e-4
+            ln_x = np.log(na.real/n_tot[active].real[:, np.newaxis])
+            trace = ln_x <= -18.420681
+            big = np.maximum(5*np.abs(dln_ntot.real), np.max(np.where(trace, 0., np.abs(dln_n.real)), axis=1))
+            lam1 = 2/np.maximum(big, 1e-300)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                lam2 = np.abs((-ln_x - 9.2103404)/(dln_n.real - dln_ntot.real[:, np.newaxis]))
+            lam2 = np.min(np.where(trace & (dln_n.real >= 0), lam2, np.inf), axis=1)
+            lam = np.minimum(1., np.minimum(lam1, lam2))
+
+            n[active] = na*np.exp(lam[:, np.newaxis]*dln_n)
+            n_tot[active] *= np.exp(lam*dln_ntot)
+            n[n.real < MIN_VALID_CONCENTRATION] = MIN_VALID_CONCENTRATION
+            n[n.real > 1e2] = 1e2
+
+            converged[active] = done
+            if np.all(converged):
+                break
+
+        return n, pi, iters, converged
 
-        self._calc_dRdy(inputs, outputs)
-        dRdy = self._dRdy
+    def linearize(self, inputs, outputs, J):
 
         thermo = self.options['thermo']
+        num_nodes = self.options['num_nodes']
 
         num_element = thermo.num_element
         num_prod = thermo.num_prod
 
         P = inputs['P'] / P_REF
-        n = outputs['n']
-        n_moles = np.sum(n)
+        n = outputs['n'].reshape((num_nodes, num_prod))
+        n_moles = np.sum(n, axis=1)
 
-        # TODO: Talk to John about this problem.
-        # hack to handle the fact that n_moles doesn't get set if you only call apply_linear
-        if n_moles < 1e-30:
-            n_moles = np.sum(n)
+        self._calc_dRdy(n, outputs._under_complex_step)
+        dRdy = self._dRdy
 
         qP = 1.0 / P_REF / P  # quotient_P or 1/P
 
         end_element = num_prod + num_element
 
-        J_n_n = dRdy[:num_prod, :num_prod]
-
-        J_n_pi = dRdy[:num_prod, num_prod: end_element]
+        J_n_n = dRdy[:, :num_prod, :num_prod]
 
-        J_n_n_moles = -n/n_moles
+        J_n_pi = dRdy[:, :num_prod, num_prod: end_element]
 
         if self.use_trace_damping:
-            J_n_P = (self.weights * qP).reshape((-1, 1))
+            J_n_P = self.weights * qP[:, np.newaxis]
         else:
-            J_n_P = qP*np.ones((num_prod, 1))
+            J_n_P = np.repeat(qP[:, np.newaxis], num_prod, axis=1)
 
         T = inputs['T']
-        dH0_dT = thermo.H0_applyJ(T, 1)
-        dS0_dT = thermo.S0_applyJ(T, 1)
+        _, _, _, dH0_dT, dS0_dT, _ = thermo.evaluate_all(T)
         if self.use_trace_damping:
-            J_n_T = ((dH0_dT - dS0_dT) * self.weights).reshape((num_prod, 1))
+            J_n_T = (dH0_dT - dS0_dT) * self.weights
         else:
-            J_n_T = ((dH0_dT - dS0_dT)).reshape((num_prod, 1))
-
-        J['pi', 'n'] = dRdy[num_prod:end_element, :num_prod]
-        J['pi', 'composition'] = -np.eye(num_element)
+            J_n_T = (dH0_dT - dS0_dT)
 
-        J['n_moles', 'n'] = np.ones((1, num_prod))
+        J['pi', 'n'] = dRdy[:, num_prod:end_element, :num_prod].ravel()
 
-        if self.remove_trace_species:
+        if np.any(self.remove_trace_species):
             # non-vectorized loop; left here for code clarity
             # for j, is_trace in enumerate(self._trace):
             #     if is_trace:
@@ -256,41 +649,102 @@ class ChemEq(om.ImplicitComponent):
 
             #         J['pi', 'n'][:, j] = 0.
 
-            mask = self._trace
-            J_n_n[:, mask] = 0.
-            J_n_n[mask, :] = 0.
-            J_n_n[mask, mask] = 1.
+            node, j = self._remove_trace_jac()
 
-            J_n_P[mask, :] = 0
-            J_n_T[mask, :] = 0
-            J_n_pi[mask, :] = 0
-            J_n_n_moles[mask] = 0
+            J_n_P[node, j] = 0
+            J_n_T[node, j] = 0
 
             # J['pi', 'n'][:, mask] = 0.
 
-        J['n', 'n'] = J_n_n
-        J['n', 'P'] = J_n_P
-        J['n', 'T'] = J_n_T
-        J['n', 'pi'] = J_n_pi
+        J['n', 'n'] = J_n_n.ravel()
+        J['n', 'P'] = J_n_P.ravel()
+        J['n', 'T'] = J_n_T.ravel()
+        J['n', 'pi'] = J_n_pi.ravel()
+
+        if self.options['prune_trace_species']:
+            self._update_active_set()
+
+    def _remove_trace_jac(self):
+        """ Decouples the trace species from the rest of the (n, pi) newton system, in place in _dRdy.
+        Returns the (node, species) indices of the trace species."""
+        num_prod = self.options['thermo'].num_prod
+        dRdy = self._dRdy
+
+        node, j = np.nonzero(self._trace)
+        dRdy[node, :num_prod, j] = 0.
+        dRdy[node, j, :] = 0.
+        dRdy[node, j, j] = 1.
+
+        return node, j
+
+    def _update_active_set(self):
+        """ Finds the rows/cols of each node's newton system that are kept in the reduced solve.
+        The trace species are dropped: `_remove_trace_jac` has already made their rows and columns
+        identity, so they are decoupled from the rest of the system and dropping them is exact."""
+
+        num_prod = self.options['thermo'].num_prod
 
-    def _calc_dRdy(self, inputs, outputs):
+        # all of the element (pi) rows always stay in the system
+        elem_idx = np.arange(num_prod, self.size)
+        self._active_idx = [np.concatenate((np.nonzero(~trace)[0], elem_idx)) for trace in self._trace]
+
+    def solve_linear(self, d_outputs, d_residuals, mode):
+        """ Only used when `prune_trace_species` is True.
+        Solves the newton system restricted to the active species, one small dense system per node.
+        The rows of the trace species are identity, so their solution is the right hand side.
+        The n_moles equation only depends on n, so it is back-substituted after the solve."""
+
+        thermo = self.options['thermo']
+        num_nodes = self.options['num_nodes']
+        num_prod = thermo.num_prod
+        num_element = thermo.num_element
+        size = self.size
+
+        if mode == 'fwd':
+            b = np.hstack((d_residuals['n'].reshape((num_nodes, num_prod)),
+                           d_residuals['pi'].reshape((num_nodes, num_element))))
+            b_n_moles = d_residuals['n_moles']
+        else:
+            b = np.hstack((d_outputs['n'].reshape((num_nodes, num_prod)),
+                           d_outputs['pi'].reshape((num_nodes, num_element))))
+            # in rev mode the n_moles adjoint couples back into all the n equations
+            x_n_moles = -d_outputs['n_moles']
+            b[:, :num_prod] -= x_n_moles[:, np.newaxis]
+
+        x = b.copy()
+        for i, idx in enumerate(self._active_idx):
+            A = self._dRdy[i][np.ix_(idx, idx)]
+            if mode == 'rev':
+                A = A.T
+            x[i, idx] = np.linalg.solve(A, b[i, idx])
+
+        if mode == 'fwd':
+            d_outputs['n'] = x[:, :num_prod].reshape(d_outputs['n'].shape)
+            d_outputs['pi'] = x[:, num_prod:].reshape(d_outputs['pi'].shape)
+            d_outputs['n_moles'] = np.sum(x[:, :num_prod], axis=1) - b_n_moles
+        else:
+            d_residuals['n'] = x[:, :num_prod].reshape(d_residuals['n'].shape)
+            d_residuals['pi'] = x[:, num_prod:].reshape(d_residuals['pi'].shape)
+            d_residuals['n_moles'] = x_n_moles
+
+    def _calc_dRdy(self, n, under_complex_step=False):
         """ Computes the Jacobian for the newton solver. This Jacobian
         contains the derivatives of all residual equations with respect to
-        the state variables, which are ['n', 'pi', and sometimes 'T'] """
+        the state variables, which are ['n', 'pi', and sometimes 'T'].
+        There is one independent block for each node, given n as a (num_nodes, num_prod) array."""
 
         thermo = self.options['thermo']
         aij = thermo.aij
         num_prod = thermo.num_prod
         num_element = thermo.num_element
 
-        n = outputs['n']
-        n_moles = np.sum(n)
+        n_moles = np.sum(n, axis=1)
         # pi = outputs['pi']
 
-        if outputs._under_complex_step:
-            dRdy = self._dRdy = self._dRdy.astype(np.complex)
+        if under_complex_step:
+            dRdy = self._dRdy = self._dRdy.astype(complex)
             if self.use_trace_damping:
-                self.weights = self.weights.astype(np.complex)
+                self.weights = self.weights.astype(complex)
         else:
             dRdy = self._dRdy = self._dRdy.real
             if self.use_trace_damping:
@@ -299,29 +753,28 @@ class ChemEq(om.ImplicitComponent):
         # dRgibbs_dn
 
         MW = 1 / n_moles
-        dRdy[:num_prod, :num_prod] = (-MW)
-        diag = (1 / n - MW)
-        np.fill_diagonal(dRdy[:num_prod, :num_prod], diag)
+        dRdy[:, :num_prod, :num_prod] = (-MW)[:, np.newaxis, np.newaxis]
+        diag = (1 / n - MW[:, np.newaxis])
+        idx = np.arange(num_prod)
+        dRdy[:, idx, idx] = diag
         # multiples each row by one element of the vector
         if self.use_trace_damping:
-            dRdy[:num_prod, :num_prod] *= self.weights[:, np.newaxis]
+            dRdy[:, :num_prod, :num_prod] *= self.weights[:, :, np.newaxis]
 
         end_element = num_prod + num_element
         # dRgibbs_dpi
-        dRdy[:num_prod, num_prod:end_element] = (-aij.T)
+        dRdy[:, :num_prod, num_prod:end_element] = (-aij.T)
         if self.use_trace_damping:
-            dRdy[:num_prod, num_prod:end_element] *= self.weights[:, np.newaxis]
+            dRdy[:, :num_prod, num_prod:end_element] *= self.weights[:, :, np.newaxis]
 
         # dRmass_dn
-        dRdy[num_prod:end_element, :num_prod] = aij
+        dRdy[:, num_prod:end_element, :num_prod] = aij
 
         # Replace J for tiny values of n with identity
-        if self.remove_trace_species:
-            n = outputs['n']
-            for j in range(num_prod):
-                if n[j] <= 1.0e-10:
-                    dRdy[j, :] = 0.0
-                    dRdy[j, j] = -1.0
+        if np.any(self.remove_trace_species):
+            node, j = np.nonzero((n <= 1.0e-10) & self.remove_trace_species[:, np.newaxis])
+            dRdy[node, j, :] = 0.0
+            dRdy[node, j, j] = -1.0
 
 
 class SetTotalTP(om.Group): 
@@ -330,23 +783,29 @@ class SetTotalTP(om.Group):
 
         self.options.declare('spec', recordable=False)
         self.options.declare('composition')
+        self.options.declare('num_nodes', default=1, types=int,
+                             desc='number of independent (T, P, composition) states to solve for')
+        self.options.declare('chem_eq_options', default={}, types=dict,
+                             desc='additional options for the ChemEq component (e.g. fused_newton, prune_trace_species, warm_start)')
 
 
     def setup(self):
 
+        num_nodes = self.options['num_nodes']
+
         init_elements = self.options['composition']
         if init_elements is None: 
             init_elements = CEA_AIR_COMPOSITION
 
-        self.thermo = species_data.Properties(self.options['spec'], 
-                                              init_elements=init_elements)
+        self.thermo = species_data.get_properties(self.options['spec'], init_elements)
         
         # these have to be part of the API for the unit_comps to use
         self.composition = self.thermo.b0
         
-        self.add_subsystem('chem_eq', ChemEq(thermo=self.thermo), promotes=['*'])
+        self.add_subsystem('chem_eq', ChemEq(thermo=self.thermo, num_nodes=num_nodes, **self.options['chem_eq_options']),
+                           promotes=['*'])
 
-        self.add_subsystem('props', ThermoCalcs(thermo=self.thermo), promotes=['*'])
+        self.add_subsystem('props', ThermoCalcs(thermo=self.thermo, num_nodes=num_nodes), promotes=['*'])
 
 
 
@@ -0,0 +1,200 @@
+import warnings
+import weakref
+
+import numpy as np
+
+import openmdao.api as om
+
+from pycycle.constants import P_REF, R_UNIVERSAL_ENG, R_UNIVERSAL_SI, MIN_VALID_CONCENTRATION, CEA_AIR_COMPOSITION
+from pycycle.thermo.cea import species_data
+from pycycle.thermo.cea.chem_eq import ChemEq
+from pycycle.thermo.cea.vec_utils import node_shape, block_rows_cols
+
+
+# reference equilibrium compositions, per thermo data object and keyed on (T_ref, P_ref) within it
+_REFERENCE_COMPOSITIONS = weakref.WeakKeyDictionary()
+
+
+def reference_composition(thermo, T_ref, P_ref):
+    """
+    Solve a single equilibrium for the initial mixture (thermo.b0) at the reference state
+    and return the molar concentrations of the products (mol/g).
+
+    The result is kept for each thermo object, so every frozen thermo built from it
+    shares the one reference solve.
+    """
+    frozen_refs = _REFERENCE_COMPOSITIONS.setdefault(thermo, {})
+    key = (float(T_ref), float(P_ref))
+    if key in frozen_refs:
+        return frozen_refs[key]
+
+    p = om.Problem()
+    p.model.add_subsystem('ceq', ChemEq(thermo=thermo), promotes=['*'])
+    p.model.set_input_defaults('T', T_ref, units='degK')
+    p.model.set_input_defaults('P', P_ref, units='bar')
+    p.setup(check=False)
+    p.set_solver_print(level=-1)
+    p.model.ceq.nonlinear_solver.options['atol'] = 1e-12
+    p.model.ceq.nonlinear_solver.options['rtol'] = 1e-12
+    p.run_model()
+
+    n_ref = frozen_refs[key] = p['n'].copy()
+    return n_ref
+
+
+class FrozenProps(om.ExplicitComponent):
+    """
+    computes h, S, Cp, Cv, gamma, rho and R of a mixture whose products are frozen at a
+    reference equilibrium, directly from the NASA polynomials (no Gibbs minimization)
+    """
+
+    def initialize(self):
+        self.options.declare('thermo', desc='thermodynamic data object', recordable=False)
+        self.options.declare('T_ref', default=500., desc='temperature (degK) of the reference equilibrium')
+        self.options.declare('P_ref', default=1., desc='pressure (bar) of the reference equilibrium')
+        self.options.declare('num_nodes', default=1, types=int,
+                             desc='number of independent states to compute properties for')
+
+    def setup(self):
+        thermo = self.options['thermo']
+        num_nodes = self.options['num_nodes']
+        num_element = thermo.num_element
+
+        n_ref = reference_composition(thermo, self.options['T_ref'], self.options['P_ref'])
+
+        # only the species present in the reference mixture are carried, the rest are frozen out
+        self.prod_idx = np.nonzero(n_ref > MIN_VALID_CONCENTRATION+1e-20)[0]
+        self.n_ref = n_ref[self.prod_idx]
+        self.b_ref = thermo.b0
+
+        # changes in the element composition are distributed over the carried species
+        # in proportion to their reference concentrations: n = n_ref + N.(b - b_ref)
+        # this is the minimum (n_ref weighted) change that satisfies the element balance
+        aij = thermo.aij[:, self.prod_idx]
+        W_aT = self.n_ref[:, np.newaxis]*aij.T
+        self.N = W_aT.dot(np.linalg.inv(aij.dot(W_aT)))
+
+        self._warned_depleted = False
+
+        self.add_input('T', val=284., units="degK", desc="Temperature", shape=num_nodes)
+        self.add_input('P', val=1., units='bar', desc="Pressure", shape=num_nodes)
+        self.add_input('composition', val=np.tile(thermo.b0, (num_nodes, 1)).reshape(node_shape(num_nodes, num_element)),
+                       desc="moles of atoms present in mixture")
+
+        self.add_output('h', val=1., units="cal/g", desc="enthalpy", shape=num_nodes)
+        self.add_output('S', val=1., units="cal/(g*degK)", desc="entropy", shape=num_nodes)
+        self.add_output('gamma', val=1.4, lower=1.0, upper=2.0, desc="ratio of specific heats", shape=num_nodes)
+        self.add_output('Cp', val=1., units="cal/(g*degK)", desc="Specific heat at constant pressure", shape=num_nodes)
+        self.add_output('Cv', val=1., units="cal/(g*degK)", desc="Specific heat at constant volume", shape=num_nodes)
+        self.add_output('rho', val=0.0004, units="g/cm**3", desc="density", shape=num_nodes)
+        self.add_output('R', val=1., units='(N*m)/(kg*degK)', desc='Specific gas constant', shape=num_nodes)
+
+        ar = np.arange(num_nodes)
+        b_rows, b_cols = block_rows_cols(num_nodes, 1, num_element)
+
+        self.declare_partials(['h', 'S', 'gamma', 'Cp', 'Cv', 'rho'], 'T', rows=ar, cols=ar)
+        self.declare_partials(['S', 'rho'], 'P', rows=ar, cols=ar)
+        self.declare_partials(['h', 'S', 'gamma', 'Cp', 'Cv', 'rho', 'R'], 'composition', rows=b_rows, cols=b_cols)
+
+    def _mixture(self, inputs):
+        thermo = self.options['thermo']
+        num_nodes = self.options['num_nodes']
+
+        composition = inputs['composition'].reshape((num_nodes, thermo.num_element))
+        n = self.n_ref + (composition - self.b_ref).dot(self.N.T)
+
+        # far enough from the reference (e.g. a rich mixture from a lean reference) a species runs out,
+        # it is held at the minimum concentration as in ChemEq and no longer follows the composition,
+        # so the mixture no longer holds the given amounts of its elements
+        depleted = n.real < MIN_VALID_CONCENTRATION
+        if np.any(depleted) and not self._warned_depleted:
+            self._warned_depleted = True
+            names = sorted({thermo.products[self.prod_idx[j]] for j in np.nonzero(depleted)[1]})
+            warnings.warn(f'{self.msginfo}: the composition is too far from the reference mixture for the frozen '
+                          f'thermo. The species {", ".join(names)} ran out and are held at the minimum concentration, '
+                          'so the element balance is not met. Use CEA thermo for this flow.')
+        n[depleted] = MIN_VALID_CONCENTRATION
+        dn_db = np.where(depleted[:, :, np.newaxis], 0., self.N)
+
+        H0_T, S0_T, Cp0_T, dH0_dT, dS0_dT, dCp0_dT = thermo.evaluate_all(inputs['T'])
+        idx = self.prod_idx
+
+        return n, dn_db, H0_T[:, idx], S0_T[:, idx], Cp0_T[:, idx], dH0_dT[:, idx], dS0_dT[:, idx], dCp0_dT[:, idx]
+
+    def compute(self, inputs, outputs):
+        T = inputs['T']
+        P = inputs['P']
+
+        n, _, H0_T, S0_T, Cp0_T, _, _, _ = self._mixture(inputs)
+        n_moles = np.sum(n, axis=1)
+
+        outputs['h'] = R_UNIVERSAL_ENG*T*np.sum(n*H0_T, axis=1)
+        outputs['S'] = R_UNIVERSAL_ENG*np.sum(n*(S0_T + np.log(n_moles[:, np.newaxis]/n/(P[:, np.newaxis]/P_REF))), axis=1)
+        outputs['Cp'] = Cp = R_UNIVERSAL_ENG*np.sum(n*Cp0_T, axis=1)
+        outputs['Cv'] = Cv = Cp - n_moles*R_UNIVERSAL_ENG
+        outputs['gamma'] = Cp/Cv
+        outputs['rho'] = P/(n_moles*R_UNIVERSAL_SI*T)*100  # 1 Bar is 100 Kpa
+        outputs['R'] = R_UNIVERSAL_SI*n_moles
+
+    def compute_partials(self, inputs, J):
+        T = inputs['T']
+        P = inputs['P']
+
+        n, dn_db, H0_T, S0_T, Cp0_T, dH0_dT, dS0_dT, dCp0_dT = self._mixture(inputs)
+        n_moles = np.sum(n, axis=1)
+
+        Cp = R_UNIVERSAL_ENG*np.sum(n*Cp0_T, axis=1)
+        Cv = Cp - n_moles*R_UNIVERSAL_ENG
+        rho = P/(n_moles*R_UNIVERSAL_SI*T)*100
+
+        dCp_dT = R_UNIVERSAL_ENG*np.sum(n*dCp0_dT, axis=1)
+        J['h', 'T'] = R_UNIVERSAL_ENG*(np.sum(n*dH0_dT, axis=1)*T + np.sum(n*H0_T, axis=1))
+        J['S', 'T'] = R_UNIVERSAL_ENG*np.sum(n*dS0_dT, axis=1)
+        J['Cp', 'T'] = dCp_dT
+        J['Cv', 'T'] = dCp_dT
+        J['gamma', 'T'] = dCp_dT*(Cv - Cp)/Cv**2
+        J['rho', 'T'] = -rho/T
+
+        J['S', 'P'] = -R_UNIVERSAL_ENG*n_moles/P
+        J['rho', 'P'] = rho/P
+
+        # chain everything through dn/dcomposition, N for the species that have not run out
+        dnm_db = np.sum(dn_db, axis=1)
+        dCp_db = R_UNIVERSAL_ENG*np.einsum('ij,ijk->ik', Cp0_T, dn_db)
+        dCv_db = dCp_db - R_UNIVERSAL_ENG*dnm_db
+        dS_dn = R_UNIVERSAL_ENG*(S0_T + np.log(n_moles[:, np.newaxis]/n/(P[:, np.newaxis]/P_REF)))
+
+        J['h', 'composition'] = (R_UNIVERSAL_ENG*T[:, np.newaxis]*np.einsum('ij,ijk->ik', H0_T, dn_db)).ravel()
+        J['S', 'composition'] = np.einsum('ij,ijk->ik', dS_dn, dn_db).ravel()
+        J['Cp', 'composition'] = dCp_db.ravel()
+        J['Cv', 'composition'] = dCv_db.ravel()
+        J['gamma', 'composition'] = ((dCp_db*Cv[:, np.newaxis] - Cp[:, np.newaxis]*dCv_db)/Cv[:, np.newaxis]**2).ravel()
+        J['rho', 'composition'] = (-(rho/n_moles)[:, np.newaxis]*dnm_db).ravel()
+        J['R', 'composition'] = (R_UNIVERSAL_SI*dnm_db).ravel()
+
+
+class SetTotalTP(om.Group):
+
+    def initialize(self):
+
+        self.options.declare('spec', recordable=False)
+        self.options.declare('composition')
+        self.options.declare('T_ref', default=500., desc='temperature (degK) of the reference equilibrium')
+        self.options.declare('P_ref', default=1., desc='pressure (bar) of the reference equilibrium')
+        self.options.declare('num_nodes', default=1, types=int,
+                             desc='number of independent (T, P, composition) states to compute')
+
+    def setup(self):
+
+        init_elements = self.options['composition']
+        if init_elements is None:
+            init_elements = CEA_AIR_COMPOSITION
+
+        self.thermo = species_data.get_properties(self.options['spec'], init_elements)
+
+        # these have to be part of the API for the unit_comps to use
+        self.composition = self.thermo.b0
+
+        self.add_subsystem('props', FrozenProps(thermo=self.thermo, T_ref=self.options['T_ref'],
+                                                P_ref=self.options['P_ref'], num_nodes=self.options['num_nodes']),
+                           promotes=['*'])
@@ -4,133 +4,144 @@ from openmdao.api import ExplicitComponent
 
 from pycycle.constants import R_UNIVERSAL_ENG, R_UNIVERSAL_SI, MIN_VALID_CONCENTRATION
 from pycycle.thermo.cea import species_data
+from pycycle.thermo.cea.vec_utils import node_shape, block_rows_cols, tile_pattern
 
 
 class PropsRHS(ExplicitComponent):
 
-    def __init__(self, thermo):
-        super(PropsRHS, self).__init__()
+    def __init__(self, thermo, **kwargs):
+        super(PropsRHS, self).__init__(**kwargs)
         self.thermo = thermo
 
+    def initialize(self):
+        self.options.declare('num_nodes', default=1, types=int,
+                             desc='number of independent states to build linear systems for')
+
     def setup(self):
 
         thermo = self.thermo
+        num_nodes = self.options['num_nodes']
         num_prod = thermo.num_prod
         num_element = thermo.num_element
+        ne1 = num_element+1
 
-        self.add_input('T', val=284., units="degK", desc="Total Temperature")
-        self.add_input('n', val=np.zeros(num_prod),
+        self.add_input('T', val=284., units="degK", desc="Total Temperature", shape=num_nodes)
+        self.add_input('n', val=np.zeros(node_shape(num_nodes, num_prod)),
                        desc="molar concentration of the mixtures, last element is "
                        "the total molar concentration")  # kg-mol/kg
-        self.add_input('n_moles', val=1., desc="1/molar_mass for gaseous mixture")
-        self.add_input('composition', val=thermo.b0,
+        self.add_input('n_moles', val=1., desc="1/molar_mass for gaseous mixture", shape=num_nodes)
+        self.add_input('composition', val=np.tile(thermo.b0, num_nodes).reshape(node_shape(num_nodes, num_element)),
                        desc="assigned kg-atoms of element i per total kg of reactant")  # kg-atom/kg
 
-        self.add_output('rhs_T', val=np.zeros(num_element+1),
+        self.add_output('rhs_T', val=np.zeros(node_shape(num_nodes, ne1)),
                         desc="rhs for the T solve")
-        self.add_output('rhs_P', val=np.zeros(num_element+1),
+        self.add_output('rhs_P', val=np.zeros(node_shape(num_nodes, ne1)),
                         desc="rhs for the P solve")
-        self.add_output('lhs_TP', val=np.eye(num_element+1),
+        lhs_TP = np.eye(ne1) if num_nodes == 1 else np.tile(np.eye(ne1), (num_nodes, 1, 1))
+        self.add_output('lhs_TP', val=lhs_TP,
                         desc="A matrix for the totals linear solve")
 
-        thermo = self.thermo
-        num_prod = thermo.num_prod
-        num_element = thermo.num_element
-
-        self.drhsT_dT = np.empty(num_element+1)
-        self.drhsT_dn = np.empty((num_element+1, num_prod))
-
-        drhsP_dnmoles = np.zeros(num_element+1)
-        drhsP_dnmoles[-1] = 1.
-        # self.declare_partials('rhs_P', 'n_moles',
-        #                       val=1, rows=(num_element,), cols=(0,))
-        self.declare_partials('rhs_P', 'n_moles', val=drhsP_dnmoles)
-
-        drhsP_db0 = np.zeros((num_element+1, num_element))
-        np.fill_diagonal(drhsP_db0[:num_element, :num_element], 1)
-        self.declare_partials('rhs_P', 'composition', val=drhsP_db0)
-
-        # JSG: The for loops are slow, but its ok because we only do them one time
-        ne1 = num_element+1
-        dlhs_dn = np.zeros((ne1**2, num_prod))
-        # val, idx_row, idx_col = [], [], []
-        for i in range(num_element):
-            for j in range(num_element):
-                for k in range(num_prod):
-                    dlhs_dn[ne1*i+j, k] = thermo.aij_prod[i][j, k]
-                    # val.append(thermo.aij_prod[i][j, k])
-                    # idx_row.append(3*i+j)
-                    # idx_col.append(k)
-        self.declare_partials('lhs_TP', 'n', val=dlhs_dn)
-
-        dlhs_db0 = np.zeros((ne1**2, num_element))
-        for i in range(num_element):
-            for j in range(num_element):
-                    dlhs_db0[ne1*num_element+j, j] = 1
-                    dlhs_db0[ne1*j+num_element, j] = 1
-        self.declare_partials('lhs_TP', 'composition', val=dlhs_db0)
-
-        self.declare_partials('rhs_T', 'T')
-        self.declare_partials('rhs_T', 'n')
+        self.drhsT_dT = np.empty((num_nodes, ne1))
+
+        # only the rhs_P entries that carry n_moles and composition are non-zero
+        rows, cols = tile_pattern(num_nodes, ne1, 1, np.array([num_element]), np.array([0]))
+        self.declare_partials('rhs_P', 'n_moles', rows=rows, cols=cols, val=1.)
+
+        ar = np.arange(num_element)
+        rows, cols = tile_pattern(num_nodes, ne1, num_element, ar, ar)
+        self.declare_partials('rhs_P', 'composition', rows=rows, cols=cols, val=1.)
+
+        # lhs_TP[i, j] = sum_k aij[i, k]*aij[j, k]*n[k], so the pattern w.r.t n is the non-zeros of aij_prod
+        # dlhs_dn = np.zeros((ne1**2, num_prod))
+        # for i in range(num_element):
+        #     for j in range(num_element):
+        #         for k in range(num_prod):
+        #             dlhs_dn[ne1*i+j, k] = thermo.aij_prod[i][j, k]
+        # vectorization of this for loop for speed
+        i, j, k = np.nonzero(thermo.aij_prod)
+        rows, cols = tile_pattern(num_nodes, ne1**2, num_prod, ne1*i+j, k)
+        self.declare_partials('lhs_TP', 'n', rows=rows, cols=cols,
+                              val=np.tile(thermo.aij_prod[i, j, k], num_nodes))
+
+        # composition fills in the last row and column of lhs_TP
+        rows, cols = tile_pattern(num_nodes, ne1**2, num_element,
+                                  np.hstack((ne1*num_element+ar, ne1*ar+num_element)), np.hstack((ar, ar)))
+        self.declare_partials('lhs_TP', 'composition', rows=rows, cols=cols, val=1.)
+
+        rows, cols = block_rows_cols(num_nodes, ne1, 1)
+        self.declare_partials('rhs_T', 'T', rows=rows, cols=cols)
+
+        # rhs_T[i] = sum_k aij[i, k]*n[k]*H0_T[k] for the elements, and the last entry depends on all of n
+        self._rhsT_i, self._rhsT_k = np.nonzero(np.vstack((thermo.aij, np.ones(num_prod))))
+        rows, cols = tile_pattern(num_nodes, ne1, num_prod, self._rhsT_i, self._rhsT_k)
+        self.declare_partials('rhs_T', 'n', rows=rows, cols=cols)
         # self.approx_partials('*', '*')
 
     def compute(self, inputs, outputs):
 
         thermo = self.thermo
+        num_nodes = self.options['num_nodes']
         num_element = thermo.num_element
+        ne1 = num_element + 1
         T = inputs['T']
-        n = inputs['n']
-        b0 = inputs['composition']
+        n = inputs['n'].reshape((num_nodes, thermo.num_prod))
+        b0 = inputs['composition'].reshape((num_nodes, num_element))
 
-        for i in range(num_element):
-            # outputs['lhs_TP'][i][:num_element] = np.sum(thermo.aij_prod[i] * n, axis=1)
-            outputs['lhs_TP'][i][:num_element] = np.dot(thermo.aij_prod[i], n)
+        lhs_TP = np.zeros((num_nodes, ne1, ne1), dtype=n.dtype)
+        # for i in range(num_element):
+        #     outputs['lhs_TP'][i][:num_element] = np.dot(thermo.aij_prod[i], n)
+        lhs_TP[:, :num_element, :num_element] = np.einsum('ijk,nk->nij', thermo.aij_prod, n)
 
         # determine the delta coeff for 2.24 and pi coef for 2.26\
         # at the converged state, b = b0 by definition
 
-        outputs['lhs_TP'][num_element, :num_element] = b0
-        outputs['lhs_TP'][:num_element, num_element] = b0
+        lhs_TP[:, num_element, :num_element] = b0
+        lhs_TP[:, :num_element, num_element] = b0
 
-        outputs['lhs_TP'][num_element, num_element] = 0
+        outputs['lhs_TP'] = lhs_TP.reshape(outputs['lhs_TP'].shape)
 
         # rhs for P
-        outputs['rhs_P'][:num_element] = b0
-        outputs['rhs_P'][num_element] = inputs['n_moles']
+        rhs_P = np.empty((num_nodes, ne1), dtype=n.dtype)
+        rhs_P[:, :num_element] = b0
+        rhs_P[:, num_element] = inputs['n_moles']
+        outputs['rhs_P'] = rhs_P.reshape(outputs['rhs_P'].shape)
 
         # rhs for T
-        self.H0_T = H0_T = thermo.H0(T)
+        H0_T, _, _, self.dH0_dT, _, _ = thermo.evaluate_all(T)
+        self.H0_T = H0_T
         n_H0 = n*H0_T
-        outputs['rhs_T'][:num_element] = np.sum(thermo.aij*n_H0, axis=1)
-        outputs['rhs_T'][num_element] = np.sum(n_H0)
+        rhs_T = np.empty((num_nodes, ne1), dtype=n_H0.dtype)
+        rhs_T[:, :num_element] = n_H0.dot(thermo.aij.T)
+        rhs_T[:, num_element] = np.sum(n_H0, axis=1)
+        outputs['rhs_T'] = rhs_T.reshape(outputs['rhs_T'].shape)
 
     def compute_partials(self, inputs, J):
 
         thermo = self.thermo
+        num_nodes = self.options['num_nodes']
         num_element = thermo.num_element
         aij = thermo.aij
 
         if inputs._under_complex_step:
-            self.drhsT_dT = self.drhsT_dT.astype(np.complex)
-            self.drhsT_dn = self.drhsT_dn.astype(np.complex)
+            self.drhsT_dT = self.drhsT_dT.astype(complex)
         else:
             self.drhsT_dT = self.drhsT_dT.real
-            self.drhsT_dn = self.drhsT_dn.real
 
-        T = inputs['T']
-        nj = inputs['n']
+        nj = inputs['n'].reshape((num_nodes, thermo.num_prod))
 
         H0_T = self.H0_T
-        nj_dH0dT = thermo.H0_applyJ(T, nj)
+        nj_dH0dT = nj * self.dH0_dT
 
-        self.drhsT_dT[:num_element] = np.sum(aij*nj_dH0dT, axis=1)
-        self.drhsT_dT[num_element] = np.sum(nj_dH0dT)
+        self.drhsT_dT[:, :num_element] = nj_dH0dT.dot(aij.T)
+        self.drhsT_dT[:, num_element] = np.sum(nj_dH0dT, axis=1)
 
-        self.drhsT_dn[:num_element] = aij*H0_T
-        self.drhsT_dn[num_element] = H0_T
+        # drhsT_dn[i, k] is aij[i, k]*H0_T[k] (or just H0_T[k] for the last row) at each non-zero
+        drhsT_dn = H0_T[:, self._rhsT_k]
+        element_rows = self._rhsT_i < num_element
+        drhsT_dn[:, element_rows] *= aij[self._rhsT_i[element_rows], self._rhsT_k[element_rows]]
 
-        J['rhs_T', 'T'] = self.drhsT_dT.reshape((-1, 1))
-        J['rhs_T', 'n'] = self.drhsT_dn
+        J['rhs_T', 'T'] = self.drhsT_dT.ravel()
+        J['rhs_T', 'n'] = drhsT_dn.ravel()
 
         # derivs of rhsP are constants, specified in setup
 
@@ -0,0 +1,92 @@
+import numpy as np
+from scipy import linalg
+
+from openmdao.api import ImplicitComponent
+
+from pycycle.thermo.cea.vec_utils import node_shape, block_rows_cols
+
+
+class PropsSolve(ImplicitComponent):
+    """
+    Solves the linear systems for the T and P derivatives of the equilibrium mixture,
+    lhs_TP.result_T = rhs_T and lhs_TP.result_P = rhs_P. Both systems share lhs_TP, so each node
+    is factored once and the factorization is reused for both right hand sides and for the
+    forward and adjoint linear solves.
+    """
+
+    def initialize(self):
+        self.options.declare('thermo', desc='thermodynamic data object', recordable=False)
+        self.options.declare('num_nodes', default=1, types=int,
+                             desc='number of independent states to solve for')
+
+    def setup(self):
+        thermo = self.options['thermo']
+        num_nodes = self.options['num_nodes']
+        ne1 = thermo.num_element + 1
+
+        self._shape = (num_nodes, ne1)
+
+        lhs_TP = np.eye(ne1) if num_nodes == 1 else np.tile(np.eye(ne1), (num_nodes, 1, 1))
+        self.add_input('lhs_TP', val=lhs_TP, desc="A matrix for the totals linear solve")
+        self.add_input('rhs_T', val=np.ones(node_shape(num_nodes, ne1)), desc="rhs for the T solve")
+        self.add_input('rhs_P', val=np.ones(node_shape(num_nodes, ne1)), desc="rhs for the P solve")
+
+        self.add_output('result_T', val=np.ones(node_shape(num_nodes, ne1)), desc="result of the linear solve for T")
+        self.add_output('result_P', val=np.ones(node_shape(num_nodes, ne1)), desc="result of the linear solve for P")
+
+        ar = np.arange(num_nodes*ne1)
+        A_rows, A_cols = block_rows_cols(num_nodes, ne1, ne1)
+        rows, cols = block_rows_cols(num_nodes, ne1, ne1**2)
+        for x_name, b_name in (('result_T', 'rhs_T'), ('result_P', 'rhs_P')):
+            self.declare_partials(x_name, x_name, rows=A_rows, cols=A_cols)
+            self.declare_partials(x_name, b_name, rows=ar, cols=ar, val=-1.)
+            self.declare_partials(x_name, 'lhs_TP', rows=rows, cols=cols)
+
+        self._lup = []
+
+    def _factor(self, inputs):
+        num_nodes, ne1 = self._shape
+        A = inputs['lhs_TP'].reshape((num_nodes, ne1, ne1))
+        self._lup = [linalg.lu_factor(A_j) for A_j in A]
+        return A
+
+    def _solve(self, b_T, b_P, trans=0):
+        # both right hand sides go through each node's factorization together
+        b = np.stack((b_T.reshape(self._shape), b_P.reshape(self._shape)), axis=2)
+        x = np.array([linalg.lu_solve(lup, b_j, trans=trans) for lup, b_j in zip(self._lup, b)])
+        return x[:, :, 0], x[:, :, 1]
+
+    def apply_nonlinear(self, inputs, outputs, resids):
+        num_nodes, ne1 = self._shape
+        A = inputs['lhs_TP'].reshape((num_nodes, ne1, ne1))
+
+        for x_name, b_name in (('result_T', 'rhs_T'), ('result_P', 'rhs_P')):
+            x = outputs[x_name].reshape(self._shape)
+            b = inputs[b_name].reshape(self._shape)
+            resids[x_name] = (np.einsum('nij,nj->ni', A, x) - b).reshape(resids[x_name].shape)
+
+    def solve_nonlinear(self, inputs, outputs):
+        self._factor(inputs)
+        result_T, result_P = self._solve(inputs['rhs_T'], inputs['rhs_P'])
+
+        outputs['result_T'] = result_T.reshape(outputs['result_T'].shape)
+        outputs['result_P'] = result_P.reshape(outputs['result_P'].shape)
+
+    def linearize(self, inputs, outputs, J):
+        A = self._factor(inputs)
+
+        # d(resid_i)/d(A_kl) = delta_ik*x_l
+        eye = np.eye(self._shape[1])
+        for x_name in ('result_T', 'result_P'):
+            J[x_name, x_name] = A.ravel()
+            J[x_name, 'lhs_TP'] = np.einsum('ik,nl->nikl', eye, outputs[x_name].reshape(self._shape)).ravel()
+
+    def solve_linear(self, d_outputs, d_residuals, mode):
+        if mode == 'fwd':
+            result_T, result_P = self._solve(d_residuals['result_T'], d_residuals['result_P'])
+            d_outputs['result_T'] = result_T.reshape(d_outputs['result_T'].shape)
+            d_outputs['result_P'] = result_P.reshape(d_outputs['result_P'].shape)
+        else:
+            result_T, result_P = self._solve(d_outputs['result_T'], d_outputs['result_P'], trans=1)
+            d_residuals['result_T'] = result_T.reshape(d_residuals['result_T'].shape)
+            d_residuals['result_P'] = result_P.reshape(d_residuals['result_P'].shape)
@@ -1,33 +1,103 @@
 from collections import OrderedDict
+import importlib
 
 import numpy as np
 from scipy import interpolate
 
 from pycycle import constants
 
+from pycycle.thermo.cea.species_db import SpeciesDatabase
+
 from pycycle.thermo.cea.thermo_data import co2_co_o2
 from pycycle.thermo.cea.thermo_data import janaf
 from pycycle.thermo.cea.thermo_data import wet_air
 
 #from ad.admath import log
 from numpy import log
+
+
+# Maps the 10 NASA polynomial coefficients onto a shared set of powers of T for each of
+# H0, S0, Cp0, dH0_dT, dS0_dT, dCp0_dT (all non-dimensional).
+# The powers are ordered: T**-3, T**-2, T**-1, 1, T, T**2, T**3, T**4, log(T), log(T)/T, log(T)/T**2
+_POWERS = np.arange(-3., 5.)
+_POLY_MAP = np.zeros((6, 10, 11))
+for q, terms in enumerate((
+        ((0, 1, -1.), (1, 9, 1.), (2, 3, 1.), (3, 4, 1/2.), (4, 5, 1/3.), (5, 6, 1/4.), (6, 7, 1/5.), (7, 2, 1.)), # H0
+        ((0, 1, -1/2.), (1, 2, -1.), (2, 8, 1.), (3, 4, 1.), (4, 5, 1/2.), (5, 6, 1/3.), (6, 7, 1/4.), (8, 3, 1.)), # S0
+        ((0, 1, 1.), (1, 2, 1.), (2, 3, 1.), (3, 4, 1.), (4, 5, 1.), (5, 6, 1.), (6, 7, 1.)), # Cp0
+        ((0, 0, 2.), (1, 1, 1.), (1, 10, -1.), (3, 3, 1/2.), (4, 4, 2/3.), (5, 5, 3/4.), (6, 6, 4/5.), (7, 1, -1.)), # dH0_dT
+        ((0, 0, 1.), (1, 1, 1.), (2, 2, 1.), (3, 3, 1.), (4, 4, 1.), (5, 5, 1.), (6, 6, 1.)), # dS0_dT
+        ((0, 0, -2.), (1, 1, -1.), (3, 3, 1.), (4, 4, 2.), (5, 5, 3.), (6, 6, 4.)), # dCp0_dT
+    )):
+    for k, m, val in terms:
+        _POLY_MAP[q, k, m] = val
+
+
+# process-wide registry of Properties, so each (thermo data, composition) pair is only built once
+_PROPERTIES_REGISTRY = {}
+
+
+def get_properties(thermo_data_module, init_elements):
+    """
+    Returns the shared Properties for the given thermo data module and initial composition,
+    building it the first time it is requested.
+
+    The returned object's data arrays are read-only, since it may be used by any number
+    of components. Use `Properties` directly for a private, mutable copy.
+    """
+    if init_elements is None: # let Properties raise its usual error
+        return Properties(thermo_data_module, init_elements=init_elements)
+
+    key = (thermo_data_module, tuple(sorted(init_elements.items())))
+    try:
+        return _PROPERTIES_REGISTRY[key]
+    except KeyError:
+        pass
+
+    thermo = Properties(thermo_data_module, init_elements=dict(init_elements))
+    for name in ('b0', 'element_wt', 'aij', 'wt_mole', 'aij_prod', 'aij_prod_deriv', 'coeff_cube',
+                 'temp_ranges', 'num_ranges', 'temp_base', 'poly_cube'):
+        getattr(thermo, name).flags.writeable = False
+    thermo._registered = True
+
+    _PROPERTIES_REGISTRY[key] = thermo
+    return thermo
+
+
+def clear_properties_registry():
+    """Drops all the shared Properties (e.g. after thermo data has been modified in place)"""
+    _PROPERTIES_REGISTRY.clear()
+
+
+def _restore_properties(thermo_data, init_elements, registered):
+    # thermo data modules are given by name, compiled databases pickle themselves
+    if isinstance(thermo_data, str):
+        thermo_data_module = importlib.import_module(thermo_data)
+    else:
+        thermo_data_module = thermo_data
+    if registered:
+        return get_properties(thermo_data_module, init_elements)
+    return Properties(thermo_data_module, init_elements=init_elements)
+
+
 class Properties(object):
     """Compute H, S, Cp given a species and temperature"""
+
+    _registered = False
     
     def __init__(self, thermo_data_module, init_elements=None):
 
-        self.a = None
-        self.a_T = None
         self.b0 = None
         self.element_wt = None
         self.aij = None
         self.products = None
         self.elements = None
         self.temp_ranges = None
-        self.valid_temp_range = None
         self.wt_mole = None # array of mole weights
         self.thermo_data_module = thermo_data_module
-        self.prod_data = self.thermo_data_module.products
+        # compiled databases are sliced directly, without walking the products by name
+        self._db = thermo_data_module if isinstance(thermo_data_module, SpeciesDatabase) else None
+        self.prod_data = None if self._db is not None else self.thermo_data_module.products
         self.init_elements = init_elements
         self.temp_base = None # array of lowest end of lowest temperature range
 
@@ -37,20 +107,31 @@ class Properties(object):
             self.elements = sorted(elem_set)
 
 
-            valid_elements = set()
-
-            for compound in self.prod_data.keys():
-                valid_elements.update(self.prod_data[compound]['elements'].keys())
+            if self._db is not None:
+                db = self._db
+                valid_elements = set(db.elements[np.any(db.aij != 0, axis=1)])
+                all_products = set(db.species)
+            else:
+                valid_elements = set()
+                for compound in self.prod_data.keys():
+                    valid_elements.update(self.prod_data[compound]['elements'].keys())
+                all_products = self.prod_data.keys()
                 
             for element in self.elements:
                 if element not in valid_elements:
-                    if element in self.prod_data.keys():
+                    if element in all_products:
                         raise ValueError(f'The provided element `{element}` is a product in your provided thermo data, but is not an element.')
                     else:
                         raise ValueError(f'The provided element `{element}` is not used in any products in your thermo data.')
 
-            self.products = [name for name, prod_data in self.prod_data.items()
-                         if elem_set.issuperset(prod_data['elements'])]
+            if self._db is not None:
+                # products made only of the given elements
+                other_elements = ~np.isin(db.elements, self.elements)
+                self._db_prod_idx = np.nonzero(~np.any(db.aij[other_elements] != 0, axis=0))[0]
+                self.products = [str(name) for name in db.species[self._db_prod_idx]]
+            else:
+                self.products = [name for name, prod_data in self.prod_data.items()
+                             if elem_set.issuperset(prod_data['elements'])]
         
         else:
                 raise ValueError('You have not provided `init_elements`. In order to set thermodynamic data it must be provided.')
@@ -61,24 +142,28 @@ class Properties(object):
         self.num_element = len(element_list)
         self.num_prod = len(self.products)
 
-        self.a = np.zeros((self.num_prod, 10))
-        self.a_T = self.a.T
+        if self._db is not None:
+            elem_idx = np.searchsorted(self._db.elements, element_list)
+            self.element_wt = self._db.element_wt[elem_idx]
+            self.aij = self._db.aij[elem_idx][:, self._db_prod_idx]
+            self.wt_mole = self._db.wt[self._db_prod_idx]
 
-        element_wt = []
-        aij = []
+        else:
+            element_wt = []
+            aij = []
 
-        for e in element_list:
-            element_wt.append(self.thermo_data_module.element_wts[e])
+            for e in element_list:
+                element_wt.append(self.thermo_data_module.element_wts[e])
 
-            row = [self.prod_data[r]['elements'].get(e,0) for r in self.products]
-            aij.append(row)
+                row = [self.prod_data[r]['elements'].get(e,0) for r in self.products]
+                aij.append(row)
 
-        self.element_wt = np.array(element_wt)
-        self.aij = np.array(aij)
+            self.element_wt = np.array(element_wt)
+            self.aij = np.array(aij)
 
-        self.wt_mole = np.empty(self.num_prod)
-        for i,r in enumerate(self.products):
-            self.wt_mole[i] = self.prod_data[r]['wt']
+            self.wt_mole = np.empty(self.num_prod)
+            for i,r in enumerate(self.products):
+                self.wt_mole[i] = self.prod_data[r]['wt']
 
         #### pre-computed constants used in calculations ###
         aij_prod = np.empty((self.num_element,self.num_element, self.num_prod))
@@ -104,83 +189,82 @@ class Properties(object):
         self.b0 = self.b0/np.sum(self.b0)
         self.b0 = self.b0/self.element_wt
 
-        self.build_coeff_table(999) # just pick arbitrary default temperature so there is something there right away
-        
+        #### coefficient cube for all products and all temperature ranges ###
+        # stacked once, so picking the coefficients for a given temperature is just an index
+        # ranges are padded with inf, so products with fewer ranges never select the padding
+        if self._db is not None: # already stacked this way in the database
+            temp_ranges = self._db.ranges[self._db_prod_idx]
+            self.num_ranges = np.count_nonzero(np.isfinite(temp_ranges), axis=1) - 1
+            max_ranges = np.max(self.num_ranges)
+            self.coeff_cube = self._db.coeffs[self._db_prod_idx, :max_ranges]
+            self.temp_ranges = temp_ranges[:, :max_ranges+1]
+
+        else:
+            max_ranges = max(len(self.prod_data[p]['coeffs']) for p in self.products)
+            self.coeff_cube = np.zeros((self.num_prod, max_ranges, 10))
+            self.temp_ranges = np.full((self.num_prod, max_ranges+1), np.inf)
+            self.num_ranges = np.empty(self.num_prod, dtype=int)
+            for i, p in enumerate(self.products):
+                tr = self.prod_data[p]['ranges']
+                self.temp_ranges[i, :len(tr)] = tr
+                self.num_ranges[i] = len(tr) - 1
+                for j, data in enumerate(self.prod_data[p]['coeffs']):
+                    # have to slice because some rows are 9 long and others 10
+                    self.coeff_cube[i, j, :len(data)] = data
+        self.temp_base = self.temp_ranges[:, 0]
+        self._prod_idx = np.arange(self.num_prod)
+
+        # coefficients pre-multiplied into each property, for each power of T
+        self.poly_cube = np.einsum('prk,qkm->prqm', self.coeff_cube, _POLY_MAP)
+
+    def __reduce__(self):
+        # modules can't be pickled, so rebuild from the module name (through the registry if it came from there)
+        thermo_data = self._db if self._db is not None else self.thermo_data_module.__name__
+        return _restore_properties, (thermo_data, self.init_elements, self._registered)
+
+    def _range_idx(self, Tt):
+        """index of the temperature range for every product at each of the given temperatures.
+        This is equivalent to `np.searchsorted(ranges, Tt)` for each product, clipped so
+        temperatures beyond the data use the first/last fit."""
+        j = np.sum(self.temp_ranges < np.real(Tt)[:, np.newaxis, np.newaxis], axis=-1)
+        return np.minimum(np.maximum(j, 1), self.num_ranges) - 1
+
+    def evaluate_all(self, Tt):
+        """
+        Computes H0, S0, Cp0 and their derivatives w.r.t temperature for all products
+        at every temperature in `Tt`, each with its own valid coefficients for every product.
+        All six are computed from a single shared set of powers of T.
+
+        Returns six arrays of shape (len(Tt), num_prod):
+            H0, S0, Cp0, dH0_dT, dS0_dT, dCp0_dT
+        """
+        Tt = np.atleast_1d(Tt)
+
+        powers = np.empty((Tt.size, 11), dtype=np.result_type(Tt, float))
+        powers[:, :8] = Tt[:, np.newaxis]**_POWERS
+        powers[:, 8:] = log(Tt)[:, np.newaxis]*powers[:, 3:0:-1] # log(T) * (1, 1/T, 1/T**2)
+
+        coeffs = self.poly_cube[self._prod_idx, self._range_idx(Tt)] # (num_nodes, num_prod, 6, 11)
+
+        return tuple(np.einsum('npqm,nm->qnp', coeffs, powers))
+
+    # single temperature versions, using the first entry of Tt
 
     def H0(self, Tt): # standard-state molar enthalpy for species j at temp T
-        Tt = Tt[0]
-        if Tt < self.valid_temp_range[0] or Tt > self.valid_temp_range[1]: # runs if temperature is outside range of current coefficients
-            self.build_coeff_table(Tt)
-        a_T = self.a_T
-        return (-a_T[0]/Tt**2 + a_T[1]/Tt*log(Tt) + a_T[2] + a_T[3]*Tt/2. + a_T[4]*Tt**2/3. + a_T[5]*Tt**3/4. + a_T[6]*Tt**4/5.+a_T[7]/Tt)
+        return self.evaluate_all(Tt[:1])[0][0]
 
     def S0(self, Tt): # standard-state molar entropy for species j at temp T
-        Tt = Tt[0]
-        if Tt < self.valid_temp_range[0] or Tt > self.valid_temp_range[1]: # runs if temperature is outside range of current coefficients
-            self.build_coeff_table(Tt)
-        a_T = self.a_T
-        return (-a_T[0]/(2*Tt**2) - a_T[1]/Tt + a_T[2]*log(Tt) + a_T[3]*Tt + a_T[4]*Tt**2/2. + a_T[5]*Tt**3/3. + a_T[6]*Tt**4/4.+a_T[8])
+        return self.evaluate_all(Tt[:1])[1][0]
 
     def Cp0(self, Tt): #molar heat capacity at constant pressure for
                     #standard state for species or reactant j, J/(kg-mole)_j(K)
-        Tt = Tt[0]
-        if Tt < self.valid_temp_range[0] or Tt > self.valid_temp_range[1]: # runs if temperature is outside range of current coefficients
-            self.build_coeff_table(Tt)
-        a_T = self.a_T
-        return a_T[0]/Tt**2 + a_T[1]/Tt + a_T[2] + a_T[3]*Tt + a_T[4]*Tt**2 + a_T[5]*Tt**3 + a_T[6]*Tt**4
+        return self.evaluate_all(Tt[:1])[2][0]
 
     def H0_applyJ(self, Tt, vec):
-        Tt = Tt[0]
-        if Tt < self.valid_temp_range[0] or Tt > self.valid_temp_range[1]: # runs if temperature is outside range of current coefficients
-            self.build_coeff_table(Tt)
-        a_T = self.a_T
-        return vec*(2*a_T[0]/Tt**3 + a_T[1]*(1-log(Tt))/Tt**2 + a_T[3]/2. + 2*a_T[4]/3.*Tt + 3*a_T[5]/4.*Tt**2 + 4*a_T[6]/5.*Tt**3 - a_T[7]/Tt**2)
+        return vec*self.evaluate_all(Tt[:1])[3][0]
 
     def S0_applyJ(self, Tt, vec):
-        Tt = Tt[0]
-        if Tt < self.valid_temp_range[0] or Tt > self.valid_temp_range[1]: # runs if temperature is outside range of current coefficients
-            self.build_coeff_table(Tt)
-        a_T = self.a_T
-        return vec*(a_T[0]/(Tt**3) + a_T[1]/Tt**2 + a_T[2]/Tt + a_T[3] + a_T[4]*Tt + a_T[5]*Tt**2 + 4*a_T[6]/4.*Tt**3)
+        return vec*self.evaluate_all(Tt[:1])[4][0]
 
     def Cp0_applyJ(self, Tt, vec):
-        Tt = Tt[0]
-        if Tt < self.valid_temp_range[0] or Tt > self.valid_temp_range[1]: # runs if temperature is outside range of current coefficients
-            self.build_coeff_table(Tt)
-        a_T = self.a_T
-        return vec*(-2*a_T[0]/Tt**3 - a_T[1]/Tt**2 + a_T[3] + 2.*a_T[4]*Tt + 3.*a_T[5]*Tt**2 + 4.*a_T[6]*Tt**3)
-
-    def build_coeff_table(self, Tt):
-        """Build the temperature specific coeff array and find the highest-low value and
-        the lowest-high value of temperatures from all the reactants to give the
-        valid range for the data fits."""
-
-        if self.temp_base is None:
-            self.temp_base = np.zeros(self.num_prod)
-
-        max_low, min_high = -1e50, 1e50
-        for i,p in enumerate(self.products):
-            tr = self.prod_data[p]['ranges']
-
-            if self.temp_base[i] == 0:
-                self.temp_base[i] = tr[0]
-
-            j = int(np.searchsorted(tr, Tt))
-            if j == 0: # dont run off the start
-                j = 1
-            elif j == len(tr): # don't run off the end
-                j -= 1
-
-            # find valid range
-            low, high = tr[j-1], tr[j]
-            max_low = max(low, max_low)
-            min_high = min(high, min_high)
-
-            # built a data
-            data = self.prod_data[p]['coeffs'][j-1]
-
-            # have to slice because some rows are 9 long and others 10
-            self.a[i][:len(data)] = data
-
-        self.valid_temp_range = (max_low, min_high)
-
+        return vec*self.evaluate_all(Tt[:1])[5][0]
@@ -0,0 +1,344 @@
+"""
+Compiled species databases.
+
+The thermo data modules in `pycycle.thermo.cea.thermo_data` are python literals, which have to be
+parsed at import and then walked product by product every time a `Properties` is built.
+A compiled database holds the same data as a bundle of arrays in a single `.npz` file, so
+loading it is a handful of array reads and `Properties` can slice out the products it needs
+directly.
+
+Databases can be compiled from any thermo data module (anything with `products`, `element_wts`
+and, optionally, `reactants`) or from a NASA Glenn `thermo.inp` file:
+
+    python -m pycycle.thermo.cea.species_db janaf janaf.npz
+    python -m pycycle.thermo.cea.species_db thermo.inp my_species.npz
+
+and are then used anywhere a thermo data module is accepted:
+
+    spec = species_db.load_species_db('my_species.npz')
+    thermo = species_data.get_properties(spec, CEA_AIR_COMPOSITION)
+"""
+from collections import OrderedDict
+import importlib
+import os
+import sys
+
+import numpy as np
+
+
+FORMAT_VERSION = 1
+
+_REQUIRED_ARRAYS = ('format_version', 'species', 'wt', 'elements', 'element_wt', 'aij',
+                    'coeffs', 'ranges', 'reactant_names', 'reactant_amounts')
+
+# powers of T of the 7 `a` coefficients in the NASA 9 coefficient fits
+_NASA9_EXPONENTS = (-2., -1., 0., 1., 2., 3., 4.)
+
+# loaded databases, keyed on the real path of the file (with the modification time it was read at), so
+# every load of an unchanged file returns the same object (and shares the same registered Properties)
+_DATABASES = {}
+
+
+class SpeciesDatabase(object):
+    """
+    A compiled set of thermodynamic data, usable in place of a thermo data module.
+
+    The data lives in arrays (`species`, `wt`, `elements`, `element_wt`, `aij`, `coeffs`, `ranges`).
+    The module style `products`, `element_wts` and `reactants` dictionaries are built from them
+    on first access, for code that still walks the data by name.
+    """
+
+    def __init__(self, arrays, filename=None):
+        self.filename = filename
+        self.__name__ = filename if filename is not None else '<species database>'
+
+        self.species = arrays['species']
+        self.wt = arrays['wt']
+        self.elements = arrays['elements']
+        self.element_wt = arrays['element_wt']
+        self.aij = arrays['aij']
+        self.coeffs = arrays['coeffs']
+        self.ranges = arrays['ranges']
+        self.reactant_names = arrays['reactant_names']
+        self.reactant_amounts = arrays['reactant_amounts']
+
+        self._products = None
+
+    def __reduce__(self):
+        if self.filename is None:
+            raise TypeError('Only species databases loaded from a file can be pickled')
+        return load_species_db, (self.filename,)
+
+    @property
+    def products(self):
+        if self._products is None:
+            self._products = products = OrderedDict()
+            for i, name in enumerate(self.species):
+                n_ranges = np.count_nonzero(np.isfinite(self.ranges[i])) - 1
+                products[str(name)] = {
+                    'coeffs': [list(c) for c in self.coeffs[i, :n_ranges, :9]],
+                    'ranges': self.ranges[i, :n_ranges+1],
+                    'wt': self.wt[i],
+                    'elements': {str(e): a for e, a in zip(self.elements, self.aij[:, i]) if a != 0},
+                }
+        return self._products
+
+    @property
+    def element_wts(self):
+        return {str(e): wt for e, wt in zip(self.elements, self.element_wt)}
+
+    @property
+    def reactants(self):
+        return {str(name): OrderedDict((str(e), a) for e, a in zip(self.elements, amounts) if a != 0)
+                for name, amounts in zip(self.reactant_names, self.reactant_amounts)}
+
+
+def _validate(arrays, filename):
+    def fail(msg):
+        raise ValueError(f'Invalid species database {filename}: {msg}')
+
+    missing = [name for name in _REQUIRED_ARRAYS if name not in arrays]
+    if missing:
+        fail(f'missing arrays {missing}')
+
+    version = int(arrays['format_version'])
+    if version != FORMAT_VERSION:
+        fail(f'format version {version} is not supported (expected {FORMAT_VERSION})')
+
+    num_prod = arrays['species'].size
+    num_element = arrays['elements'].size
+    num_ranges = arrays['coeffs'].shape[1] if arrays['coeffs'].ndim == 3 else -1
+
+    expected_shapes = {
+        'wt': (num_prod,),
+        'element_wt': (num_element,),
+        'aij': (num_element, num_prod),
+        'coeffs': (num_prod, num_ranges, 10),
+        'ranges': (num_prod, num_ranges+1),
+        'reactant_amounts': (arrays['reactant_names'].size, num_element),
+    }
+    for name, shape in expected_shapes.items():
+        if arrays[name].shape != shape:
+            fail(f'`{name}` has shape {arrays[name].shape}, but {shape} was expected')
+
+    if len(set(arrays['species'])) != num_prod:
+        fail('species names are not unique')
+    if len(set(arrays['elements'])) != num_element:
+        fail('element names are not unique')
+    if not np.all(arrays['wt'] > 0) or not np.all(arrays['element_wt'] > 0):
+        fail('molecular and element weights must be positive')
+    if not np.all(np.isfinite(arrays['coeffs'])):
+        fail('coefficients must be finite')
+
+    ranges = arrays['ranges']
+    finite = np.isfinite(ranges)
+    n_finite = np.count_nonzero(finite, axis=1)
+    padded = np.arange(num_ranges+1) < n_finite[:, np.newaxis]
+    if np.any(n_finite < 2) or np.any(finite != padded):
+        fail('every species needs at least one temperature range, padded at the end with inf')
+    if np.any(np.diff(ranges, axis=1)[padded[:, 1:]] <= 0):
+        fail('temperature ranges must be increasing')
+
+
+def load_species_db(filename, validate=True):
+    """
+    Loads a compiled species database from an `.npz` file.
+
+    Each file is only read once per process, later loads return the same `SpeciesDatabase`
+    until the file changes.
+    """
+    path = os.path.realpath(filename)
+    mtime = os.stat(path).st_mtime_ns
+    if path in _DATABASES and _DATABASES[path][0] == mtime:
+        return _DATABASES[path][1]
+
+    with np.load(path, allow_pickle=False) as data:
+        arrays = {name: data[name] for name in data.files}
+
+    if validate:
+        _validate(arrays, filename)
+
+    for a in arrays.values():
+        a.flags.writeable = False
+
+    db = SpeciesDatabase(arrays, filename=path)
+    _DATABASES[path] = (mtime, db)
+    return db
+
+
+def save_species_db(filename, products, element_wts, reactants=None):
+    """
+    Compiles thermo data, given as the `products`, `element_wts` and `reactants` dictionaries of a
+    thermo data module, into an `.npz` species database. Product order is kept.
+    """
+    if reactants is None:
+        reactants = {}
+
+    species = list(products.keys())
+    elements = set()
+    for data in products.values():
+        elements.update(data['elements'])
+    for amounts in reactants.values():
+        elements.update(amounts)
+    elements = sorted(elements)
+
+    missing = [e for e in elements if e not in element_wts]
+    if missing:
+        raise ValueError(f'No element weights were given for {missing}')
+
+    num_prod = len(species)
+    max_ranges = max(len(data['coeffs']) for data in products.values())
+
+    wt = np.empty(num_prod)
+    aij = np.zeros((len(elements), num_prod))
+    coeffs = np.zeros((num_prod, max_ranges, 10))
+    ranges = np.full((num_prod, max_ranges+1), np.inf)
+    for i, (name, data) in enumerate(products.items()):
+        wt[i] = data['wt']
+        for e, a in data['elements'].items():
+            aij[elements.index(e), i] = a
+        tr = data['ranges']
+        if len(tr) != len(data['coeffs']) + 1:
+            raise ValueError(f'`{name}` has {len(data["coeffs"])} coefficient sets but {len(tr)-1} temperature ranges')
+        ranges[i, :len(tr)] = tr
+        for j, c in enumerate(data['coeffs']):
+            coeffs[i, j, :len(c)] = c
+
+    reactant_names = list(reactants.keys())
+    reactant_amounts = np.zeros((len(reactant_names), len(elements)))
+    for k, amounts in enumerate(reactants.values()):
+        for e, a in amounts.items():
+            reactant_amounts[k, elements.index(e)] = a
+
+    arrays = {
+        'format_version': np.array(FORMAT_VERSION),
+        'species': np.array(species, dtype=str),
+        'wt': wt,
+        'elements': np.array(elements, dtype=str),
+        'element_wt': np.array([element_wts[e] for e in elements], dtype=float),
+        'aij': aij,
+        'coeffs': coeffs,
+        'ranges': ranges,
+        'reactant_names': np.array(reactant_names, dtype=str),
+        'reactant_amounts': reactant_amounts,
+    }
+    _validate(arrays, filename)
+
+    np.savez(filename, **arrays)
+
+
+def _inp_float(field):
+    field = field.strip()
+    return float(field.replace('D', 'E').replace('d', 'e')) if field else 0.
+
+
+def read_thermo_inp(filename, element_wts=None):
+    """
+    Reads the gaseous species of a NASA Glenn `thermo.inp` file (NASA TP-2002-211556 format)
+    into the `products` dictionary layout used by the thermo data modules.
+
+    Condensed species, ions and the reactant-only entries (no temperature intervals) are skipped,
+    since the equilibrium solver only handles neutral gases.
+    Element symbols are capitalized the way the thermo data modules spell them (e.g. AR -> Ar).
+
+    Returns
+    -------
+    products : OrderedDict
+    element_wts : dict
+        `element_wts` (by default the janaf element weights), restricted to the elements used
+    """
+    if element_wts is None:
+        from pycycle.thermo.cea.thermo_data import janaf
+        element_wts = janaf.element_wts
+
+    with open(filename) as f:
+        lines = [line.rstrip('\n') for line in f if line.strip() and line[0] not in '!#']
+
+    if lines and lines[0].strip().lower().startswith('thermo'):
+        lines = lines[2:] # skip the keyword and the line of default temperature intervals
+
+    products = OrderedDict()
+    used_elements = set()
+    i = 0
+    while i < len(lines) and not lines[i].upper().startswith('END'):
+        name = lines[i][:18].strip()
+        header = lines[i+1].ljust(80)
+        n_intervals = int(header[0:2])
+
+        elements = OrderedDict()
+        for k in range(5):
+            symbol = header[10+8*k:12+8*k].strip()
+            amount = _inp_float(header[12+8*k:18+8*k])
+            if symbol and amount != 0:
+                elements[symbol.capitalize()] = elements.get(symbol.capitalize(), 0) + amount
+        condensed = int(_inp_float(header[50:52])) != 0
+        wt = _inp_float(header[52:65])
+
+        if n_intervals == 0: # reactant entry, only an assigned temperature
+            i += 3
+            continue
+
+        coeffs = []
+        ranges = []
+        for j in range(n_intervals):
+            interval, line1, line2 = (lines[i+2+3*j+k].ljust(80) for k in range(3))
+            T_low, T_high = _inp_float(interval[0:11]), _inp_float(interval[11:22])
+            exponents = tuple(_inp_float(interval[23+5*k:28+5*k]) for k in range(7))
+            if exponents != _NASA9_EXPONENTS:
+                raise ValueError(f'`{name}` in {filename} uses T exponents {exponents}, '
+                                 f'only the standard {_NASA9_EXPONENTS} are supported')
+
+            a = [_inp_float(line1[16*k:16*(k+1)]) for k in range(5)]
+            a += [_inp_float(line2[0:16]), _inp_float(line2[16:32])]
+            b = [_inp_float(line2[48:64]), _inp_float(line2[64:80])]
+            coeffs.append(a + b)
+
+            if not ranges:
+                ranges.append(T_low)
+            ranges.append(T_high)
+
+        i += 2 + 3*n_intervals
+
+        if condensed or 'E' in elements:
+            continue
+
+        missing = [e for e in elements if e not in element_wts]
+        if missing:
+            raise ValueError(f'`{name}` in {filename} uses elements {missing} with no known weight, '
+                             'provide them through `element_wts`')
+
+        products[name] = {'coeffs': coeffs, 'ranges': np.array(ranges), 'wt': wt, 'elements': elements}
+        used_elements.update(elements)
+
+    return products, {e: element_wts[e] for e in sorted(used_elements)}
+
+
+def compile_species_db(source, filename, element_wts=None, reactants=None):
+    """
+    Compiles a thermo data module, or the path of a NASA `thermo.inp` file, into an `.npz` database.
+
+    `element_wts` and `reactants` override (for modules) or supply (for `thermo.inp` files) the
+    element weights and reactant definitions.
+    """
+    if isinstance(source, str):
+        products, inp_element_wts = read_thermo_inp(source, element_wts=element_wts)
+        save_species_db(filename, products, inp_element_wts, reactants)
+    else:
+        save_species_db(filename, source.products,
+                        element_wts if element_wts is not None else source.element_wts,
+                        reactants if reactants is not None else getattr(source, 'reactants', None))
+
+
+if __name__ == "__main__":
+
+    if len(sys.argv) != 3:
+        print('usage: python -m pycycle.thermo.cea.species_db <thermo data module or thermo.inp> <output.npz>')
+        sys.exit(1)
+
+    source, filename = sys.argv[1:]
+    if not os.path.isfile(source):
+        if '.' not in source:
+            source = f'pycycle.thermo.cea.thermo_data.{source}'
+        source = importlib.import_module(source)
+
+    compile_species_db(source, filename)
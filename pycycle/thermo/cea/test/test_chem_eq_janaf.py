@@ -1,41 +1,187 @@
-import unittest
-import numpy as np
-
-from openmdao.api import Problem, Group
-
-from openmdao.utils.assert_utils import assert_near_equal
-
-from pycycle.thermo.cea.chem_eq import ChemEq
-from pycycle.thermo.cea import species_data
-from pycycle import constants
-
-
-class ChemEqTestCase(unittest.TestCase):
-
-    def setUp(self):
-        self.thermo = species_data.Properties(species_data.janaf, init_elements=constants.AIR_ELEMENTS)
-        p = self.p = Problem(model=Group())
-        p.model.suppress_solver_output = True
-        p.model.set_input_defaults('P', 1.034210, units="bar")
-
-    def test_set_total_tp(self):
-        p = self.p
-        p.model.add_subsystem('ceq', ChemEq(thermo=self.thermo), promotes=["*"])
-        p.model.set_input_defaults('T', 1500., units='degK')
-        p.setup(check=False)
-        p.run_model()
-
-        check_val = np.array([3.23319236e-04, 1.00000000e-10, 1.10138429e-05, 1.00000000e-10,
-                              1.72853915e-08, 6.76015824e-09, 1.00000000e-10, 2.69578737e-02,
-                              4.80653071e-09, 7.23197634e-03])
-
-        tol = 6e-4
-
-        print(p['n'])
-        print(check_val)
-        assert_near_equal(p['n'], check_val, tol)
-
-
-if __name__ == "__main__":
-
+import unittest
+import numpy as np
+
+from openmdao.api import Problem, Group
+
+from openmdao.utils.assert_utils import assert_near_equal
+
+from pycycle.thermo.cea.chem_eq import ChemEq, SetTotalTP, EquilibriumCache, equilibrium_cache
+from pycycle.thermo.cea import species_data
+from pycycle import constants
+
+
+def run_equilibrium(ceq, T, P):
+    """ Solves a ChemEq, or a SetTotalTP holding one, at the given temperatures (degK) and pressures (bar)
+    and returns the problem. The default tolerances are loose enough that trace species are not fully
+    converged, so the equilibrium is converged to 1e-12."""
+    p = Problem()
+    p.model.add_subsystem('ceq', ceq, promotes=['*'])
+    p.model.set_input_defaults('T', T, units='degK')
+    p.model.set_input_defaults('P', P, units='bar')
+    p.setup(check=False)
+    p.set_solver_print(level=-1)
+
+    chem_eq = ceq if isinstance(ceq, ChemEq) else ceq.chem_eq
+    if chem_eq.options['fused_newton'] or chem_eq.options['formulation'] == 'reduced':
+        chem_eq.fused_newton_options['atol'] = 1e-12
+        chem_eq.fused_newton_options['rtol'] = 1e-12
+    else:
+        chem_eq.nonlinear_solver.options['atol'] = 1e-12
+        chem_eq.nonlinear_solver.options['rtol'] = 1e-12
+    p.run_model()
+
+    return p
+
+
+class ChemEqTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.thermo = species_data.Properties(species_data.janaf, init_elements=constants.AIR_ELEMENTS)
+        p = self.p = Problem(model=Group())
+        p.model.suppress_solver_output = True
+        p.model.set_input_defaults('P', 1.034210, units="bar")
+
+    def test_set_total_tp(self):
+        p = self.p
+        p.model.add_subsystem('ceq', ChemEq(thermo=self.thermo), promotes=["*"])
+        p.model.set_input_defaults('T', 1500., units='degK')
+        p.setup(check=False)
+        p.run_model()
+
+        check_val = np.array([3.23319236e-04, 1.00000000e-10, 1.10138429e-05, 1.00000000e-10,
+                              1.72853915e-08, 6.76015824e-09, 1.00000000e-10, 2.69578737e-02,
+                              4.80653071e-09, 7.23197634e-03])
+
+        tol = 6e-4
+
+        print(p['n'])
+        print(check_val)
+        assert_near_equal(p['n'], check_val, tol)
+
+    def test_num_nodes(self):
+        T = np.array([500., 1500., 2500.])
+        P = np.array([1.034210, 5., 20.])
+
+        p = run_equilibrium(SetTotalTP(spec=species_data.janaf, composition=constants.CEA_AIR_COMPOSITION, num_nodes=3), T, P)
+
+        # every node should match an independent single-point solve
+        for i in range(3):
+            p1 = run_equilibrium(SetTotalTP(spec=species_data.janaf, composition=constants.CEA_AIR_COMPOSITION), T[i], P[i])
+
+            assert_near_equal(p['n'][i], p1['n'], 1e-6)
+            for var in ('h', 'S', 'gamma', 'Cp', 'Cv', 'rho', 'R'): 
+                assert_near_equal(p[var][i], p1[var][0], 1e-6)
+
+    def test_prune_trace_species(self):
+        thermo = species_data.Properties(species_data.janaf, init_elements=constants.CEA_AIR_FUEL_COMPOSITION)
+
+        n = {}
+        totals = {}
+        for prune in (False, True): 
+            p = run_equilibrium(ChemEq(thermo=thermo, num_nodes=3, prune_trace_species=prune), [500., 1500., 2500.], [1., 5., 20.])
+            n[prune] = p['n'].copy()
+            totals[prune] = p.compute_totals(of=['n', 'n_moles'], wrt=['T', 'P', 'composition'])
+
+        # most of the products are trace species at the low temperature node, so they drop out of the solve
+        self.assertLess(len(p.model.ceq._active_idx[0]), thermo.num_prod)
+
+        assert_near_equal(n[True], n[False], 1e-8)
+        for key, val in totals[False].items():
+            assert_near_equal(totals[True][key], val, 1e-8)
+
+        # the species left out are exactly the trace species decoupled from the newton system
+        ceq = p.model.ceq
+        for idx, trace in zip(ceq._active_idx, ceq._trace):
+            self.assertEqual(np.setdiff1d(np.arange(ceq.size), idx).tolist(), np.nonzero(trace)[0].tolist())
+
+        # nodes that are not close to convergence keep all of their species
+        ceq.remove_trace_species[0] = False
+        ceq._gibbs_resids(p['P'], p['composition'].reshape((3, -1)), p['n'].reshape((3, -1)), p['pi'].reshape((3, -1)))
+        ceq._update_active_set()
+        self.assertEqual(len(ceq._active_idx[0]), ceq.size)
+
+    def test_fused_newton(self):
+        thermo = species_data.Properties(species_data.janaf, init_elements=constants.CEA_AIR_FUEL_COMPOSITION)
+
+        n = {}
+        for fused, prune in ((False, False), (True, False), (True, True)):
+            p = run_equilibrium(ChemEq(thermo=thermo, num_nodes=3, fused_newton=fused, prune_trace_species=prune),
+                                [500., 1500., 2500.], [1., 5., 20.])
+            n[fused, prune] = p['n'].copy()
+
+            if fused:
+                self.assertTrue(np.all(p.model.ceq.newton_converged))
+                self.assertLess(p.model.ceq.newton_iters, 100)
+                assert_near_equal(p['n_moles'], np.sum(p['n'], axis=1), 1e-12)
+
+        assert_near_equal(n[True, False], n[False, False], 1e-8)
+        assert_near_equal(n[True, True], n[False, False], 1e-8)
+
+    def test_reduced_formulation(self):
+        thermo = species_data.Properties(species_data.janaf, init_elements=constants.CEA_AIR_FUEL_COMPOSITION)
+
+        n = {}
+        for formulation in ('full', 'reduced'):
+            p = run_equilibrium(ChemEq(thermo=thermo, num_nodes=4, formulation=formulation),
+                                [500., 1500., 2500., 4000.], [1., 5., 20., .1])
+            n[formulation] = p['n'].copy()
+
+        self.assertTrue(np.all(p.model.ceq.newton_converged))
+        assert_near_equal(n['reduced'], n['full'], 1e-8)
+
+    def test_warm_start(self):
+        thermo = species_data.Properties(species_data.janaf, init_elements=constants.CEA_AIR_COMPOSITION)
+
+        n = []
+        iters = []
+        for T in (2000., 2010.):
+            p = run_equilibrium(ChemEq(thermo=thermo, warm_start=True), T, 5.)
+            n.append(p['n'].copy())
+            iters.append(p.model.ceq.nonlinear_solver._iter_count)
+
+        # the cache is shared by everything using the thermo object, so the second problem starts from the first solution
+        self.assertGreater(len(equilibrium_cache(thermo)), 0)
+        self.assertLess(iters[1], iters[0])
+
+        p = run_equilibrium(ChemEq(thermo=species_data.Properties(species_data.janaf, init_elements=constants.CEA_AIR_COMPOSITION)), 2010., 5.)
+        assert_near_equal(n[1], p['n'], 1e-6)
+
+        # only converged states are cached, not the iterates of a newton that was stopped early (here
+        # the first node already has its trace species removed, but is far from converged)
+        thermo = species_data.Properties(species_data.janaf, init_elements=constants.CEA_AIR_FUEL_COMPOSITION)
+        p = Problem()
+        p.model.add_subsystem('ceq', ChemEq(thermo=thermo, num_nodes=3, warm_start=True), promotes=['*'])
+        p.model.set_input_defaults('T', [500., 1500., 2500.], units='degK')
+        p.model.set_input_defaults('P', [1., 5., 20.], units='bar')
+        p.setup(check=False)
+        p.set_solver_print(level=-1)
+        p.model.ceq.nonlinear_solver.options['maxiter'] = 9
+        p.model.ceq.nonlinear_solver.options['atol'] = 1e-12
+        p.model.ceq.nonlinear_solver.options['rtol'] = 1e-12
+        p.run_model()
+        self.assertTrue(p.model.ceq.remove_trace_species[0])
+        self.assertEqual(len(equilibrium_cache(thermo)), 0)
+
+
+    def test_equilibrium_cache(self):
+        cache = EquilibriumCache(maxsize=2)
+        b0 = np.array([1., 2.])
+        for T in (1000., 1500., 2000., 2001.):
+            cache.store(T, 1e5, b0, np.full(3, T), np.zeros(2))
+
+        # 2001 K falls in the same bin as 2000 K and replaces it, 1000 K was evicted to make room for 2000 K
+        self.assertEqual(len(cache), 2)
+        n, _ = cache.nearest(2100., 1e5, b0)
+        assert_near_equal(n, np.full(3, 2001.))
+        n, _ = cache.nearest(1000., 1e5, b0)
+        assert_near_equal(n, np.full(3, 1500.))
+
+        # lookups count as a use, so 2001 K is now the oldest entry
+        cache.store(500., 1e5, b0, np.full(3, 500.), np.zeros(2))
+        n, _ = cache.nearest(2100., 1e5, b0)
+        assert_near_equal(n, np.full(3, 1500.))
+
+
+if __name__ == "__main__":
+
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,119 @@
+import unittest
+
+import numpy as np
+
+import openmdao.api as om
+from openmdao.utils.assert_utils import assert_near_equal, assert_check_partials
+
+from pycycle.thermo.thermo import Thermo, ThermoAdd
+from pycycle.thermo.cea import species_data
+from pycycle.thermo.cea.frozen import FrozenProps
+from pycycle import constants
+
+
+class FrozenThermoTestCase(unittest.TestCase):
+
+    def test_matches_cea_cold_air(self):
+
+        results = {}
+        for method in ('CEA', 'FROZEN'):
+            p = om.Problem()
+            p.model.add_subsystem('thermo', Thermo(mode='total_TP', method=method,
+                                                   thermo_kwargs={'composition': constants.CEA_AIR_COMPOSITION,
+                                                                  'spec': species_data.janaf}),
+                                  promotes=['*'])
+            p.setup(check=False)
+            p.set_solver_print(level=-1)
+
+            results[method] = []
+            for T in (300., 700., 1100.):
+                p.set_val('T', T, units='degK')
+                p.set_val('P', 5., units='bar')
+                p.run_model()
+                results[method].append([p[name][0] for name in ('h', 'S', 'Cp', 'gamma', 'rho')])
+
+        # below ~1200 K air barely dissociates, so the frozen mixture matches the equilibrium one
+        assert_near_equal(np.array(results['FROZEN']), np.array(results['CEA']), 1e-3)
+
+    def test_total_hP(self):
+        p = om.Problem()
+        p.model = Thermo(mode='total_hP', method='FROZEN',
+                         thermo_kwargs={'composition': constants.CEA_AIR_COMPOSITION,
+                                        'spec': species_data.janaf})
+        p.setup(check=False)
+        p.set_solver_print(level=-1)
+
+        p.set_val('h', 50., units='cal/g')
+        p.set_val('P', 5., units='bar')
+        p.run_model()
+
+        assert_near_equal(p['base_thermo.h'], 50., 1e-8)
+        assert_near_equal(p['T'], 508.477, 1e-4) # CEA gives 508.4769
+
+    def test_thermo_add(self):
+        thermo = species_data.Properties(species_data.janaf, init_elements=constants.CEA_AIR_COMPOSITION)
+
+        results = {}
+        # the reference equilibrium options only apply to the frozen thermo, not to the mixer
+        for method, ref_kwargs in (('CEA', {}), ('FROZEN', {'T_ref': 800., 'P_ref': 2.})):
+            p = om.Problem()
+            p.model = ThermoAdd(method=method, mix_mode='reactant', mix_names='fuel',
+                                thermo_kwargs={'spec': species_data.janaf,
+                                               'inflow_composition': constants.CEA_AIR_COMPOSITION,
+                                               'mix_composition': 'JP-7', **ref_kwargs})
+            p.setup(check=False)
+
+            p['Fl_I:stat:W'] = 38.8
+            p['Fl_I:tot:h'] = 181.381769
+            p['Fl_I:tot:composition'] = thermo.b0
+            p['fuel:ratio'] = 0.02673
+            p.run_model()
+
+            results[method] = [p[name].copy() for name in ('mass_avg_h', 'Wout', 'composition_out')]
+
+        for frozen, cea in zip(results['FROZEN'], results['CEA']):
+            assert_near_equal(frozen, cea, 1e-12)
+
+    def test_partials(self):
+        thermo = species_data.Properties(species_data.janaf, init_elements=constants.CEA_AIR_COMPOSITION)
+
+        p = om.Problem()
+        p.model.add_subsystem('props', FrozenProps(thermo=thermo, num_nodes=2), promotes=['*'])
+        p.model.set_input_defaults('T', [500., 1000.], units='degK')
+        p.model.set_input_defaults('P', [1., 10.], units='bar')
+        p.model.set_input_defaults('composition', np.vstack((thermo.b0, 1.01*thermo.b0)))
+        p.setup(check=False, force_alloc_complex=True)
+        p.run_model()
+
+        data = p.check_partials(out_stream=None, method='cs')
+        assert_check_partials(data, atol=1e-8, rtol=1e-8)
+
+    def test_rich_mixture(self):
+        thermo = species_data.Properties(species_data.janaf, init_elements=constants.CEA_AIR_FUEL_COMPOSITION)
+
+        # burn a CH1.95 fuel well past stoichiometric, so the O2 of the lean reference runs out
+        far = 0.1
+        b = thermo.b0.copy()
+        b[thermo.elements.index('C')] += far/13.9
+        b[thermo.elements.index('H')] += 1.95*far/13.9
+        b /= 1 + far
+
+        p = om.Problem()
+        p.model.add_subsystem('props', FrozenProps(thermo=thermo, num_nodes=2), promotes=['*'])
+        p.model.set_input_defaults('T', [1500., 2000.], units='degK')
+        p.model.set_input_defaults('P', [1., 10.], units='bar')
+        p.model.set_input_defaults('composition', np.vstack((b, b)))
+        p.setup(check=False, force_alloc_complex=True)
+        with self.assertWarns(UserWarning) as cm:
+            p.run_model()
+        self.assertIn('The species NO2, O2 ran out', str(cm.warning))
+
+        for name in ('h', 'S', 'Cp', 'Cv', 'gamma', 'rho', 'R'):
+            self.assertTrue(np.all(np.isfinite(p[name])), msg=name)
+
+        data = p.check_partials(out_stream=None, method='cs')
+        assert_check_partials(data, atol=1e-8, rtol=1e-8)
+
+
+if __name__ == "__main__":
+    unittest.main()
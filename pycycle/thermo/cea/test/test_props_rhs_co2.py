@@ -4,10 +4,11 @@ import numpy as np
 
 from openmdao.api import Problem, Group
 
-from openmdao.utils.assert_utils import assert_near_equal
+from openmdao.utils.assert_utils import assert_near_equal, assert_check_partials, assert_check_totals
 
 from pycycle.thermo.cea.props_rhs import PropsRHS
 from pycycle.thermo.cea.props_calcs import PropsCalcs
+from pycycle.thermo.cea.props_solve import PropsSolve
 from pycycle.thermo.cea import species_data
 from pycycle import constants
 
@@ -105,5 +106,77 @@ class PropsCalcsTestCase(unittest.TestCase):
         assert_near_equal(p['rho'], 0.0003648856, tol)
 
 
+class VectorizedPropsTestCase(unittest.TestCase):
+
+    def test_partials(self):
+
+        thermo = species_data.Properties(species_data.co2_co_o2, init_elements=constants.CO2_CO_O2_ELEMENTS)
+
+        p = Problem()
+        p.model.add_subsystem('props_rhs', PropsRHS(thermo, num_nodes=2), promotes_inputs=['*'])
+        p.model.add_subsystem('props', PropsCalcs(thermo=thermo, num_nodes=2), promotes_inputs=['*'])
+        p.model.set_input_defaults('n', np.ones((2, thermo.num_prod)))
+
+        p.setup(check=False, force_alloc_complex=True)
+
+        p['T'] = [4000., 1500.]
+        p['P'] = [1.034210, 1.034210]
+        p['n'] = np.array([[0.02040741, 0.0023147, 0.0102037], 
+                           [8.15344274e-06, 2.27139552e-02, 4.07672137e-06]])
+        p['n_moles'] = [0.03292581, 0.022726185333]
+        p['composition'] = np.array([[0.02272211, 0.04544422], [0.02272211, 0.04544422]])
+        p['result_T'] = np.array([[-1.74791977, 1.81604241, -0.24571810], 
+                                  [-1.48684061e+01, -5.86384040e+00, -2.68839475e-03]])
+        p['result_P'] = np.array([[0.48300853, 0.48301125, -0.01522548], 
+                                  [3.33393139e-01, 3.33393139e-01, -5.97840423e-05]])
+
+        p.run_model()
+
+        tol = 1e-4
+        assert_near_equal(p['props.Cp'], [0.579647062532, 0.322460071411], tol)
+        assert_near_equal(p['props.gamma'], [1.19039, 1.16380], tol)
+        assert_near_equal(p['props.h'], [340.324938088, -1801.35777129], tol)
+
+        partial_data = p.check_partials(out_stream=None, method='cs')
+        assert_check_partials(partial_data, atol=1e-8, rtol=1e-6)
+
+
+class PropsSolveTestCase(unittest.TestCase):
+
+    def test_solve(self):
+
+        thermo = species_data.Properties(species_data.co2_co_o2, init_elements=constants.CO2_CO_O2_ELEMENTS)
+
+        p = Problem()
+        p.model.add_subsystem('props_solve', PropsSolve(thermo=thermo, num_nodes=2), promotes=['*'])
+
+        p.setup(check=False, force_alloc_complex=True)
+
+        lhs_TP = np.array([[0.02272211, 0.02503681, 0.02272211],
+                           [0.02503681, 0.07048103, 0.04544422],
+                           [0.02272211, 0.04544422, 0.]])
+        p['lhs_TP'] = np.array([lhs_TP, 1.1*lhs_TP])
+        p['rhs_T'] = np.array([[0.00016837, 0.07307206, 0.04281455], [0.00016837, 0.07307206, 0.04281455]])
+        p['rhs_P'] = np.array([[0.02272211, 0.04544422, 0.03292581], [0.02272211, 0.04544422, 0.03292581]])
+
+        p.run_model()
+
+        for i in range(2):
+            assert_near_equal(p['result_T'][i], np.linalg.solve(p['lhs_TP'][i], p['rhs_T'][i]), 1e-10)
+            assert_near_equal(p['result_P'][i], np.linalg.solve(p['lhs_TP'][i], p['rhs_P'][i]), 1e-10)
+
+        partial_data = p.check_partials(out_stream=None, method='cs')
+        assert_check_partials(partial_data, atol=1e-8, rtol=1e-8)
+
+        # the stored factorization is used for both the forward and adjoint linear solves
+        for mode in ('fwd', 'rev'):
+            p.setup(check=False, mode=mode, force_alloc_complex=True)
+            p['lhs_TP'] = np.array([lhs_TP, lhs_TP + 0.01*np.triu(np.ones((3, 3)), 1)])
+            p.run_model()
+            totals = p.check_totals(of=['result_T', 'result_P'], wrt=['lhs_TP', 'rhs_T', 'rhs_P'],
+                                    method='cs', out_stream=None)
+            assert_check_totals(totals, atol=1e-8, rtol=1e-8)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -1,4 +1,5 @@
 import unittest
+import pickle
 
 import numpy as np
 
@@ -104,6 +105,28 @@ class SpeciesDataTestCase(unittest.TestCase):
         assert_near_equal(CpJ3, CpJ_expected3, tol)
         assert_near_equal(b03, b0_expected3, tol)
 
+    def test_evaluate_all(self):
+        thermo = species_data.Properties(thermo_data_module=species_data.janaf, init_elements=AIR_ELEMENTS)
+
+        # crosses the 1000 K breakpoint, so each node needs different coefficients
+        T = np.array([800., 1500., 800., 7000.])
+        H0, S0, Cp0, dH0_dT, dS0_dT, dCp0_dT = thermo.evaluate_all(T)
+
+        self.assertEqual(H0.shape, (4, thermo.num_prod))
+
+        tol = 1e-4
+        assert_near_equal(H0[0], np.array([1.56828125, -14.33638055, -55.73109232, 72.63079725, 16.05970705,
+                                           8.50490177, 15.48013356, 2.2620009, 39.06512544, 2.38109781]), tol)
+        assert_near_equal(Cp0[2], np.array([2.5, 3.83668584, 6.18585395, 2.5, 3.94173049, 6.06074564,
+                                            8.81078156, 3.78063693, 2.52375035, 4.05857378]), tol)
+
+        # derivatives should match a complex step of the values, in every temperature range
+        h = 1e-30
+        H0_cs, S0_cs, Cp0_cs, _, _, _ = thermo.evaluate_all(T + 1j*h)
+        assert_near_equal(dH0_dT, H0_cs.imag/h, 1e-10)
+        assert_near_equal(dS0_dT, S0_cs.imag/h, 1e-10)
+        assert_near_equal(dCp0_dT, Cp0_cs.imag/h, 1e-10)
+
     def test_element_filter(self):
 
         elements1_provided = {'C':1, 'O':1}
@@ -136,6 +159,27 @@ class SpeciesDataTestCase(unittest.TestCase):
         self.assertEqual(products3, products3_expected)
         self.assertEqual(set(elements3), elements3_expected)
 
+    def test_registry(self):
+        from pycycle.constants import CEA_AIR_COMPOSITION
+
+        thermo = species_data.get_properties(species_data.janaf, CEA_AIR_COMPOSITION)
+
+        # same data, in any order, gives back the same object
+        reordered = dict(reversed(list(CEA_AIR_COMPOSITION.items())))
+        self.assertIs(species_data.get_properties(species_data.janaf, reordered), thermo)
+        self.assertIsNot(species_data.get_properties(species_data.co2_co_o2, CO2_CO_O2_MIX), thermo)
+
+        # shared data can't be changed in place
+        with self.assertRaises(ValueError):
+            thermo.b0[0] = 1.
+
+        # pickles by name and comes back as the registered object
+        self.assertIs(pickle.loads(pickle.dumps(thermo)), thermo)
+
+        thermo2 = pickle.loads(pickle.dumps(species_data.Properties(species_data.janaf, init_elements=CEA_AIR_COMPOSITION)))
+        self.assertIsNot(thermo2, thermo)
+        assert_near_equal(thermo2.b0, thermo.b0, 1e-15)
+
 
 
 if __name__ == "__main__":
@@ -0,0 +1,153 @@
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from openmdao.utils.assert_utils import assert_near_equal
+
+from pycycle.thermo.cea import species_data, species_db
+from pycycle.constants import CEA_AIR_FUEL_COMPOSITION, CEA_WET_AIR_COMPOSITION
+
+
+# janaf Ar and CO2 written out in the NASA thermo.inp format, plus entries that should be skipped
+THERMO_INP = """\
+thermo
+    200.000  1000.000  6000.000 20000.000   9/09/04
+Ar                Ref-Elm. test
+ 3 g 3/98 AR  1.00                                 0   39.9480000          0.000
+    200.000   1000.0007 -2.0 -1.0  0.0  1.0  2.0  3.0  4.0  0.0            0.000
+ 0.000000000D+00 0.000000000D+00 2.500000000D+00 0.000000000D+00 0.000000000D+00
+ 0.000000000D+00 0.000000000D+00                -7.453750000D+02 4.379674910D+00
+   1000.000   6000.0007 -2.0 -1.0  0.0  1.0  2.0  3.0  4.0  0.0            0.000
+ 2.010538475D+01-5.992661070D-02 2.500069401D+00-3.992141160D-08 1.205272140D-11
+-1.819015576D-15 1.078576636D-19                -7.449939610D+02 4.379180110D+00
+   6000.000  20000.0007 -2.0 -1.0  0.0  1.0  2.0  3.0  4.0  0.0            0.000
+-9.951265080D+08 6.458887260D+05-1.675894697D+02 2.319933363D-02-1.721080911D-06
+ 6.531938460D-11-9.740147729D-16                -5.078300340D+06 1.465298484D+03
+CO2               Ref-Elm. test
+ 3 g 3/98 C   1.00O   2.00                         0   44.0095000          0.000
+    200.000   1000.0007 -2.0 -1.0  0.0  1.0  2.0  3.0  4.0  0.0            0.000
+ 4.943650540D+04-6.264116010D+02 5.301725240D+00 2.503813816D-03-2.127308728D-07
+-7.689988780D-10 2.849677801D-13                -4.528198460D+04-7.048279440D+00
+   1000.000   6000.0007 -2.0 -1.0  0.0  1.0  2.0  3.0  4.0  0.0            0.000
+ 1.176962419D+05-1.788791477D+03 8.291523190D+00-9.223156780D-05 4.863676880D-09
+-1.891053312D-12 6.330036590D-16                -3.908350590D+04-2.652669281D+01
+   6000.000  20000.0007 -2.0 -1.0  0.0  1.0  2.0  3.0  4.0  0.0            0.000
+-1.544423287D+09 1.016847056D+06-2.561405230D+02 3.369401080D-02-2.181184337D-06
+ 6.991420840D-11-8.842351500D-16                -8.043214510D+06 2.254177493D+03
+Ar+               Ion test
+ 1 g 3/98 AR  1.00E  -1.00                         0   39.9474514     182.000
+    298.150   1000.0007 -2.0 -1.0  0.0  1.0  2.0  3.0  4.0  0.0            0.000
+ 0.000000000D+00 0.000000000D+00 2.500000000D+00 0.000000000D+00 0.000000000D+00
+ 0.000000000D+00 0.000000000D+00                 1.828792830D+05 5.049900000D+00
+C(gr)             Condensed test
+ 1 g 3/98 C   1.00                                 1   12.0107000          0.000
+    200.000    600.0007 -2.0 -1.0  0.0  1.0  2.0  3.0  4.0  0.0            0.000
+ 1.132856760D+05-1.980421677D+03 1.365384188D+01-4.636096440D-02 1.021333011D-04
+-1.082893179D-07 4.472258860D-11                 8.943859760D+03-7.295824740D+01
+END PRODUCTS
+JP-10(L)          Reactant test
+ 0 g 6/01 C  10.00H  16.00                         1  136.2340400    -122800.400
+    298.150      0.0000 0.0  0.0  0.0  0.0  0.0  0.0  0.0  0.0            0.000
+END REACTANTS
+"""
+
+
+class SpeciesDBTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        species_db._DATABASES.clear()
+
+    def tearDown(self):
+        species_db._DATABASES.clear()
+        shutil.rmtree(self.tempdir)
+
+    def test_module_round_trip(self):
+
+        for module, composition in ((species_data.janaf, CEA_AIR_FUEL_COMPOSITION),
+                                    (species_data.wet_air, CEA_WET_AIR_COMPOSITION)):
+            filename = os.path.join(self.tempdir, 'spec.npz')
+            species_db.compile_species_db(module, filename)
+            db = species_db.load_species_db(filename)
+            species_db._DATABASES.clear()
+
+            expected = species_data.Properties(module, init_elements=composition)
+            thermo = species_data.Properties(db, init_elements=composition)
+
+            self.assertEqual(thermo.products, expected.products)
+            for name in ('b0', 'element_wt', 'aij', 'wt_mole', 'coeff_cube', 'temp_ranges', 'num_ranges'):
+                assert_near_equal(getattr(thermo, name), getattr(expected, name), 1e-15)
+
+            T = np.array([250., 1500., 8000.])
+            for value, expected_value in zip(thermo.evaluate_all(T), expected.evaluate_all(T)):
+                assert_near_equal(value, expected_value, 1e-15)
+
+            self.assertEqual(db.reactants['JP-7'], module.reactants['JP-7'])
+
+    def test_load_and_pickle(self):
+
+        filename = os.path.join(self.tempdir, 'janaf.npz')
+        species_db.compile_species_db(species_data.janaf, filename)
+
+        db = species_db.load_species_db(filename)
+        self.assertIs(species_db.load_species_db(filename), db)
+
+        thermo = species_data.get_properties(db, CEA_AIR_FUEL_COMPOSITION)
+        self.assertIs(pickle.loads(pickle.dumps(thermo)), thermo)
+
+        # a file written again is read again
+        species_db.compile_species_db(species_data.co2_co_o2, filename)
+        stat = os.stat(filename)
+        os.utime(filename, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        changed = species_db.load_species_db(filename)
+        self.assertIsNot(changed, db)
+        self.assertEqual(set(changed.products), set(species_data.co2_co_o2.products))
+        self.assertIs(species_db.load_species_db(filename), changed)
+
+        with self.assertRaises(ValueError) as cm:
+            species_data.Properties(db, init_elements={'CO2': 1})
+        self.assertEqual(str(cm.exception), "The provided element `CO2` is a product in your provided thermo data, but is not an element.")
+
+    def test_validation(self):
+
+        filename = os.path.join(self.tempdir, 'bad.npz')
+        species_db.compile_species_db(species_data.co2_co_o2, filename)
+
+        with np.load(filename) as data:
+            arrays = {name: data[name] for name in data.files}
+        arrays['ranges'] = arrays['ranges'][:, ::-1]
+        np.savez(filename, **arrays)
+
+        with self.assertRaises(ValueError) as cm:
+            species_db.load_species_db(filename)
+        self.assertIn('Invalid species database', str(cm.exception))
+
+    def test_thermo_inp(self):
+
+        inp_file = os.path.join(self.tempdir, 'thermo.inp')
+        with open(inp_file, 'w') as f:
+            f.write(THERMO_INP)
+
+        products, element_wts = species_db.read_thermo_inp(inp_file)
+
+        # the ion, the condensed species and the reactant are skipped
+        self.assertEqual(list(products), ['Ar', 'CO2'])
+        self.assertEqual(element_wts, {e: species_data.janaf.element_wts[e] for e in ('Ar', 'C', 'O')})
+        for name in products:
+            assert_near_equal(np.array(products[name]['coeffs']), np.array(species_data.janaf.products[name]['coeffs']), 1e-15)
+            assert_near_equal(products[name]['ranges'], species_data.janaf.products[name]['ranges'], 1e-15)
+        self.assertEqual(dict(products['CO2']['elements']), {'C': 1., 'O': 2.})
+
+        filename = os.path.join(self.tempdir, 'inp.npz')
+        species_db.compile_species_db(inp_file, filename)
+        thermo = species_data.Properties(species_db.load_species_db(filename), init_elements={'Ar': 1., 'C': 1., 'O': 2.})
+
+        self.assertEqual(thermo.products, ['Ar', 'CO2'])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -181,6 +181,37 @@ class ThermoAddTestCase(unittest.TestCase):
         assert_near_equal(prob['composition_out'][3], 5.39103820e-02, tol)
         assert_near_equal(prob['composition_out'][4], 1.44901169e-02, tol)
 
+    def test_partials_multi_stream(self):
+
+        thermo_spec = species_data.janaf
+
+        air_thermo = species_data.Properties(thermo_spec, init_elements=CEA_AIR_COMPOSITION)
+
+        for mix_mode, mix_composition in (('reactant', ['JP-7', 'JP-7', 'JP-7']),
+                                          ('flow', [CEA_AIR_COMPOSITION, CEA_AIR_FUEL_COMPOSITION, CEA_AIR_COMPOSITION])):
+            prob = om.Problem()
+            prob.model.add_subsystem('add', ThermoAdd(spec=thermo_spec, inflow_composition=CEA_AIR_COMPOSITION,
+                                                      mix_mode=mix_mode, mix_composition=mix_composition,
+                                                      mix_names=['mix1', 'mix2', 'mix3']),
+                                     promotes=['*'])
+
+            prob.setup(force_alloc_complex=True)
+
+            prob['Fl_I:stat:W'] = 38.8
+            prob['Fl_I:tot:h'] = 181.381769
+            prob['Fl_I:tot:composition'] = air_thermo.b0
+            for i, name in enumerate(['mix1', 'mix2', 'mix3']):
+                prob[f'{name}:h'] = 5. + i
+                if mix_mode == 'reactant':
+                    prob[f'{name}:ratio'] = 0.01*(i+1)
+                else:
+                    prob[f'{name}:W'] = 1. + i
+
+            prob.run_model()
+
+            data = prob.check_partials(out_stream=None, method='cs')
+            assert_check_partials(data, atol=1e-8, rtol=1e-8)
+
 
 
 
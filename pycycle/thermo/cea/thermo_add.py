@@ -3,7 +3,7 @@ import numpy as np
 import openmdao.api as om
 
 from pycycle.constants import CEA_AIR_COMPOSITION
-from pycycle.thermo.cea.species_data import Properties, janaf
+from pycycle.thermo.cea.species_data import get_properties, janaf
 
 
 class ThermoAdd(om.ExplicitComponent):
@@ -69,43 +69,65 @@ class ThermoAdd(om.ExplicitComponent):
 
         self.output_port_data()
 
-        inflow_thermo = Properties(spec, init_elements=inflow_composition)
+        inflow_thermo = get_properties(spec, inflow_composition)
         self.inflow_composition = inflow_thermo.elements
         self.inflow_wt_mole = inflow_thermo.element_wt
         self.num_inflow_composition = len(self.inflow_composition)
 
-        mixed_thermo = Properties(spec, init_elements=self.mixed_elements)
+        mixed_thermo = get_properties(spec, self.mixed_elements)
         self.mixed_elements = mixed_thermo.elements
         self.mixed_wt_mole = mixed_thermo.element_wt
         self.num_mixed_elements = len(self.mixed_elements)
 
 
-        self.init_fuel_amounts_1kg = {}
+        num_mix = len(mix_names)
+        ne_out = mixed_thermo.num_element
 
+        # create a mapping between the composition indices of the inflow and outflow arrays
+        # which is basically a permutation matrix of ones resize the input to the output
+        self.in_out_flow_idx_map = np.zeros((ne_out, inflow_thermo.num_element))
+        for i,e in enumerate(self.inflow_composition): 
+            j = self.mixed_elements.index(e)
+            self.in_out_flow_idx_map[j,i] = 1.
+
+        # all of the mix streams are stacked so they can be mixed in one vectorized pass
         if mix_mode == 'reactant': 
-            for reactant in self.mix_composition: 
-                self.init_fuel_amounts_1kg[reactant] = np.zeros(mixed_thermo.num_element)
-                ifa_1kg = self.init_fuel_amounts_1kg[reactant]
+            # mass fractions of each element in 1 kg of each reactant, one row per reactant
+            self.init_fuel_amounts_1kg = np.zeros((num_mix, ne_out))
+            for k, reactant in enumerate(self.mix_composition): 
+                ifa_1kg = self.init_fuel_amounts_1kg[k]
                 for i, e in enumerate(self.mixed_elements): 
                     ifa_1kg[i] = spec.reactants[reactant].get(e, 0) * spec.element_wts[e]
 
                 ifa_1kg[:] = ifa_1kg/sum(ifa_1kg) # make it 1 kg of fuel
 
         else: # flow 
+            # the mix compositions are concatenated into one vector, with
+            # mix_slices giving each stream's segment of it
             mix_b0 = {}
-            self.mix_wt_mole = {}
-            self.mix_out_flow_idx_maps = {}
+            # (seeded with empty arrays, since a turbine may have no bleeds at all)
+            mix_wt_mole = [np.zeros(0)]
+            mix_maps = [np.zeros((ne_out, 0))]
+            self.mix_slices = {}
+            offset = 0
             for name, elements in zip(mix_names, self.mix_composition): 
-                thermo = Properties(spec, init_elements=elements)
+                thermo = get_properties(spec, elements)
                 mix_b0[name] = thermo.b0
-                self.mix_wt_mole[name] = thermo.element_wt
+                mix_wt_mole.append(thermo.element_wt)
+                self.mix_slices[name] = slice(offset, offset + thermo.num_element)
+                offset += thermo.num_element
 
                 # mapping matrix to convert mix to outflow
-                self.mix_out_flow_idx_maps[name] = mix_map = np.zeros((mixed_thermo.num_element, thermo.num_element))
+                mix_map = np.zeros((ne_out, thermo.num_element))
                 for i,e in enumerate(thermo.elements): 
                     j = self.mixed_elements.index(e)
                     mix_map[j,i] = 1.
+                mix_maps.append(mix_map)
 
+            self.mix_wt_mole = np.concatenate(mix_wt_mole)
+            self.mix_out_flow_idx_map = np.hstack(mix_maps)
+            self.mix_starts = np.array([self.mix_slices[name].start for name in mix_names])
+            self.mix_seg = np.repeat(np.arange(num_mix), [wt.size for wt in mix_wt_mole[1:]])
 
         # inputs
         self.add_input('Fl_I:stat:W', val=0.0, desc='weight flow', units='lbm/s')
@@ -130,63 +152,121 @@ class ThermoAdd(om.ExplicitComponent):
         self.add_output('Wout', shape=1, units="lbm/s", desc="total massflow out")
         self.add_output('composition_out', val=mixed_thermo.b0)
 
-       
-        # create a mapping between the composition indices of the inflow and outflow arrays
-        # which is basically a permutation matrix of ones resize the input to the output
-
-        self.in_out_flow_idx_map = np.zeros((mixed_thermo.num_element, inflow_thermo.num_element))
-        for i,e in enumerate(self.inflow_composition): 
-            j = self.mixed_elements.index(e)
-            self.in_out_flow_idx_map[j,i] = 1.
+        # enthalpies never affect the composition, and compositions never affect the flow rates
+        self.declare_partials('mass_avg_h', ['Fl_I:stat:W', 'Fl_I:tot:h'])
+        self.declare_partials('Wout', 'Fl_I:stat:W')
+        self.declare_partials('composition_out', ['Fl_I:stat:W', 'Fl_I:tot:composition'])
+        for name in mix_names: 
+            self.declare_partials('mass_avg_h', f'{name}:h')
+            if mix_mode == 'reactant': 
+                self.declare_partials(f'{name}:W', ['Fl_I:stat:W', f'{name}:ratio'])
+                self.declare_partials(['mass_avg_h', 'Wout', 'composition_out'], f'{name}:ratio')
+            else: 
+                self.declare_partials(['mass_avg_h', 'Wout', 'composition_out'], f'{name}:W')
+                self.declare_partials('composition_out', f'{name}:composition')
 
-        self.declare_partials('*', '*', method='cs')
-        # NOTE: Due to some complexity from python vectorization, 
-        # computing partials manually is tricky and will not be much faster than pure CS
+    def _h_mix(self, inputs): 
+        return np.array([inputs[f'{name}:h'][0] for name in self.mix_names])
 
-    def compute(self, inputs, outputs):
+    def _mix(self, inputs):
+        """
+        mass flow of each element in the outflow, plus the pieces needed for the partials
+        """
         W = inputs['Fl_I:stat:W']
-        Fl_I_tot_b0 = inputs['Fl_I:tot:composition']
 
         # copy the incoming flow into a correctly sized array for the outflow composition
-        b0_out = self.in_out_flow_idx_map.dot(Fl_I_tot_b0)
+        # in mass units, scaled to the full mass flow
+        y_in = self.in_out_flow_idx_map.dot(inputs['Fl_I:tot:composition'])*self.mixed_wt_mole
+        S_in = np.sum(y_in)
+        b0_out = y_in*(W/S_in)
+
+        if self.options['mix_mode'] == 'reactant': 
+            ratio = np.array([inputs[f'{name}:ratio'][0] for name in self.mix_names])
+            # compute the amount of fuel-flow rate in terms of the incoming mass-flow rate
+            W_mix = W*ratio
+            b0_out = b0_out + W_mix.dot(self.init_fuel_amounts_1kg)
+            y_mix = S_mix = None
 
+        else: # inflow mixing
+            W_mix = np.array([inputs[f'{name}:W'][0] for name in self.mix_names])
+            b_mix = np.concatenate([np.zeros(0)] + [inputs[f'{name}:composition'] for name in self.mix_names])
+            y_mix = b_mix*self.mix_wt_mole
+            S_mix = np.zeros(0)
+            if self.mix_names: 
+                # normalize each stream to 1 kg, then scale to its actual mass flow
+                S_mix = np.add.reduceat(y_mix, self.mix_starts)
+                b0_out = b0_out + self.mix_out_flow_idx_map.dot(y_mix*(W_mix/S_mix)[self.mix_seg])
 
-        b0_out *= self.mixed_wt_mole # convert to mass units
-        sum_b0_out = np.sum(b0_out)
-        b0_out /= sum_b0_out # scale to 1 kg
-        b0_out *= W  # scale to full mass flow
+        # every stream was scaled to its own mass flow, so the total is the sum of the flows
+        W_out = W + np.sum(W_mix)
+        H = inputs['Fl_I:tot:h']*W + self._h_mix(inputs).dot(W_mix)
 
-        
-        mass_avg_h = inputs['Fl_I:tot:h'] * W
-        W_out = W.copy()
+        return b0_out, W_out, H, W_mix, y_in, S_in, y_mix, S_mix
+
+    def compute(self, inputs, outputs):
+        b0_out, W_out, H, W_mix, _, _, _, _ = self._mix(inputs)
 
         if self.options['mix_mode'] == 'reactant': 
-            for name, reactant in zip(self.mix_names, self.mix_composition): 
-                ratio = inputs[f'{name}:ratio']
-                # compute the amount of fuel-flow rate in terms of the incoming mass-flow rate
-                outputs[f'{name}:W'] = W_mix = W*ratio
-                b0_out += self.init_fuel_amounts_1kg[reactant]*W_mix
+            for k, name in enumerate(self.mix_names): 
+                outputs[f'{name}:W'] = W_mix[k]
 
-                mass_avg_h += inputs[f'{name}:h'] * W_mix
-                W_out += W_mix
+        # scale back to 1 kg
+        outputs['composition_out'] = b0_out/np.sum(b0_out)/self.mixed_wt_mole
 
-        else: # inflow mixing
-            for name in self.mix_names: 
-                W_mix = inputs[f'{name}:W']
-                mix_stuff = inputs[f'{name}:composition'].copy()
-                mix_stuff *= self.mix_wt_mole[name]
-                mix_stuff /= np.sum(mix_stuff) # normalize to 1kg 
-                mix_stuff *= W_mix# scale to actual mass flow of that mix stream
-                
-                b0_out += self.mix_out_flow_idx_maps[name].dot(mix_stuff)
-                W_out += W_mix
-
-                mass_avg_h += inputs[f'{name}:h'] * W_mix
-
-        b0_out /= np.sum(b0_out) # scale back to 1 kg
-        outputs['composition_out'] = b0_out/self.mixed_wt_mole
-
-        mass_avg_h /= W_out
-        outputs['mass_avg_h'] = mass_avg_h
+        outputs['mass_avg_h'] = H/W_out
         outputs['Wout'] = W_out
 
+    def compute_partials(self, inputs, J):
+        W = inputs['Fl_I:stat:W']
+        h_in = inputs['Fl_I:tot:h']
+
+        b0_out, W_out, H, W_mix, y_in, S_in, y_mix, S_mix = self._mix(inputs)
+
+        # composition_out = b0_out/(sum(b0_out)*wt)
+        S_out = np.sum(b0_out)
+        dcomp_db0 = (np.eye(len(b0_out)) - (b0_out/S_out)[:, np.newaxis])/(S_out*self.mixed_wt_mole[:, np.newaxis])
+
+        # each stream enters as W*y/sum(y), with y the composition in mass units
+        in_map = self.in_out_flow_idx_map
+        dfrac_in = (np.eye(len(y_in)) - (y_in/S_in)[:, np.newaxis])/S_in
+        J['composition_out', 'Fl_I:tot:composition'] = dcomp_db0.dot(W*dfrac_in.dot(in_map*self.mixed_wt_mole[:, np.newaxis]))
+
+        dmah_dWout = -H/W_out**2
+        J['mass_avg_h', 'Fl_I:tot:h'] = W/W_out
+
+        if self.options['mix_mode'] == 'reactant': 
+            ratio = W_mix/W
+            fuel = self.init_fuel_amounts_1kg
+
+            J['composition_out', 'Fl_I:stat:W'] = dcomp_db0.dot(y_in/S_in + ratio.dot(fuel))
+            J['Wout', 'Fl_I:stat:W'] = 1. + np.sum(ratio)
+            J['mass_avg_h', 'Fl_I:stat:W'] = (h_in + np.sum(ratio*self._h_mix(inputs)))/W_out + dmah_dWout*(1. + np.sum(ratio))
+
+            for k, name in enumerate(self.mix_names): 
+                h_k = inputs[f'{name}:h']
+                J[f'{name}:W', 'Fl_I:stat:W'] = ratio[k]
+                J[f'{name}:W', f'{name}:ratio'] = W
+                J['composition_out', f'{name}:ratio'] = dcomp_db0.dot(fuel[k])*W
+                J['Wout', f'{name}:ratio'] = W
+                J['mass_avg_h', f'{name}:ratio'] = (h_k/W_out + dmah_dWout)*W
+                J['mass_avg_h', f'{name}:h'] = W_mix[k]/W_out
+
+        else: 
+            mix_map = self.mix_out_flow_idx_map
+
+            J['composition_out', 'Fl_I:stat:W'] = dcomp_db0.dot(y_in/S_in)
+            J['Wout', 'Fl_I:stat:W'] = 1.
+            J['mass_avg_h', 'Fl_I:stat:W'] = h_in/W_out + dmah_dWout
+
+            for k, name in enumerate(self.mix_names): 
+                sl = self.mix_slices[name]
+                y_k = y_mix[sl]
+                S_k = S_mix[k]
+                dfrac_k = (np.eye(len(y_k)) - (y_k/S_k)[:, np.newaxis])/S_k
+                dcomp_k = dcomp_db0.dot(mix_map[:, sl])
+
+                J['composition_out', f'{name}:W'] = dcomp_k.dot(y_k/S_k)
+                J['composition_out', f'{name}:composition'] = dcomp_k.dot(W_mix[k]*dfrac_k*self.mix_wt_mole[sl])
+                J['Wout', f'{name}:W'] = 1.
+                J['mass_avg_h', f'{name}:W'] = inputs[f'{name}:h']/W_out + dmah_dWout
+                J['mass_avg_h', f'{name}:h'] = W_mix[k]/W_out
@@ -0,0 +1,32 @@
+import numpy as np
+
+
+def node_shape(num_nodes, size):
+    """
+    Shape of a per-node variable. A single node keeps the original un-vectorized
+    shape so existing connections (e.g. flow station compositions) are unchanged.
+    """
+    if num_nodes == 1:
+        return (size,)
+    return (num_nodes, size)
+
+
+def block_rows_cols(num_nodes, num_rows, num_cols):
+    """
+    rows/cols for a block-diagonal partial with one dense (num_rows x num_cols)
+    block per node. Values should be given as a flattened (num_nodes, num_rows, num_cols) array.
+    """
+    r, c = np.divmod(np.arange(num_rows*num_cols), num_cols)
+    offsets = np.arange(num_nodes)[:, np.newaxis]
+    rows = (offsets*num_rows + r).ravel()
+    cols = (offsets*num_cols + c).ravel()
+    return rows, cols
+
+
+def tile_pattern(num_nodes, num_rows, num_cols, rows, cols):
+    """
+    rows/cols for a block-diagonal partial where every node's (num_rows x num_cols) block
+    has the same sparsity pattern, given by the single block rows/cols.
+    """
+    offsets = np.arange(num_nodes)[:, np.newaxis]
+    return (offsets*num_rows + rows).ravel(), (offsets*num_cols + cols).ravel()
@@ -0,0 +1,268 @@
+"""
+Microbenchmarks of the thermodynamic kernels.
+
+Each CEA dataset (janaf, wet_air and co2_co_o2) is timed over a grid of T, P and composition
+states. The kernels are:
+
+    H0/S0/Cp0 (evaluate_all)    the species property polynomials, Properties.evaluate_all
+    ChemEq.*                    Gibbs minimization: the full solve (run_model of a SetTotalTP from a
+                                cold start), with its Newton iterations, and the component methods
+    PropsRHS.*, PropsSolve.*,   the derivative systems and mixture properties of the converged states
+    PropsCalcs.*
+    tabular SetTotalTP.*        interpolation in the air/Jet-A table over the same T, P grid and a
+                                range of FAR
+
+For every kernel the time per call and the throughput (states per second) are reported. By default
+all states are evaluated by one vectorized (num_nodes) component; with `vectorize=False` each state
+is solved on its own, which is how a cycle uses the thermo.
+
+    python -m pycycle.thermo.microbench
+    python -m pycycle.thermo.microbench --datasets janaf --no-vectorize --json thermo_bench.json
+"""
+import argparse
+import json
+import sys
+import time
+import warnings
+
+import numpy as np
+
+import openmdao.api as om
+from openmdao.utils.om_warnings import SolverWarning
+
+from pycycle.constants import CEA_AIR_COMPOSITION, CEA_AIR_FUEL_COMPOSITION, CEA_WET_AIR_COMPOSITION, \
+    CEA_CO2_CO_O2_COMPOSITION, TAB_AIR_FUEL_COMPOSITION
+from pycycle.profiling import RunProfiler
+from pycycle.thermo.cea import species_data
+from pycycle.thermo.cea.chem_eq import SetTotalTP
+from pycycle.thermo.tabular.tabular_thermo import SetTotalTP as TabSetTotalTP
+
+
+# (thermo data, element set, base mixture, what is mixed into it (mol of each element per gram),
+#  name and default values of the mass ratio of that addition to the base mixture)
+DATASETS = {
+    'janaf': (species_data.janaf, CEA_AIR_FUEL_COMPOSITION, CEA_AIR_FUEL_COMPOSITION,
+              {'C': 12/167.31, 'H': 23/167.31}, 'FAR', (0., 0.015, 0.03)),  # Jet-A, C12H23
+    'wet_air': (species_data.wet_air, CEA_WET_AIR_COMPOSITION, CEA_AIR_COMPOSITION,
+                {'H': 2/18.015, 'O': 1/18.015}, 'WAR', (0.001, 0.01, 0.03)),
+    'co2_co_o2': (species_data.co2_co_o2, CEA_CO2_CO_O2_COMPOSITION, CEA_CO2_CO_O2_COMPOSITION,
+                  {'O': 2/31.998}, 'O2 ratio', (0.01, 0.1, 0.3)),
+}
+
+DEFAULT_T = np.linspace(300., 2500., 12)  # degK
+DEFAULT_P = np.geomspace(0.1, 40., 6)  # bar
+
+
+def composition_vectors(thermo, base, addition, ratios):
+    """
+    Element compositions (mol/g, in the element order of `thermo`) of `base` mixed with each mass
+    ratio of `addition`.
+    """
+    compositions = []
+    for ratio in ratios:
+        b = np.array([(base.get(e, 0.) + ratio*addition.get(e, 0.))/(1 + ratio) for e in thermo.elements])
+        # same normalization as Properties.b0
+        b = b*thermo.element_wt
+        compositions.append(b/np.sum(b)/thermo.element_wt)
+    return np.array(compositions)
+
+
+def state_grid(T, P, compositions):
+    """
+    Every (T, P, composition) combination, as flat arrays.
+    """
+    T, P, idx = (a.ravel() for a in np.meshgrid(T, P, np.arange(len(compositions)), indexing='ij'))
+    return T, P, compositions[idx]
+
+
+def _result(kernel, dataset, num_states, calls, t, **extra):
+    return {'kernel': kernel, 'dataset': dataset, 'num_states': num_states, 'calls': calls, 'time': t,
+            'per_call': t/calls if calls else None, 'states_per_sec': num_states*calls/t if t else None,
+            **extra}
+
+
+def _profiled_results(prof, dataset, states_per_call, classes):
+    results = []
+    for (class_name, method), total in prof.by_class().items():
+        if class_name in classes:
+            results.append(_result(f'{class_name}.{method}', dataset, states_per_call, total['calls'],
+                                   total['time']))
+    return results
+
+
+def time_properties(dataset, T, repeat=10):
+    """
+    Times Properties.evaluate_all and H0/S0/Cp0 over the temperatures T.
+    """
+    thermo_data, elements = DATASETS[dataset][:2]
+    thermo = species_data.get_properties(thermo_data, elements)
+
+    results = []
+    for name, func in (('H0/S0/Cp0 (evaluate_all)', thermo.evaluate_all), ('H0', thermo.H0),
+                       ('S0', thermo.S0), ('Cp0', thermo.Cp0)):
+        func(T)
+        t0 = time.perf_counter()
+        for i in range(repeat):
+            func(T)
+        results.append(_result(name, dataset, len(T), repeat, time.perf_counter() - t0,
+                               num_elements=thermo.num_element, num_prod=thermo.num_prod))
+    return results
+
+
+def time_chem_eq(dataset, T=DEFAULT_T, P=DEFAULT_P, ratios=None, vectorize=True, repeat=3, chem_eq_options={}):
+    """
+    Times the equilibrium solve and the property calculations of the CEA thermo over the state grid.
+    """
+    thermo_data, elements, base, addition, ratio_name, default_ratios = DATASETS[dataset]
+    thermo = species_data.get_properties(thermo_data, elements)
+    compositions = composition_vectors(thermo, base, addition, default_ratios if ratios is None else ratios)
+    T_states, P_states, b_states = state_grid(T, P, compositions)
+    num_states = len(T_states)
+
+    num_nodes = num_states if vectorize else 1
+    prob = om.Problem()
+    prob.model.add_subsystem('thermo', SetTotalTP(spec=thermo_data, composition=elements, num_nodes=num_nodes,
+                                                  chem_eq_options=chem_eq_options), promotes=['*'])
+    prob.model.set_input_defaults('T', T_states[:num_nodes], units='degK')
+    prob.model.set_input_defaults('P', P_states[:num_nodes], units='bar')
+    prob.setup(check=False)
+    prob.set_solver_print(level=-1)
+    prob.final_setup()
+
+    chem_eq = prob.model.thermo.chem_eq
+    n_init = prob.get_val('n').copy()
+
+    if vectorize:
+        batches = [(T_states, P_states, b_states)]
+    else:
+        batches = [(T_states[i:i+1], P_states[i:i+1], b_states[i]) for i in range(num_states)]
+
+    iterations = []
+    solve_time = 0.
+    with RunProfiler(prob) as prof:
+        for r in range(repeat):
+            for T_b, P_b, b_b in batches:
+                prob.set_val('T', T_b, units='degK')
+                prob.set_val('P', P_b, units='bar')
+                prob.set_val('composition', b_b)
+                # cold start, so every repeat does the same work
+                prob.set_val('n', n_init)
+
+                t0 = time.perf_counter()
+                prob.run_model()
+                solve_time += time.perf_counter() - t0
+                prob.model.run_linearize()
+
+                solver = chem_eq.nonlinear_solver
+                iterations.append(chem_eq.newton_iters if solver is None or isinstance(solver, om.NonlinearRunOnce)
+                                  else solver._iter_count)
+
+    extra = {'num_elements': thermo.num_element, 'num_prod': thermo.num_prod, 'vectorized': vectorize}
+    results = [_result('ChemEq (solve)', dataset, num_states, repeat, solve_time,
+                       newton_iters=float(np.mean(iterations)), max_newton_iters=int(np.max(iterations)), **extra)]
+    for r in _profiled_results(prof, dataset, num_nodes, ('ChemEq', 'PropsRHS', 'PropsSolve', 'PropsCalcs')):
+        results.append({**r, **extra})
+    return results
+
+
+def time_tabular(T=DEFAULT_T, P=DEFAULT_P, FAR=(0., 0.015, 0.03), repeat=3, spec=None):
+    """
+    Times the tabular SetTotalTP (one state per call) over the state grid.
+    """
+    prob = om.Problem()
+    prob.model.add_subsystem('thermo', TabSetTotalTP(spec=spec, composition=TAB_AIR_FUEL_COMPOSITION),
+                             promotes=['*'])
+    prob.setup(check=False)
+    prob.final_setup()
+
+    T_states, P_states, FAR_states = (a.ravel() for a in np.meshgrid(T, P, FAR, indexing='ij'))
+
+    total = 0.
+    with RunProfiler(prob) as prof:
+        for r in range(repeat):
+            for state in zip(T_states, P_states, FAR_states):
+                prob.set_val('T', state[0], units='degK')
+                prob.set_val('P', state[1], units='bar')
+                prob.set_val('composition', state[2])
+
+                t0 = time.perf_counter()
+                prob.run_model()
+                prob.model.run_linearize()
+                total += time.perf_counter() - t0
+
+    num_states = len(T_states)
+    results = [_result('tabular SetTotalTP (run + linearize)', 'air_jetA', num_states, repeat, total)]
+    for (class_name, method), t in prof.by_class().items():
+        results.append(_result(f'tabular {class_name}.{method}', 'air_jetA', 1, t['calls'], t['time']))
+    return results
+
+
+def run_all(datasets=tuple(DATASETS), T=DEFAULT_T, P=DEFAULT_P, vectorize=True, repeat=3, tabular=True,
+            chem_eq_options={}):
+    """
+    Runs every benchmark and returns the list of results.
+    """
+    results = []
+    with warnings.catch_warnings():
+        # bounds enforcement during the cold starts is expected
+        warnings.simplefilter('ignore', SolverWarning)
+        results.extend(_run_all(datasets, T, P, vectorize, repeat, tabular, chem_eq_options))
+    return results
+
+
+def _run_all(datasets, T, P, vectorize, repeat, tabular, chem_eq_options):
+    results = []
+    for dataset in datasets:
+        # the same temperatures as the equilibrium state grid
+        results.extend(time_properties(dataset, np.repeat(T, len(P)*len(DATASETS[dataset][5])), repeat=10*repeat))
+        results.extend(time_chem_eq(dataset, T, P, vectorize=vectorize, repeat=repeat,
+                                    chem_eq_options=chem_eq_options))
+    if tabular:
+        results.extend(time_tabular(T, P, repeat=repeat))
+    return results
+
+
+def report(results, out_stream=sys.stdout):
+    """
+    Prints the results as a table.
+    """
+    print(f"{'dataset':<12}{'kernel':<48}{'states/call':>12}{'calls':>8}{'per call (s)':>14}{'states/s':>12}"
+          f"{'newton':>8}", file=out_stream)
+    for r in results:
+        newton = f"{r['newton_iters']:8.1f}" if 'newton_iters' in r else ''
+        per_call = f"{r['per_call']:14.3e}" if r['per_call'] is not None else f"{'-':>14}"
+        rate = f"{r['states_per_sec']:12.4g}" if r['states_per_sec'] is not None else f"{'-':>12}"
+        print(f"{r['dataset']:<12}{r['kernel'][:47]:<48}{r['num_states']:>12}{r['calls']:>8}{per_call}{rate}{newton}",
+              file=out_stream)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Microbenchmarks of the pyCycle thermo kernels.')
+    parser.add_argument('--datasets', nargs='+', default=list(DATASETS), choices=list(DATASETS))
+    parser.add_argument('--T', nargs=3, type=float, metavar=('MIN', 'MAX', 'NUM'),
+                        help='temperature grid in degK (default: 300 2500 12)')
+    parser.add_argument('--P', nargs=3, type=float, metavar=('MIN', 'MAX', 'NUM'),
+                        help='pressure grid in bar, log spaced (default: 0.1 40 6)')
+    parser.add_argument('--no-vectorize', action='store_true', help='solve one state per call')
+    parser.add_argument('--no-tabular', action='store_true', help='skip the tabular thermo')
+    parser.add_argument('--fused-newton', action='store_true', help='use the fused newton in ChemEq')
+    parser.add_argument('--formulation', default='full', choices=('full', 'reduced'), help='ChemEq formulation')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args(argv)
+
+    T = DEFAULT_T if args.T is None else np.linspace(args.T[0], args.T[1], int(args.T[2]))
+    P = DEFAULT_P if args.P is None else np.geomspace(args.P[0], args.P[1], int(args.P[2]))
+
+    results = run_all(args.datasets, T, P, vectorize=not args.no_vectorize, repeat=args.repeat,
+                      tabular=not args.no_tabular,
+                      chem_eq_options={'fused_newton': args.fused_newton, 'formulation': args.formulation})
+    report(results)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -99,7 +99,9 @@ class PsResid(om.ImplicitComponent):
             ps_guess, M_guess = fsolve(equations, (ps_guess, M_guess))
 
             # print('foobar', self.pathname, np.abs(ps_guess - self._ps_guess_cache), inputs['W'], inputs['area'], inputs['Ts'])
-            if np.abs(ps_guess - self._ps_guess_cache) > 1e-10:
+            # a previous solve that ended at the lower bound found no solution (e.g. above the choked flow),
+            # starting from there would lead to the supersonic one
+            if np.abs(ps_guess - self._ps_guess_cache) > 1e-10 or outputs['Ps'] <= 1e-4:
                 outputs['Ps'] = ps_guess
                 self._ps_guess_cache = ps_guess
 
@@ -0,0 +1,565 @@
+"""
+Generation of tabular thermo data from the CEA equilibrium thermo.
+
+A table holds the properties (h, S, gamma, Cp, Cv, rho and R, in SI units) of a base flow
+(air by default) mixed with a reactant (a fuel) over a grid of mass ratio, pressure and
+temperature, in the format read by the tabular thermo:
+
+    spec = generate_table(T=np.linspace(150, 2500, 50), P=np.logspace(0, 7, 60),
+                          FAR=np.linspace(0., 0.05, 15), fuel='Jet-A(g)', num_procs=8,
+                          checkpoint='air_jetA_checkpoint')
+    save_table(spec, 'air_jetA.pkl')
+
+More reactants add more composition axes, each the mass of the reactant per mass of base flow
+(like the composition variables of the tabular thermo). Larger tables are better saved as a
+directory of npy arrays, which the tabular thermo memory maps instead of reading:
+
+    spec = generate_table(FAR=np.linspace(0., 0.05, 15), mixes={'WAR': ('Water', np.linspace(0., 0.03, 4))})
+    save_table(spec, 'air_jetA_wet')
+
+Each job solves one ratio and a chunk of the pressures: all pressures are solved at once by a
+vectorized equilibrium solve, stepping up in temperature with every step starting from the
+converged state of the previous one. Jobs are run in worker processes and, with a checkpoint
+directory, every finished job is saved so an interrupted generation picks up where it stopped.
+
+refine_table instead starts from coarse axes and adds breakpoints where interpolating the table
+misses the CEA properties by more than a tolerance, giving a smaller table for a given accuracy
+and a map of the remaining interpolation error:
+
+    spec, errors = refine_table(T=[150., 1300., 2500.], P=[1., 1e6], FAR=[0., 0.05], tol=1e-3)
+
+    python -m pycycle.thermo.tabular.generate air_jetA.pkl --fuel Jet-A(g) --num-procs 8
+    python -m pycycle.thermo.tabular.generate air_jetA.pkl --T 150 2500 3 --P 1 1e6 2 --FAR 0 0.05 2 --tol 1e-3
+    python -m pycycle.thermo.tabular.generate air_jetA_wet --mix WAR Water 0 0.03 4
+"""
+import argparse
+import importlib
+import itertools
+import multiprocessing
+import os
+import pickle
+import sys
+import time
+import warnings
+
+import numpy as np
+
+import openmdao.api as om
+from openmdao.components.interp_util.interp import InterpND
+
+from pycycle.constants import CEA_AIR_COMPOSITION, TabSpec, load_tab_spec
+from pycycle.thermo.cea import species_data
+from pycycle.thermo.cea.chem_eq import SetTotalTP
+
+
+# property name, units
+PROPERTIES = (('h', 'J/kg'), ('S', 'J/kg/degK'), ('gamma', None), ('Cp', 'J/kg/degK'),
+              ('Cv', 'J/kg/degK'), ('rho', 'kg/m**3'), ('R', 'J/kg/degK'))
+
+DEFAULT_T = np.linspace(100., 3500., 100)  # degK
+DEFAULT_P = np.logspace(0., 7., 110)  # Pa
+DEFAULT_FAR = np.linspace(0., 0.05, 20)
+
+
+def mixture_elements(thermo_data, base, fuel, ratio):
+    """
+    Element amounts (mol/g) of 1 g of `base` mixed with `ratio` g of `fuel` (a reactant of
+    `thermo_data`, or a dict of mol per mol of fuel). Elements that are not present are left out,
+    so the equilibrium of the pure base flow is solved without the fuel species.
+
+    Several reactants are mixed in with sequences of fuels and of their ratios.
+    """
+    if isinstance(fuel, (str, dict)):
+        fuel, ratio = (fuel, ), (ratio, )
+    total = 1. + sum(ratio)
+
+    elements = {e: b/total for e, b in base.items()}
+    for reactant, r in zip(fuel, ratio):
+        if isinstance(reactant, str):
+            reactant = thermo_data.reactants[reactant]
+        reactant_wt = sum(n*thermo_data.element_wts[e] for e, n in reactant.items())
+        if r > 0:
+            for e, n in reactant.items():
+                elements[e] = elements.get(e, 0.) + r*n/reactant_wt/total
+    return elements
+
+
+# equilibrium problems of this process, by element set
+_problems = {}
+
+
+def _problem(thermo_data, elements, num_nodes):
+    key = (thermo_data.__name__, tuple(sorted(elements)), num_nodes)
+    if key not in _problems:
+        prob = om.Problem(reports=False)
+        # the per-node equilibrium iteration, converged tighter than the cycle default so the trace
+        # species (and with them Cp and gamma at high temperature) match a converged Thermo
+        prob.model.add_subsystem('thermo', SetTotalTP(spec=thermo_data, composition=elements, num_nodes=num_nodes,
+                                                      chem_eq_options={'fused_newton': True}),
+                                 promotes=['*'])
+        prob.model.set_input_defaults('T', np.full(num_nodes, 300.), units='degK')
+        prob.model.set_input_defaults('P', np.ones(num_nodes), units='Pa')
+        prob.setup(check=False)
+        prob.set_solver_print(level=-1)
+        chem_eq_options = prob.model.thermo.chem_eq.fused_newton_options
+        chem_eq_options['atol'] = 1e-10
+        chem_eq_options['rtol'] = 1e-10
+        chem_eq_options['iprint'] = -1
+        prob.final_setup()
+        _problems[key] = (prob, prob.get_val('n').copy())
+    return _problems[key]
+
+
+def solve_line(thermo_data, elements, T, P):
+    """
+    Properties of the mixture `elements` over the (P, T) grid, solving all P at once and
+    continuing along the (ascending) temperatures T.
+
+    Returns a dict of (len(P), len(T)) arrays.
+    """
+    if isinstance(thermo_data, str):
+        thermo_data = importlib.import_module(thermo_data)
+
+    prob, n_init = _problem(thermo_data, elements, len(P))
+    # the problem is shared by the mixtures with the same elements
+    b0 = species_data.get_properties(thermo_data, elements).b0
+    prob.set_val('composition', np.tile(b0, (len(P), 1)))
+    prob.set_val('P', P, units='Pa')
+    # cold start from the initial guess, so a line does not depend on what was solved before it
+    prob.set_val('n', n_init)
+
+    chem_eq = prob.model.thermo.chem_eq
+    props = {name: np.empty((len(P), len(T))) for name, _ in PROPERTIES}
+    for k, T_k in enumerate(T):
+        # the species that were trace at the previous temperature are not frozen at their bound,
+        # which would miss the dissociation on large temperature steps
+        chem_eq.remove_trace_species[:] = False
+        prob.set_val('T', np.full(len(P), T_k), units='degK')
+        prob.run_model()
+        for name, units in PROPERTIES:
+            props[name][:, k] = prob.get_val(name, units=units)
+    return props
+
+
+def _run_job(job):
+    i, j, thermo_data, elements, T, P = job
+    return i, j, solve_line(thermo_data, elements, T, P)
+
+
+class _Checkpoint(object):
+    """
+    The table being generated, and which of its jobs are finished.
+
+    With a directory, the table is kept there in the layout of save_table: the results of each job
+    go straight into the memory mapped table.npy, and the finished jobs are saved to done.npy
+    after each one.
+    """
+
+    def __init__(self, dirname, names, axes, num_chunks):
+        self.dirname = dirname
+        shape = tuple(len(axes[name]) for name in names) + (len(PROPERTIES), )
+        # one row per composition, in the (C) order of the composition axes
+        self.done = np.zeros((int(np.prod(shape[:-3])), num_chunks), dtype=bool)
+
+        if dirname is None:
+            self.table = np.full(shape, np.nan)
+            return
+
+        table_path = os.path.join(dirname, 'table.npy')
+        if os.path.exists(os.path.join(dirname, 'done.npy')):
+            with np.load(os.path.join(dirname, 'axes.npz')) as data:
+                for name in names:
+                    if name not in data or data[name].shape != axes[name].shape or not np.allclose(data[name], axes[name]):
+                        raise ValueError(f'The checkpoint {dirname} was written for a different grid ({name}).')
+            done = np.load(os.path.join(dirname, 'done.npy'))
+            if done.shape != self.done.shape:
+                raise ValueError(f'The checkpoint {dirname} was written with a different number of chunks.')
+            self.done[:] = done
+            self.table = np.lib.format.open_memmap(table_path, mode='r+')
+        else:
+            os.makedirs(dirname, exist_ok=True)
+            np.savez(os.path.join(dirname, 'axes.npz'), names=names, properties=[name for name, _ in PROPERTIES],
+                     **{name: axes[name] for name in names})
+            self.table = np.lib.format.open_memmap(table_path, mode='w+', dtype=float, shape=shape)
+            self.table[...] = np.nan
+            self._save_done()
+
+    def _save_done(self):
+        tmp = os.path.join(self.dirname, 'done.tmp.npy')
+        np.save(tmp, self.done)
+        os.replace(tmp, os.path.join(self.dirname, 'done.npy'))
+
+    def store(self, i, chunk, j, props):
+        idx = np.unravel_index(i, self.table.shape[:-3])
+        for k, (name, _) in enumerate(PROPERTIES):
+            self.table[idx + (chunk, slice(None), k)] = props[name]
+        self.done[i, j] = True
+
+        if self.dirname is not None:
+            # the results are on disk before the job is marked as finished
+            self.table.flush()
+            self._save_done()
+
+    def properties(self):
+        return {name: np.ascontiguousarray(self.table[..., k]) for k, (name, _) in enumerate(PROPERTIES)}
+
+
+def _composition_axes(FAR, fuel, ratio_name, mixes):
+    """
+    The (name, reactant, values) of each composition axis, in the (sorted) order of the
+    composition variables of the tabular thermo.
+    """
+    compo = {ratio_name: (fuel, FAR)}
+    if mixes is not None:
+        for name, (reactant, values) in mixes.items():
+            if name in compo:
+                raise ValueError(f'The composition axis {name} is given twice.')
+            compo[name] = (reactant, values)
+
+    return [(name, compo[name][0], np.asarray(compo[name][1], dtype=float)) for name in sorted(compo)]
+
+
+def generate_table(T=DEFAULT_T, P=DEFAULT_P, FAR=DEFAULT_FAR, thermo_data=species_data.janaf,
+                   base=CEA_AIR_COMPOSITION, fuel='Jet-A(g)', ratio_name='FAR', num_procs=1, chunk_size=None,
+                   checkpoint=None, verbose=False, mixes=None):
+    """
+    Generates tabular thermo data.
+
+    Parameters
+    ----------
+    T : array_like
+        Temperatures (degK), ascending.
+    P : array_like
+        Pressures (Pa), ascending.
+    FAR : array_like
+        Mass ratios of fuel to base flow, ascending.
+    thermo_data : module
+        CEA thermo data set (e.g. species_data.janaf).
+    base : dict
+        Element composition (mol/g) of the base flow.
+    fuel : str or dict
+        Reactant of thermo_data mixed into the base flow, or its element composition (mol per mol).
+    ratio_name : str
+        Name of the ratio axis in the table, and of the tabular composition variable.
+    num_procs : int or None
+        Worker processes. None uses one per cpu; 1 runs in this process.
+    chunk_size : int or None
+        Number of pressures solved together in one job. Defaults to all of them, split further
+        when there are more processes than ratios.
+    checkpoint : str or None
+        Directory the table is written to as it is generated, in the layout of save_table, with the
+        finished jobs in done.npy. If it exists, the finished jobs are not rerun.
+    verbose : bool
+        Print the progress.
+    mixes : dict or None
+        More composition axes, as {name: (reactant, ratios)}; e.g. {'WAR': ('Water', [0., 0.02])}.
+        Each reactant is given like the fuel, and its ratios are masses per mass of base flow.
+
+    Returns
+    -------
+    dict
+        The table: the T, P and composition axes and a (num_ratio, ..., num_P, num_T) array of
+        each property, with the composition axes in the order of their sorted names.
+    """
+    T = np.asarray(T, dtype=float)
+    P = np.asarray(P, dtype=float)
+    compo = _composition_axes(FAR, fuel, ratio_name, mixes)
+    for name, vals in [('T', T), ('P', P)] + [(name, vals) for name, _, vals in compo]:
+        if vals.ndim != 1 or np.any(np.diff(vals) <= 0):
+            raise ValueError(f'The {name} values of a table must be a strictly ascending 1-D array.')
+
+    compo_shape = tuple(len(vals) for _, _, vals in compo)
+    num_compo = int(np.prod(compo_shape))
+
+    if num_procs is None:
+        num_procs = os.cpu_count() or 1
+    if chunk_size is None:
+        # enough jobs to keep every process busy
+        chunk_size = int(np.ceil(len(P)/max(1, int(np.ceil(num_procs/num_compo)))))
+    chunks = [slice(start, min(start + chunk_size, len(P))) for start in range(0, len(P), chunk_size)]
+
+    names = [name for name, _, _ in compo] + ['P', 'T']
+    axes = {'T': T, 'P': P, **{name: vals for name, _, vals in compo}}
+    ckpt = _Checkpoint(checkpoint, names, axes, len(chunks))
+
+    jobs = []
+    for i, idx in enumerate(np.ndindex(*compo_shape)):
+        elements = mixture_elements(thermo_data, base, [reactant for _, reactant, _ in compo],
+                                    [vals[k] for (_, _, vals), k in zip(compo, idx)])
+        for j, chunk in enumerate(chunks):
+            if not ckpt.done[i, j]:
+                jobs.append((i, j, thermo_data.__name__, elements, T, P[chunk]))
+
+    t0 = time.perf_counter()
+    if num_procs == 1 or len(jobs) <= 1:
+        results = map(_run_job, jobs)
+        pool = None
+    else:
+        ctx = multiprocessing.get_context('fork' if 'fork' in multiprocessing.get_all_start_methods() else 'spawn')
+        pool = ctx.Pool(min(num_procs, len(jobs)))
+        results = pool.imap_unordered(_run_job, jobs)
+
+    try:
+        for count, (i, j, props) in enumerate(results):
+            ckpt.store(i, chunks[j], j, props)
+            if verbose:
+                ratios = ', '.join(f'{name}: {vals[k]:.4f}' for (name, _, vals), k
+                                   in zip(compo, np.unravel_index(i, compo_shape)))
+                print(f'{ratios}, P: {P[chunks[j]][0]:.4g}-{P[chunks[j]][-1]:.4g} Pa '
+                      f'({count + 1}/{len(jobs)}, {time.perf_counter() - t0:.1f} s)')
+    finally:
+        if pool is not None:
+            pool.terminate()
+
+    return TabSpec(**axes, **ckpt.properties())
+
+
+def _midpoints(vals, geometric=False):
+    if geometric and vals[0] > 0:
+        return np.sqrt(vals[:-1]*vals[1:])
+    return 0.5*(vals[:-1] + vals[1:])
+
+
+def _widths(vals, geometric=False):
+    if geometric and vals[0] > 0:
+        return np.diff(np.log(vals))
+    return np.diff(vals)
+
+
+def interpolation_error(exact, approx, T):
+    """
+    Largest error of the interpolated properties `approx` (a dict of arrays, or an array stacked
+    in the order of PROPERTIES) against the `exact` ones, relative to the exact values. The
+    enthalpy, which goes through zero, is relative to at least Cp*T (degK, broadcast against the
+    property arrays) instead.
+    """
+    if isinstance(exact, dict):
+        exact = np.stack([exact[name] for name, _ in PROPERTIES])
+    if isinstance(approx, dict):
+        approx = np.stack([approx[name] for name, _ in PROPERTIES])
+
+    scale = np.abs(exact)
+    i_h = [name for name, _ in PROPERTIES].index('h')
+    i_Cp = [name for name, _ in PROPERTIES].index('Cp')
+    scale[i_h] = np.maximum(scale[i_h], np.abs(exact[i_Cp])*T)
+    return np.max(np.abs(approx - exact)/scale, axis=0)
+
+
+def refine_table(T, P, FAR, tol=1e-4, interp_method='slinear', max_iter=10, max_depth=8,
+                 thermo_data=species_data.janaf, base=CEA_AIR_COMPOSITION, fuel='Jet-A(g)', ratio_name='FAR',
+                 num_procs=1, verbose=False, mixes=None):
+    """
+    Generates tabular thermo data on a grid refined until interpolating it reproduces the CEA
+    thermo within a tolerance.
+
+    Starting from the (coarse) T, P and composition axes, the properties are solved at the centre
+    of every edge, face and cell of the grid (the midpoints of the intervals of one or more axes,
+    on the nodes of the other axes) and compared with the interpolated table (see
+    interpolation_error). Every interval with an error above `tol` at one of its centres is split
+    at its midpoint (geometric midpoint for P), on the whole grid, and the check is repeated on the
+    refined table. An error at a face or cell centre splits the intervals of all its axes, unless
+    one of them is already split. Breakpoints are only added where the properties need them, so
+    the result is the coarsest grid of this bisection that meets the tolerance at all the centres.
+    Between the centres and the nodes the error is not checked.
+
+    Intervals are split at most `max_depth` times, so a kink of the CEA data (such as the step
+    between the ratio 0, solved without the fuel species, and the smallest positive ratios)
+    shows up in the error map rather than being refined without end.
+
+    Parameters
+    ----------
+    T, P, FAR : array_like
+        Initial axes, as in generate_table.
+    mixes : dict or None
+        More composition axes with their initial ratios, as in generate_table.
+    tol : float
+        Largest relative interpolation error allowed.
+    interp_method : str
+        Interpolation method the table is used with (see the tabular SetTotalTP).
+    max_iter : int
+        Largest number of refinements. If the tolerance is still not met, a warning is issued.
+    max_depth : int
+        Largest number of times an interval of the initial axes is split.
+    thermo_data, base, fuel, ratio_name, num_procs, verbose
+        As in generate_table.
+
+    Returns
+    -------
+    dict
+        The table.
+    dict
+        The error map of the table: for each axis (the composition axes, 'P' and 'T'), the
+        midpoints of its intervals and the largest error over the properties at each of them, on
+        the nodes of the other axes; e.g. errors['T'] is a (num_ratio, num_P, num_T - 1) array of
+        errors at the temperatures errors['T_mid']. The errors at the face and cell centres are
+        under the comma separated names of their axes (e.g. errors['P,T']). Also 'max', the
+        largest error of all.
+    """
+    compo = _composition_axes(FAR, fuel, ratio_name, mixes)
+    names = tuple(name for name, _, _ in compo) + ('P', 'T')
+    axes = [vals for _, _, vals in compo] + [np.asarray(P, dtype=float), np.asarray(T, dtype=float)]
+    ndim = len(axes)
+    geometric = [name == 'P' for name in names]
+    min_widths = [np.min(_widths(x, geo), initial=np.inf)/2**max_depth for x, geo in zip(axes, geometric)]
+
+    # the axes each set of centres is at the midpoints of: edges first, then faces and cells
+    centres = sorted((c for c in itertools.product((False, True), repeat=ndim) if any(c)), key=sum)
+
+    def solve(block_axes):
+        ratios = dict(zip(names, block_axes))
+        spec = generate_table(T=block_axes[-1], P=block_axes[-2], FAR=ratios[ratio_name], thermo_data=thermo_data,
+                              base=base, fuel=fuel, ratio_name=ratio_name, num_procs=num_procs,
+                              mixes={name: (reactant, ratios[name]) for name, reactant, _ in compo if name != ratio_name})
+        return np.stack([spec[name] for name, _ in PROPERTIES])
+
+    table = solve(axes)
+
+    for it in range(max_iter + 1):
+        interps = [InterpND(method=interp_method, points=tuple(axes), values=vals, extrapolate=True)
+                   for vals in table]
+
+        mids = [_midpoints(axes[a], geometric[a]) for a in range(ndim)]
+        exact, errors = {}, {}
+        for centre in centres:
+            block_axes = [mids[a] if mid else axes[a] for a, mid in enumerate(centre)]
+            exact[centre] = solve(block_axes)
+            x = np.stack(np.meshgrid(*block_axes, indexing='ij'), axis=-1).reshape(-1, ndim)
+            approx = np.stack([interp.interpolate(x).reshape(exact[centre].shape[1:]) for interp in interps])
+            errors[centre] = interpolation_error(exact[centre], approx, block_axes[-1])
+
+        splittable = [_widths(axes[a], geometric[a]) > 1.5*min_widths[a] for a in range(ndim)]
+        split = [np.zeros(len(x) - 1, dtype=bool) for x in axes]
+        for centre in centres:
+            along = [a for a, mid in enumerate(centre) if mid]
+            bad = errors[centre] > tol
+            # a centre in an interval that is already split is checked again on the refined grid
+            for a in along:
+                bad &= ~split[a].reshape([-1 if b == a else 1 for b in range(ndim)])
+            for a in along:
+                split[a] |= np.any(bad, axis=tuple(b for b in range(ndim) if b != a)) & splittable[a]
+
+        if verbose:
+            print(f'grid {" x ".join(str(len(x)) for x in axes)}: largest error '
+                  + ', '.join(f'{",".join(n for n, mid in zip(names, centre) if mid)} '
+                              f'{np.max(errors[centre], initial=0.):.2e}' for centre in centres))
+
+        if not any(s.any() for s in split) or it == max_iter:
+            break
+
+        # insert the midpoints of the split intervals. The table is known at the old nodes and, from
+        # the centre solves, at every combination of old nodes and new midpoints
+        new_axes = [np.sort(np.concatenate((axes[a], mids[a][split[a]]))) for a in range(ndim)]
+        old_idx = [np.searchsorted(new_axes[a], axes[a]) for a in range(ndim)]
+        new_idx = [np.searchsorted(new_axes[a], mids[a][split[a]]) for a in range(ndim)]
+
+        new_table = np.empty((len(PROPERTIES), ) + tuple(len(x) for x in new_axes))
+        new_table[(slice(None), ) + np.ix_(*old_idx)] = table
+        for centre in centres:
+            idx = [new_idx[a] if mid else old_idx[a] for a, mid in enumerate(centre)]
+            if any(len(i) == 0 for i in idx):
+                continue
+            block = exact[centre]
+            for a, mid in enumerate(centre):
+                if mid:
+                    block = np.compress(split[a], block, axis=a + 1)
+            new_table[(slice(None), ) + np.ix_(*idx)] = block
+
+        axes, table = new_axes, new_table
+
+    error_map = {'max': max(np.max(err, initial=0.) for err in errors.values())}
+    for name, mid in zip(names, mids):
+        error_map[f'{name}_mid'] = mid
+    for centre in centres:
+        error_map[','.join(name for name, mid in zip(names, centre) if mid)] = errors[centre]
+
+    if error_map['max'] > tol:
+        warnings.warn(f'The tabular thermo data did not meet the tolerance of {tol} (largest error '
+                      f'{error_map["max"]:.3g}), see the error map.')
+
+    spec = TabSpec(zip(names, axes))
+    for i, (name, _) in enumerate(PROPERTIES):
+        spec[name] = table[i]
+    return spec, error_map
+
+
+def save_table(spec, filename):
+    """
+    Saves a table, for use as the spec of the tabular thermo (see load_tab_spec).
+
+    A .pkl file name pickles the table. Any other name is a directory holding the axes (axes.npz)
+    and the properties stacked along a last axis (table.npy), which is memory mapped when the
+    table is loaded, so only the cells that are looked up are read from a large table.
+    """
+    if filename.endswith('.pkl'):
+        with open(filename, 'wb') as f:
+            pickle.dump(dict(spec), f)
+        return
+
+    if 'table_axes' in spec:
+        names = list(spec['table_axes'])
+    else:
+        names = sorted(name for name in spec if name not in ('P', 'T') and name not in dict(PROPERTIES)) + ['P', 'T']
+    os.makedirs(filename, exist_ok=True)
+    np.savez(os.path.join(filename, 'axes.npz'), names=names, properties=[name for name, _ in PROPERTIES],
+             **{name: spec[name] for name in names})
+    # written one property at a time, without stacking the whole table in memory
+    shape = tuple(len(spec[name]) for name in names) + (len(PROPERTIES), )
+    table = np.lib.format.open_memmap(os.path.join(filename, 'table.npy'), mode='w+', dtype=float, shape=shape)
+    for i, (name, _) in enumerate(PROPERTIES):
+        table[..., i] = spec[name]
+    table.flush()
+    del table
+
+
+def load_table(path, **kwargs):
+    """
+    Loads the table saved at `path` (see load_tab_spec), generating it with generate_table(**kwargs)
+    and saving it there first if it does not exist yet.
+    """
+    if not os.path.exists(path):
+        save_table(generate_table(**kwargs), path)
+    return load_tab_spec(path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Generate tabular thermo data from the CEA thermo.')
+    parser.add_argument('filename', help='pickle file (.pkl) or directory the table is written to')
+    parser.add_argument('--fuel', default='Jet-A(g)', help='reactant mixed into the air')
+    parser.add_argument('--thermo-data', default='janaf', help='CEA thermo data set in pycycle.thermo.cea.species_data')
+    parser.add_argument('--T', nargs=3, type=float, default=(100., 3500., 100), metavar=('MIN', 'MAX', 'NUM'),
+                        help='linearly spaced temperatures (degK)')
+    parser.add_argument('--P', nargs=3, type=float, default=(1., 1e7, 110), metavar=('MIN', 'MAX', 'NUM'),
+                        help='logarithmically spaced pressures (Pa)')
+    parser.add_argument('--FAR', nargs=3, type=float, default=(0., 0.05, 20), metavar=('MIN', 'MAX', 'NUM'),
+                        help='linearly spaced fuel to air ratios')
+    parser.add_argument('--mix', nargs=5, action='append', default=[], metavar=('NAME', 'REACTANT', 'MIN', 'MAX', 'NUM'),
+                        help='another composition axis, of linearly spaced ratios of a reactant to the air '
+                             '(e.g. --mix WAR Water 0 0.03 4)')
+    parser.add_argument('--num-procs', type=int, default=None, help='worker processes (default: one per cpu)')
+    parser.add_argument('--chunk-size', type=int, default=None, help='pressures solved together in one job')
+    parser.add_argument('--checkpoint', default=None, help='directory to save and resume the progress')
+    parser.add_argument('--tol', type=float, default=None,
+                        help='refine the (initial) axes until the interpolation error is below this tolerance')
+    parser.add_argument('--max-iter', type=int, default=10, help='largest number of refinements')
+    parser.add_argument('--error-map', default=None, help='npz file the error map of a refined table is written to')
+    args = parser.parse_args(argv)
+
+    kwargs = dict(T=np.linspace(args.T[0], args.T[1], int(args.T[2])),
+                  P=np.geomspace(args.P[0], args.P[1], int(args.P[2])),
+                  FAR=np.linspace(args.FAR[0], args.FAR[1], int(args.FAR[2])),
+                  thermo_data=getattr(species_data, args.thermo_data), fuel=args.fuel, num_procs=args.num_procs)
+    if args.mix:
+        kwargs['mixes'] = {name: (reactant, np.linspace(float(lo), float(hi), int(num)))
+                           for name, reactant, lo, hi, num in args.mix}
+
+    if args.tol is None:
+        spec = generate_table(chunk_size=args.chunk_size, checkpoint=args.checkpoint, verbose=True, **kwargs)
+    else:
+        spec, errors = refine_table(tol=args.tol, max_iter=args.max_iter, verbose=True, **kwargs)
+        if args.error_map is not None:
+            np.savez(args.error_map, **errors)
+    save_table(spec, args.filename)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,14 +1,250 @@
+from bisect import bisect_left
+import itertools
+
 import numpy as np
 import openmdao.api as om
 
-from pycycle.constants import TAB_AIR_FUEL_COMPOSITION, AIR_JETA_TAB_SPEC
+from pycycle.constants import TAB_AIR_FUEL_COMPOSITION, TabSpec, load_tab_spec
+
+
+# property, units, default value
+TAB_PROPERTIES = (('h', 'J/kg', 1.0), ('S', 'J/kg/degK', 1.0), ('gamma', None, 1.4), ('Cp', 'J/kg/degK', 1.0),
+                  ('Cv', 'J/kg/degK', 1.0), ('rho', 'kg/m**3', 1.0), ('R', 'J/kg/degK', 287.0))
+
+
+def stacked_table(spec, names, props=TAB_PROPERTIES):
+    """
+    The properties of a tabular thermo spec stacked along a last axis, as one array (one value
+    per property at each grid point), with the axes of its other dimensions in the order of
+    `names`.
+
+    A spec loaded from a table directory already holds its stacked table (memory mapped), which
+    is used as it is when its axes and properties are in the same order.
+
+    The stacked tables are kept on a TabSpec (as load_tab_spec and generate_table return), so
+    all the lookups of a spec share them; a plain dict spec is stacked again for every lookup.
+    """
+    prop_names = tuple(name for name, *_ in props)
+    key = (tuple(names), prop_names)
+    tables = getattr(spec, '_stacked_tables', {})
+    if key not in tables:
+        axes = [np.asarray(spec[name], dtype=float) for name in names]
+        stored = spec.get('table_properties', ())
+        i_props = [stored.index(name) for name in prop_names if name in stored]
+        if (spec.get('table_axes') == tuple(names) and len(i_props) == len(prop_names) and
+                i_props == list(range(i_props[0], i_props[0] + len(i_props)))):
+            # a view of the mapped file, so only the looked up cells are read from it
+            table = np.asarray(spec['table'])[..., i_props[0]:i_props[-1] + 1]
+        else:
+            table = np.ascontiguousarray(np.stack([spec[name] for name, *_ in props], axis=-1), dtype=float)
+        tables[key] = (axes, table)
+        if isinstance(spec, TabSpec):
+            spec._stacked_tables = tables
+    return tables[key]
+
+
+class TabularLookup(om.ExplicitComponent):
+    """
+    Multilinear interpolation of all the properties of a tabular thermo spec at once.
+
+    The cell holding the (composition, P, T) point is found once per evaluation and the
+    properties are interpolated together from the stacked table, with the partials computed from
+    the same stencil. Outside of the table the properties are extrapolated linearly from the
+    edge cells, like MetaModelStructuredComp(method='slinear', extrapolate=True).
+
+    The cell is reduced one axis at a time from the last one, with the same operations as that
+    interpolation, so the two agree to the last bit: the Newton solves of a cycle can be
+    sensitive enough to round-off to converge to another root otherwise.
+    """
+
+    def initialize(self):
+        self.options.declare('spec', recordable=False)
+        self.options.declare('composition')
+
+    def setup(self):
+        spec = self.options['spec']
+        composition = self.options['composition']
+        sorted_compo = sorted(composition.keys())
+
+        self._axes, self._table = stacked_table(spec, sorted_compo + ['P', 'T'])
+        self._axes_lists = [axis.tolist() for axis in self._axes]
+        ndim = len(self._axes)
+        # offsets of the corners of a cell
+        self._corners = np.array(list(itertools.product((0, 1), repeat=ndim)))
+        self._stencil_cache = None
+
+        self.add_input('composition', val=[composition[k] for k in sorted_compo])
+        self.add_input('P', 101325.0, units='Pa')
+        self.add_input('T', 273.0, units='degK')
+
+        for name, units, val in TAB_PROPERTIES:
+            self.add_output(name, val, units=units)
+
+        self.declare_partials('*', '*')
+
+    def _stencil(self, inputs):
+        x = np.concatenate((inputs['composition'], inputs['P'], inputs['T']))
+        if self._stencil_cache is not None and np.array_equal(self._stencil_cache[0], x):
+            return self._stencil_cache[1:]
+
+        ndim = len(x)
+        idx = np.empty(ndim, dtype=int)
+        for k, (axis, x_k) in enumerate(zip(self._axes_lists, x)):
+            # the cell left of a breakpoint, as in MetaModelStructuredComp; the edge cells outside of the table
+            idx[k] = min(max(bisect_left(axis, x_k.real) - 1, 0), len(axis) - 2)
+
+        # property values at the corners of the cell, (2, ..., 2, num_props)
+        props = self._table[tuple((idx + self._corners).T)].reshape((2, )*ndim + (-1, ))
+        # derivatives with respect to the axes reduced so far, (2, ..., 2, num_props, num_reduced)
+        d_props = np.zeros(props.shape + (0, ), dtype=x.dtype)
+        for k in reversed(range(ndim)):
+            axis, i = self._axes_lists[k], idx[k]
+            h = 1.0/(axis[i + 1] - axis[i])
+            dx = x[k] - axis[i]
+            slope = (props[..., 1, :] - props[..., 0, :])*h
+            d_slope = (d_props[..., 1, :, :] - d_props[..., 0, :, :])*h
+            d_props = np.concatenate((slope[..., np.newaxis], d_props[..., 0, :, :] + dx*d_slope), axis=-1)
+            props = props[..., 0, :] + dx*slope
+
+        self._stencil_cache = (x, props, d_props)
+        return props, d_props
+
+    def compute(self, inputs, outputs):
+        props, _ = self._stencil(inputs)
+        for i, (name, _, _) in enumerate(TAB_PROPERTIES):
+            outputs[name] = props[i]
+
+    def compute_partials(self, inputs, J):
+        _, d_props = self._stencil(inputs)
+
+        num_compo = d_props.shape[1] - 2
+        for i, (name, _, _) in enumerate(TAB_PROPERTIES):
+            J[name, 'composition'] = d_props[i, :num_compo]
+            J[name, 'P'] = d_props[i, num_compo]
+            J[name, 'T'] = d_props[i, num_compo + 1]
+
+
+class TabularInverse(om.ExplicitComponent):
+    """
+    Temperature at which the multilinear interpolation of a tabular thermo spec gives a set
+    enthalpy or entropy, in place of a balance on T around a TabularLookup.
+
+    The composition and pressure are interpolated as in TabularLookup, giving the property at each
+    temperature breakpoint. The property increases with temperature, so the temperature follows from
+    a search of that column and a linear interpolation between its two breakpoints (extrapolating
+    from the edge ones), which makes this the exact inverse of the lookup. Below the table the
+    entropy is extrapolated as that of a gas with the Cp of the first interval instead, logarithmic
+    in T, so a low static pressure can't give a negative temperature.
+    """
+
+    def initialize(self):
+        self.options.declare('prop', values=('h', 'S'),
+                             desc='property the temperature is found from')
+        self.options.declare('spec', default=None, recordable=False,
+                             desc='tabular thermo data, defaults to the air/Jet-A table')
+        self.options.declare('composition', default=None)
+
+    def setup(self):
+        prop = self.options['prop']
+        spec = self.options['spec']
+        composition = self.options['composition']
+
+        if spec is None:
+            spec = load_tab_spec()
+
+        if composition is None:
+            composition = TAB_AIR_FUEL_COMPOSITION
+
+        sorted_compo = sorted(composition.keys())
+
+        props = [p for p in TAB_PROPERTIES if p[0] == prop]
+        axes, table = stacked_table(spec, sorted_compo + ['P', 'T'], props=props)
+        self._axes_lists = [axis.tolist() for axis in axes[:-1]]
+        self._T = axes[-1]
+        self._table = table[..., 0]
+        ndim = len(self._axes_lists)
+        # offsets of the corners of a cell, over the composition and pressure axes
+        self._corners = np.array(list(itertools.product((0, 1), repeat=ndim)))
+        self._signs = np.where(self._corners, 1., -1.)
+        self._stencil_cache = None
+
+        self.add_input('composition', val=[composition[k] for k in sorted_compo])
+        self.add_input('P', 101325.0, units='Pa')
+        self.add_input(prop, 1.0, units=props[0][1])
+
+        self.add_output('T', 273.0, units='degK', lower=self._T[0], upper=self._T[-1])
+
+        self.declare_partials('T', '*')
+
+    def _stencil(self, inputs):
+        x = np.concatenate((inputs['composition'], inputs['P'], inputs[self.options['prop']]))
+        if self._stencil_cache is not None and np.array_equal(self._stencil_cache[0], x):
+            return self._stencil_cache[1:]
+
+        ndim = len(x) - 1
+        idx = np.empty(ndim, dtype=int)
+        frac = np.empty(ndim, dtype=x.dtype)
+        inv_dx = np.empty(ndim)
+        for k, (axis, x_k) in enumerate(zip(self._axes_lists, x)):
+            # same cells as TabularLookup
+            i = min(max(bisect_left(axis, x_k.real) - 1, 0), len(axis) - 2)
+            inv_dx[k] = 1.0/(axis[i + 1] - axis[i])
+            idx[k] = i
+            frac[k] = (x_k - axis[i])*inv_dx[k]
+
+        # property columns at the corners of the cell, (2**ndim, num_T)
+        cols = self._table[tuple((idx + self._corners).T)]
+        weights = np.where(self._corners, frac, 1.0 - frac)
+        col = np.prod(weights, axis=1).dot(cols)
+
+        # temperature interval holding the property value, the edge ones outside of the table
+        i_T = min(max(np.searchsorted(col.real, x[-1].real) - 1, 0), len(self._T) - 2)
+        d_col = col[i_T + 1] - col[i_T]
+        frac_T = (x[-1] - col[i_T])/d_col
+        dT = self._T[i_T + 1] - self._T[i_T]
+
+        if self.options['prop'] == 'S' and frac_T.real < 0.:
+            # T = T_0*exp((S - S_0)/Cp), with Cp = T_0*dS/dT; the slopes are those of the linear
+            # extrapolation times T/T_0
+            scale = np.exp(frac_T*dT/self._T[0])
+            T = self._T[0]*scale
+        else:
+            scale = 1.0
+            T = self._T[i_T] + frac_T*dT
+
+        self._stencil_cache = (x, cols[:, i_T:i_T + 2], weights, inv_dx, frac_T, d_col, dT*scale, T)
+        return self._stencil_cache[1:]
+
+    def compute(self, inputs, outputs):
+        outputs['T'] = self._stencil(inputs)[-1]
+
+    def compute_partials(self, inputs, J):
+        cols, weights, inv_dx, frac_T, d_col, dT_dfrac, _ = self._stencil(inputs)
+        ndim = weights.shape[1]
+
+        d_weights = np.repeat(weights[:, np.newaxis, :], ndim, axis=1)
+        diag = np.arange(ndim)
+        d_weights[:, diag, diag] = self._signs*inv_dx
+        # slopes of the property at the two temperature breakpoints
+        d_cols = cols.T.dot(np.prod(d_weights, axis=2))
+
+        # along the column the temperature is linear in the property, and it moves with the
+        # column as -(d prop/d x)/(d prop/d T)
+        dT_dprop = dT_dfrac/d_col
+        dT_dx = -dT_dprop*((1.0 - frac_T)*d_cols[0] + frac_T*d_cols[1])
+
+        num_compo = ndim - 1
+        J['T', 'composition'] = dT_dx[:num_compo]
+        J['T', 'P'] = dT_dx[num_compo]
+        J['T', self.options['prop']] = dT_dprop
 
 
 class SetTotalTP(om.Group):
 
     def initialize(self):
         self.options.declare('interp_method', default='slinear')
-        self.options.declare('spec', recordable=False)
+        self.options.declare('spec', default=None, recordable=False, 
+                             desc='tabular thermo data, defaults to the air/Jet-A table')
         self.options.declare('composition')
 
     def setup(self):
@@ -16,30 +252,39 @@ class SetTotalTP(om.Group):
         spec = self.options['spec']
         composition = self.options['composition']
 
+        if spec is None: 
+            spec = load_tab_spec()
+
         if composition is None: 
             composition = TAB_AIR_FUEL_COMPOSITION
 
         sorted_compo = sorted(composition.keys())
 
-        interp = om.MetaModelStructuredComp(method=interp_method, extrapolate=True)
-        self.add_subsystem('tab', interp, promotes_inputs=['P', 'T'], 
-                                          promotes_outputs=['h', 'S', 'gamma', 'Cp', 'Cv', 'rho', 'R'])
-
-        for i, param in enumerate(sorted_compo): 
-            interp.add_input(param, composition[param], training_data=spec[param])
-            self.promotes('tab', inputs=[(param, 'composition')], src_indices=[i,])
-        self.set_input_defaults('composition', src_shape=len(composition))
-
-        interp.add_input('P', 101325.0, units='Pa', training_data=spec['P'])
-        interp.add_input('T', 273.0, units='degK', training_data=spec['T'])
-
-        interp.add_output('h', 1.0, units='J/kg', training_data=spec['h'])
-        interp.add_output('S', 1.0, units='J/kg/degK', training_data=spec['S'])
-        interp.add_output('gamma', 1.4, units=None, training_data=spec['gamma'])
-        interp.add_output('Cp', 1.0, units='J/kg/degK', training_data=spec['Cp'])
-        interp.add_output('Cv', 1.0, units='J/kg/degK', training_data=spec['Cv'])
-        interp.add_output('rho', 1.0, units='kg/m**3', training_data=spec['rho'])
-        interp.add_output('R', 287.0, units='J/kg/degK', training_data=spec['R'])
+        if interp_method == 'slinear': 
+            # the dedicated lookup, interpolating all the properties from one cell search
+            self.add_subsystem('tab', TabularLookup(spec=spec, composition=composition), 
+                               promotes_inputs=['P', 'T', 'composition'], 
+                               promotes_outputs=['h', 'S', 'gamma', 'Cp', 'Cv', 'rho', 'R'])
+        else: 
+            interp = om.MetaModelStructuredComp(method=interp_method, extrapolate=True)
+            self.add_subsystem('tab', interp, promotes_inputs=['P', 'T'], 
+                                              promotes_outputs=['h', 'S', 'gamma', 'Cp', 'Cv', 'rho', 'R'])
+
+            for i, param in enumerate(sorted_compo): 
+                interp.add_input(param, composition[param], training_data=spec[param])
+                self.promotes('tab', inputs=[(param, 'composition')], src_indices=[i,])
+            self.set_input_defaults('composition', src_shape=len(composition))
+
+            interp.add_input('P', 101325.0, units='Pa', training_data=spec['P'])
+            interp.add_input('T', 273.0, units='degK', training_data=spec['T'])
+
+            interp.add_output('h', 1.0, units='J/kg', training_data=spec['h'])
+            interp.add_output('S', 1.0, units='J/kg/degK', training_data=spec['S'])
+            interp.add_output('gamma', 1.4, units=None, training_data=spec['gamma'])
+            interp.add_output('Cp', 1.0, units='J/kg/degK', training_data=spec['Cp'])
+            interp.add_output('Cv', 1.0, units='J/kg/degK', training_data=spec['Cv'])
+            interp.add_output('rho', 1.0, units='kg/m**3', training_data=spec['rho'])
+            interp.add_output('R', 287.0, units='J/kg/degK', training_data=spec['R'])
 
         # required part of the SetTotalTP API for flow setup
         # use a sorted list of keys, so dictionary hash ordering doesn't bite us 
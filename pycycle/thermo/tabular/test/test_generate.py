@@ -0,0 +1,211 @@
+import gc
+import os
+import pickle
+import tempfile
+import unittest
+import weakref
+
+import numpy as np
+
+from openmdao.utils.assert_utils import assert_near_equal
+
+from pycycle.constants import CEA_AIR_COMPOSITION
+from pycycle.thermo.cea.species_data import janaf
+from pycycle.thermo.tabular.generate import generate_table, mixture_elements, refine_table, save_table, PROPERTIES
+from pycycle.thermo.tabular.tabular_thermo import load_tab_spec, stacked_table, TAB_PROPERTIES
+
+
+T = np.array([800., 1000.])
+P = np.array([101325., 303975.])
+FAR = np.array([0., 0.04])
+
+
+class GenerateTableTestCase(unittest.TestCase):
+
+    def test_mixture_elements(self):
+        air = mixture_elements(janaf, CEA_AIR_COMPOSITION, 'Jet-A(g)', 0.)
+        self.assertEqual(air, CEA_AIR_COMPOSITION)
+
+        mix = mixture_elements(janaf, CEA_AIR_COMPOSITION, 'Jet-A(g)', 0.04)
+        self.assertEqual(set(mix), set(CEA_AIR_COMPOSITION) | {'H'})
+        fuel_wt = 12*janaf.element_wts['C'] + 23*janaf.element_wts['H']
+        assert_near_equal(mix['H'], 0.04*23/fuel_wt/1.04, 1e-12)
+        assert_near_equal(mix['C'], (CEA_AIR_COMPOSITION['C'] + 0.04*12/fuel_wt)/1.04, 1e-12)
+        assert_near_equal(mix['N'], CEA_AIR_COMPOSITION['N']/1.04, 1e-12)
+
+        # fuel and water, each given per mass of air
+        wet = mixture_elements(janaf, CEA_AIR_COMPOSITION, ['Jet-A(g)', 'Water'], [0.04, 0.02])
+        water_wt = 2*janaf.element_wts['H'] + janaf.element_wts['O']
+        assert_near_equal(wet['H'], (0.04*23/fuel_wt + 0.02*2/water_wt)/1.06, 1e-12)
+        assert_near_equal(wet['O'], (CEA_AIR_COMPOSITION['O'] + 0.02/water_wt)/1.06, 1e-12)
+        assert_near_equal(wet['N'], CEA_AIR_COMPOSITION['N']/1.06, 1e-12)
+
+    def test_generate(self):
+        spec = generate_table(T=T, P=P, FAR=FAR)
+
+        assert_near_equal(spec['T'], T)
+        assert_near_equal(spec['FAR'], FAR)
+        for name, _ in PROPERTIES:
+            self.assertEqual(spec[name].shape, (2, 2, 2))
+            self.assertFalse(np.any(np.isnan(spec[name])))
+
+        # CEA equilibrium of 1 g air + 0.04 g Jet-A at 3 atm, 1000 K
+        TOL = 1e-5
+        assert_near_equal(spec['h'][1, 1, 1], -940830.42045505, tolerance=TOL)
+        assert_near_equal(spec['S'][1, 1, 1], 7963.72220092, tolerance=TOL)
+        assert_near_equal(spec['gamma'][1, 1, 1], 1.30944963, tolerance=TOL)
+        assert_near_equal(spec['Cp'][1, 1, 1], 1214.42524360, tolerance=TOL)
+        assert_near_equal(spec['Cv'][1, 1, 1], 927.43153963, tolerance=TOL)
+        assert_near_equal(spec['rho'][1, 1, 1], 1.05916549, tolerance=TOL)
+        assert_near_equal(spec['R'][1, 1, 1], 286.99481133, tolerance=TOL)
+        # air at 1 atm, 800 K
+        assert_near_equal(spec['Cp'][0, 0, 0], 1098.84140328, tolerance=TOL)
+        assert_near_equal(spec['R'][0, 0, 0], 287.05007636, tolerance=TOL)
+
+        # the results do not depend on how the grid is split up
+        parallel = generate_table(T=T, P=P, FAR=FAR, num_procs=2, chunk_size=1)
+        for name, _ in PROPERTIES:
+            assert_near_equal(parallel[name], spec[name], 1e-10)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            filename = os.path.join(tmp, 'table.pkl')
+            save_table(spec, filename)
+            assert_near_equal(load_tab_spec(filename)['Cp'], spec['Cp'])
+
+        # the lookups of a spec share its stacked table, which goes away with the spec
+        axes, table = stacked_table(spec, ['FAR', 'P', 'T'])
+        self.assertIs(stacked_table(spec, ['FAR', 'P', 'T'])[1], table)
+        self.assertNotIn('_stacked_tables', pickle.loads(pickle.dumps(spec)).__dict__)
+        table = weakref.ref(table)
+        spec = weakref.ref(spec)
+        del axes
+        gc.collect()
+        self.assertIsNone(spec())
+        self.assertIsNone(table())
+
+    def test_mixes(self):
+        WAR = np.array([0., 0.01, 0.03])
+        spec = generate_table(T=T, P=P, FAR=FAR, mixes={'WAR': ('Water', WAR)}, chunk_size=1)
+
+        assert_near_equal(spec['WAR'], WAR)
+        for name, _ in PROPERTIES:
+            # (FAR, WAR, P, T), in the sorted order of the composition names
+            self.assertEqual(spec[name].shape, (2, 3, 2, 2))
+            self.assertFalse(np.any(np.isnan(spec[name])))
+
+        # the dry slice is the single composition table
+        dry = generate_table(T=T, P=P, FAR=FAR)
+        for name, _ in PROPERTIES:
+            assert_near_equal(spec[name][:, 0], dry[name], 1e-10)
+        # water vapor raises the gas constant and the heat capacity
+        self.assertTrue(np.all(np.diff(spec['R'], axis=1) > 0))
+        self.assertTrue(np.all(np.diff(spec['Cp'], axis=1) > 0))
+
+        with self.assertRaises(ValueError) as cm:
+            generate_table(T=T, P=P, FAR=FAR, mixes={'FAR': ('Water', WAR)})
+        self.assertEqual(str(cm.exception), 'The composition axis FAR is given twice.')
+
+    def test_save_directory(self):
+        WAR = np.array([0., 0.03])
+        spec = generate_table(T=T, P=P, FAR=FAR, mixes={'WAR': ('Water', WAR)})
+
+        with tempfile.TemporaryDirectory() as tmp:
+            dirname = os.path.join(tmp, 'air_jetA_wet')
+            save_table(spec, dirname)
+            loaded = load_tab_spec(dirname)
+
+            self.assertIsInstance(loaded['table'], np.memmap)
+            self.assertEqual(loaded['table_axes'], ('FAR', 'WAR', 'P', 'T'))
+            for name in ('FAR', 'WAR', 'P', 'T'):
+                assert_near_equal(np.asarray(loaded[name]), spec[name])
+            for name, _ in PROPERTIES:
+                assert_near_equal(np.asarray(loaded[name]), spec[name])
+
+            # the lookups use the mapped table as it is, without copying it
+            axes, table = stacked_table(loaded, ['FAR', 'WAR', 'P', 'T'])
+            self.assertTrue(np.shares_memory(table, loaded['table']))
+            self.assertEqual(table.shape, (2, 2, 2, 2, len(TAB_PROPERTIES)))
+            del axes, table, loaded
+
+    def test_checkpoint(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            checkpoint = os.path.join(tmp, 'table')
+            spec = generate_table(T=T, P=P, FAR=FAR, chunk_size=1, checkpoint=checkpoint)
+
+            done = np.load(os.path.join(checkpoint, 'done.npy'))
+            self.assertTrue(np.all(done))
+            # the checkpoint is a table directory like save_table writes
+            loaded = load_tab_spec(checkpoint)
+            assert_near_equal(np.asarray(loaded['Cp']), spec['Cp'])
+            del loaded
+
+            # mark a job as unfinished, and garble the results of a finished one: only the
+            # unfinished one is solved again
+            done[1, 0] = False
+            np.save(os.path.join(checkpoint, 'done.npy'), done)
+            table = np.load(os.path.join(checkpoint, 'table.npy'), mmap_mode='r+')
+            i_Cp = [name for name, _ in PROPERTIES].index('Cp')
+            table[1, 0, :, i_Cp] = 0.
+            table[0, 1, :, i_Cp] = -1.
+            table.flush()
+            del table
+
+            resumed = generate_table(T=T, P=P, FAR=FAR, chunk_size=1, checkpoint=checkpoint)
+            assert_near_equal(resumed['Cp'][1, 0], spec['Cp'][1, 0], 1e-10)
+            assert_near_equal(resumed['Cp'][0, 1], np.full(2, -1.))
+
+            with self.assertRaises(ValueError) as cm:
+                generate_table(T=T + 1., P=P, FAR=FAR, chunk_size=1, checkpoint=checkpoint)
+            self.assertIn('was written for a different grid (T)', str(cm.exception))
+
+    def test_axes(self):
+        with self.assertRaises(ValueError) as cm:
+            generate_table(T=T[::-1], P=P, FAR=FAR)
+        self.assertEqual(str(cm.exception), 'The T values of a table must be a strictly ascending 1-D array.')
+
+
+class RefineTableTestCase(unittest.TestCase):
+
+    def test_refine(self):
+        T0, P0, FAR0 = [300., 900., 1500.], [1e4, 1e6], [0.005, 0.02]
+        spec, errors = refine_table(T=T0, P=P0, FAR=FAR0, tol=5e-3)
+
+        self.assertLessEqual(errors['max'], 5e-3)
+        for name, initial in (('T', T0), ('P', P0), ('FAR', FAR0)):
+            self.assertTrue(np.all(np.diff(spec[name]) > 0))
+            self.assertTrue(np.all(np.isin(initial, spec[name])))
+        # breakpoints are added where the properties curve, not everywhere
+        self.assertGreater(len(spec['T']), 3)
+        self.assertGreater(len(np.unique(np.diff(spec['T']).round(6))), 1)
+
+        # the error map holds the errors at the midpoints of the final intervals
+        self.assertEqual(errors['T'].shape, (len(spec['FAR']), len(spec['P']), len(spec['T']) - 1))
+        assert_near_equal(errors['T_mid'], 0.5*(spec['T'][1:] + spec['T'][:-1]))
+        assert_near_equal(errors['P_mid'], np.sqrt(spec['P'][1:]*spec['P'][:-1]))
+        self.assertLessEqual(np.max(errors['P']), 5e-3)
+        # and at the face and cell centres
+        self.assertEqual(errors['FAR,P,T'].shape, (len(spec['FAR']) - 1, len(spec['P']) - 1, len(spec['T']) - 1))
+        for name in ('FAR,P', 'FAR,T', 'P,T', 'FAR,P,T'):
+            self.assertLessEqual(np.max(errors[name]), 5e-3)
+
+        # the table assembled during the refinement is the table of its axes
+        direct = generate_table(T=spec['T'], P=spec['P'], FAR=spec['FAR'])
+        for name, _ in PROPERTIES:
+            assert_near_equal(spec[name], direct[name], 1e-5)
+
+    def test_limits(self):
+        with self.assertWarns(UserWarning) as cm:
+            spec, errors = refine_table(T=[300., 1500.], P=[1e4, 1e6], FAR=[0.005, 0.02], tol=1e-4, max_iter=0)
+        self.assertIn('did not meet the tolerance of 0.0001', str(cm.warning))
+        assert_near_equal(spec['T'], np.array([300., 1500.]))
+        self.assertGreater(errors['max'], 1e-4)
+        self.assertEqual(errors['FAR'].shape, (1, 2, 2))
+
+        # each initial interval is split at most max_depth times
+        with self.assertWarns(UserWarning):
+            spec, errors = refine_table(T=[300., 1500.], P=[1e4, 1e6], FAR=[0.005, 0.02], tol=1e-4, max_depth=1)
+        assert_near_equal(spec['T'], np.array([300., 900., 1500.]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,152 @@
+import unittest
+
+import openmdao.api as om
+from openmdao.utils.assert_utils import assert_near_equal
+
+import pycycle.api as pyc
+
+
+class TabTurbojet(pyc.Cycle):
+
+    def setup(self):
+        self.options['thermo_method'] = 'TABULAR'
+        self.options['thermo_data'] = pyc.AIR_JETA_TAB_SPEC
+        design = self.options['design']
+
+        self.add_subsystem('fc', pyc.FlightConditions())
+        self.add_subsystem('inlet', pyc.Inlet())
+        self.add_subsystem('comp', pyc.Compressor(map_data=pyc.AXI5, map_extrap=True), promotes_inputs=['Nmech'])
+        self.add_subsystem('burner', pyc.Combustor(fuel_type='FAR'))
+        self.add_subsystem('turb', pyc.Turbine(map_data=pyc.LPT2269), promotes_inputs=['Nmech'])
+        self.add_subsystem('nozz', pyc.Nozzle(nozzType='CD', lossCoef='Cv'))
+        self.add_subsystem('shaft', pyc.Shaft(num_ports=2), promotes_inputs=['Nmech'])
+        self.add_subsystem('perf', pyc.Performance(num_nozzles=1, num_burners=1))
+
+        self.pyc_connect_flow('fc.Fl_O', 'inlet.Fl_I', connect_w=False)
+        self.pyc_connect_flow('inlet.Fl_O', 'comp.Fl_I')
+        self.pyc_connect_flow('comp.Fl_O', 'burner.Fl_I')
+        self.pyc_connect_flow('burner.Fl_O', 'turb.Fl_I')
+        self.pyc_connect_flow('turb.Fl_O', 'nozz.Fl_I')
+
+        self.connect('comp.trq', 'shaft.trq_0')
+        self.connect('turb.trq', 'shaft.trq_1')
+        self.connect('fc.Fl_O:stat:P', 'nozz.Ps_exhaust')
+        self.connect('inlet.Fl_O:tot:P', 'perf.Pt2')
+        self.connect('comp.Fl_O:tot:P', 'perf.Pt3')
+        self.connect('burner.Wfuel', 'perf.Wfuel_0')
+        self.connect('inlet.F_ram', 'perf.ram_drag')
+        self.connect('nozz.Fg', 'perf.Fg_0')
+
+        balance = self.add_subsystem('balance', om.BalanceComp())
+        if design:
+            balance.add_balance('W', units='lbm/s', eq_units='lbf', rhs_name='Fn_target')
+            self.connect('balance.W', 'inlet.Fl_I:stat:W')
+            self.connect('perf.Fn', 'balance.lhs:W')
+
+            balance.add_balance('FAR', eq_units='degR', lower=1e-4, val=.017, rhs_name='T4_target')
+            self.connect('balance.FAR', 'burner.Fl_I:FAR')
+            self.connect('burner.Fl_O:tot:T', 'balance.lhs:FAR')
+
+            balance.add_balance('turb_PR', val=1.5, lower=1.001, upper=8, eq_units='hp', rhs_val=0.)
+            self.connect('balance.turb_PR', 'turb.PR')
+            self.connect('shaft.pwr_net', 'balance.lhs:turb_PR')
+        else:
+            balance.add_balance('FAR', eq_units='lbf', lower=1e-4, val=.3, rhs_name='Fn_target')
+            self.connect('balance.FAR', 'burner.Fl_I:FAR')
+            self.connect('perf.Fn', 'balance.lhs:FAR')
+
+            balance.add_balance('Nmech', val=1.5, units='rpm', lower=500., eq_units='hp', rhs_val=0.)
+            self.connect('balance.Nmech', 'Nmech')
+            self.connect('shaft.pwr_net', 'balance.lhs:Nmech')
+
+            balance.add_balance('W', val=168.0, units='lbm/s', eq_units='inch**2')
+            self.connect('balance.W', 'inlet.Fl_I:stat:W')
+            self.connect('nozz.Throat:stat:area', 'balance.lhs:W')
+
+        newton = self.nonlinear_solver = om.NewtonSolver()
+        newton.options['atol'] = 1e-6
+        newton.options['rtol'] = 1e-6
+        newton.options['iprint'] = -1
+        newton.options['maxiter'] = 15
+        newton.options['solve_subsystems'] = True
+        newton.options['max_sub_solves'] = 100
+        newton.options['reraise_child_analysiserror'] = False
+        self.linear_solver = om.DirectSolver()
+
+        super().setup()
+
+
+class MPTabTurbojet(pyc.MPCycle):
+
+    def setup(self):
+        self.pyc_add_pnt('DESIGN', TabTurbojet())
+
+        self.set_input_defaults('DESIGN.Nmech', 8070.0, units='rpm')
+        self.set_input_defaults('DESIGN.inlet.MN', 0.60)
+        self.set_input_defaults('DESIGN.comp.MN', 0.020)
+        self.set_input_defaults('DESIGN.burner.MN', 0.020)
+        self.set_input_defaults('DESIGN.turb.MN', 0.4)
+
+        self.pyc_add_cycle_param('burner.dPqP', 0.03)
+        self.pyc_add_cycle_param('nozz.Cv', 0.99)
+
+        for pt, MN, alt, Fn in (('OD0', 0.000001, 0.0, 11000.0), ('OD1', 0.2, 5000., 8000.0)):
+            self.pyc_add_pnt(pt, TabTurbojet(design=False))
+            self.set_input_defaults(pt + '.fc.MN', val=MN)
+            self.set_input_defaults(pt + '.fc.alt', alt, units='ft')
+            self.set_input_defaults(pt + '.balance.Fn_target', Fn, units='lbf')
+
+        self.pyc_use_default_des_od_conns()
+        self.pyc_connect_des_od('nozz.Throat:stat:area', 'balance.rhs:W')
+
+        super().setup()
+
+
+class TabCycleTestCase(unittest.TestCase):
+
+    def test_turbojet(self):
+        # the off-design inlet statics are solved for the flow area, which has a subsonic and a
+        # supersonic root: the OD1 solve is sensitive enough to round-off in the tabular thermo to
+        # end up on the wrong one
+        prob = om.Problem(reports=False)
+        prob.model = MPTabTurbojet()
+        prob.setup(check=False)
+        prob.set_solver_print(level=-1)
+
+        prob.set_val('DESIGN.fc.alt', 0, units='ft')
+        prob.set_val('DESIGN.fc.MN', 0.000001)
+        prob.set_val('DESIGN.balance.Fn_target', 11800.0, units='lbf')
+        prob.set_val('DESIGN.balance.T4_target', 2370.0, units='degR')
+        prob.set_val('DESIGN.comp.PR', 13.5)
+        prob.set_val('DESIGN.comp.eff', 0.83)
+        prob.set_val('DESIGN.turb.eff', 0.86)
+
+        prob['DESIGN.balance.FAR'] = 0.0175506829934
+        prob['DESIGN.balance.W'] = 168.453135137
+        prob['DESIGN.balance.turb_PR'] = 4.46138725662
+        prob['DESIGN.fc.balance.Pt'] = 14.6955113159
+        prob['DESIGN.fc.balance.Tt'] = 518.665288153
+
+        for pt in ('OD0', 'OD1'):
+            prob[pt + '.balance.W'] = 166.073
+            prob[pt + '.balance.FAR'] = 0.01680
+            prob[pt + '.balance.Nmech'] = 8197.38
+            prob[pt + '.fc.balance.Pt'] = 15.703
+            prob[pt + '.fc.balance.Tt'] = 558.31
+            prob[pt + '.turb.PR'] = 4.6690
+
+        prob.run_model()
+
+        tol = 1e-4
+        assert_near_equal(prob['DESIGN.inlet.Fl_O:stat:W'], 149.7745, tol)
+        assert_near_equal(prob['DESIGN.perf.TSFC'], 0.776180, tol)
+        assert_near_equal(prob['OD0.inlet.Fl_O:stat:W'], 143.9599, tol)
+        assert_near_equal(prob['OD0.perf.TSFC'], 0.771595, tol)
+        assert_near_equal(prob['OD1.inlet.Fl_O:stat:W'], 116.9810, tol)
+        assert_near_equal(prob['OD1.perf.TSFC'], 0.846465, tol)
+        assert_near_equal(prob['OD1.inlet.Fl_O:stat:P'], 10.28291, tol)
+        assert_near_equal(prob['OD1.inlet.Fl_O:stat:MN'], 0.525574, tol)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -5,8 +5,9 @@ import numpy as np
 import openmdao.api as om
 from openmdao.utils.assert_utils import assert_near_equal
 
-from pycycle.constants import AIR_JETA_TAB_SPEC, TAB_AIR_FUEL_COMPOSITION
-from pycycle.thermo.tabular.tabular_thermo import SetTotalTP
+from pycycle.constants import AIR_JETA_TAB_SPEC, TAB_AIR_FUEL_COMPOSITION, TAB_WET_AIR_FUEL_COMPOSITION
+from pycycle.thermo.tabular.generate import generate_table
+from pycycle.thermo.tabular.tabular_thermo import SetTotalTP, TabularInverse, TabularLookup, TAB_PROPERTIES
 
 class TabThermoUnitTest(unittest.TestCase): 
 
@@ -34,6 +35,154 @@ class TabThermoUnitTest(unittest.TestCase):
         assert_near_equal(p.get_val('R'),  286.9948147750743, tolerance=TOL)
 
 
+class TabularLookupTestCase(unittest.TestCase): 
+
+    def test_lookup(self): 
+        spec = AIR_JETA_TAB_SPEC
+
+        p = om.Problem(reports=False)
+        p.model.add_subsystem('lookup', TabularLookup(spec=spec, composition=TAB_AIR_FUEL_COMPOSITION))
+        interp = p.model.add_subsystem('interp', om.MetaModelStructuredComp(method='slinear', extrapolate=True))
+        interp.add_input('FAR', 0.0, training_data=spec['FAR'])
+        interp.add_input('P', 101325.0, units='Pa', training_data=spec['P'])
+        interp.add_input('T', 273.0, units='degK', training_data=spec['T'])
+        for name, units, val in TAB_PROPERTIES: 
+            interp.add_output(name, val, units=units, training_data=spec[name])
+        p.setup(force_alloc_complex=True)
+
+        # inside the table, on a breakpoint and extrapolated beyond each edge
+        points = [(0.023, 2.5e5, 1234.), (spec['FAR'][3], spec['P'][7], spec['T'][5]), 
+                  (-0.01, 0.5, 120.), (0.06, 2e7, 2700.)]
+        for FAR, P, T in points: 
+            p['lookup.composition'] = FAR
+            p['interp.FAR'] = FAR
+            for name, val in (('P', P), ('T', T)): 
+                p[f'lookup.{name}'] = val
+                p[f'interp.{name}'] = val
+            p.run_model()
+
+            for name, _, _ in TAB_PROPERTIES: 
+                assert_near_equal(p[f'lookup.{name}'], p[f'interp.{name}'], tolerance=1e-12)
+
+            if T == spec['T'][5]: 
+                # the slopes are one sided on a breakpoint
+                continue
+
+            J_lookup = p.compute_totals(['lookup.h', 'lookup.rho'], ['lookup.composition', 'lookup.P', 'lookup.T'])
+            J_interp = p.compute_totals(['interp.h', 'interp.rho'], ['interp.FAR', 'interp.P', 'interp.T'])
+            for (of, wrt), (of_i, wrt_i) in zip(J_lookup, J_interp): 
+                assert_near_equal(J_lookup[of, wrt], J_interp[of_i, wrt_i], tolerance=1e-6)
+
+        p['lookup.composition'] = 0.023
+        p['lookup.P'] = 2.5e5
+        p['lookup.T'] = 1234.
+        p.run_model()
+        data = p.check_partials(includes=['lookup'], method='cs', out_stream=None)
+        for comp, partials in data.items(): 
+            for key, vals in partials.items(): 
+                assert_near_equal(vals['rel error'].forward, 0., tolerance=1e-8)
+
+    def test_lookup_wet(self): 
+        # two composition axes, in the sorted order of their names
+        spec = generate_table(T=np.array([500., 1000., 1500.]), P=np.array([1e5, 1e6]), 
+                              FAR=np.array([0., 0.02, 0.04]), mixes={'WAR': ('Water', np.array([0., 0.03]))})
+
+        p = om.Problem(reports=False)
+        p.model.add_subsystem('lookup', TabularLookup(spec=spec, composition=TAB_WET_AIR_FUEL_COMPOSITION))
+        interp = p.model.add_subsystem('interp', om.MetaModelStructuredComp(method='slinear', extrapolate=True))
+        for name in ('FAR', 'WAR'): 
+            interp.add_input(name, 0.0, training_data=spec[name])
+        interp.add_input('P', 101325.0, units='Pa', training_data=spec['P'])
+        interp.add_input('T', 273.0, units='degK', training_data=spec['T'])
+        for name, units, val in TAB_PROPERTIES: 
+            interp.add_output(name, val, units=units, training_data=spec[name])
+        p.setup(force_alloc_complex=True)
+
+        p['lookup.composition'] = [0.031, 0.012]
+        p['interp.FAR'] = 0.031
+        p['interp.WAR'] = 0.012
+        for name, val in (('P', 4e5), ('T', 1234.)): 
+            p[f'lookup.{name}'] = val
+            p[f'interp.{name}'] = val
+        p.run_model()
+
+        for name, _, _ in TAB_PROPERTIES: 
+            assert_near_equal(p[f'lookup.{name}'], p[f'interp.{name}'], tolerance=1e-12)
+
+        J_lookup = p.compute_totals(['lookup.R'], ['lookup.composition'])
+        J_interp = p.compute_totals(['interp.R'], ['interp.FAR', 'interp.WAR'])
+        assert_near_equal(J_lookup['lookup.R', 'lookup.composition'].ravel(), 
+                          np.array([J_interp['interp.R', 'interp.FAR'][0, 0], J_interp['interp.R', 'interp.WAR'][0, 0]]), 
+                          tolerance=1e-10)
+
+    def test_set_total_tp(self): 
+        # the default interpolation uses the lookup, other methods a MetaModelStructuredComp
+        for method, comp_type in (('slinear', TabularLookup), ('lagrange2', om.MetaModelStructuredComp)): 
+            p = om.Problem(reports=False)
+            p.model = SetTotalTP(spec=AIR_JETA_TAB_SPEC, composition=TAB_AIR_FUEL_COMPOSITION, interp_method=method)
+            p.setup()
+            self.assertIsInstance(p.model.tab, comp_type)
+
+            p['composition'] = 0.02
+            p['P'] = 101325*3
+            p['T'] = 1000
+            p.run_model()
+            assert_near_equal(p.get_val('R'), 287.0, tolerance=1e-2)
+
+
+class TabularInverseTestCase(unittest.TestCase): 
+
+    def test_inverse(self): 
+        spec = AIR_JETA_TAB_SPEC
+
+        p = om.Problem(reports=False)
+        p.model.add_subsystem('lookup', TabularLookup(spec=spec, composition=TAB_AIR_FUEL_COMPOSITION), 
+                              promotes_inputs=['composition', 'P'])
+        for prop in ('h', 'S'): 
+            p.model.add_subsystem(f'inv_{prop}', TabularInverse(prop=prop, spec=spec, composition=TAB_AIR_FUEL_COMPOSITION), 
+                                  promotes_inputs=['composition', 'P'])
+            p.model.connect(f'lookup.{prop}', f'inv_{prop}.{prop}')
+        p.setup(force_alloc_complex=True)
+
+        # the exact inverse of the lookup, inside the table, on a breakpoint and extrapolated
+        points = [(0.023, 2.5e5, 1234.), (spec['FAR'][3], spec['P'][7], spec['T'][5]), 
+                  (0., 101325., 300.), (0.055, 1.5e6, 2600.)]
+        for FAR, P, T in points: 
+            p['composition'] = FAR
+            p['P'] = P
+            p['lookup.T'] = T
+            p.run_model()
+
+            assert_near_equal(p['inv_h.T'], T, tolerance=1e-12)
+            assert_near_equal(p['inv_S.T'], T, tolerance=1e-12)
+
+        p['composition'] = 0.023
+        p['P'] = 2.5e5
+        p['lookup.T'] = 1234.
+        p.run_model()
+        data = p.check_partials(includes=['inv_h', 'inv_S'], method='cs', out_stream=None)
+        for comp, partials in data.items(): 
+            for key, vals in partials.items(): 
+                assert_near_equal(vals['rel error'].forward, 0., tolerance=1e-8)
+
+    def test_low_entropy(self): 
+        # an entropy below the table, as given by a very low static pressure
+        p = om.Problem(reports=False)
+        p.model.add_subsystem('inv', TabularInverse(prop='S', spec=AIR_JETA_TAB_SPEC, composition=TAB_AIR_FUEL_COMPOSITION))
+        p.setup(force_alloc_complex=True)
+        p['inv.composition'] = 0.013
+        p['inv.P'] = 3e4
+        p['inv.S'] = 5000.
+        p.run_model()
+
+        self.assertGreater(p['inv.T'][0], 0.)
+        self.assertLess(p['inv.T'][0], AIR_JETA_TAB_SPEC['T'][0])
+        data = p.check_partials(method='cs', out_stream=None)
+        for comp, partials in data.items(): 
+            for key, vals in partials.items(): 
+                assert_near_equal(vals['rel error'].forward, 0., tolerance=1e-8)
+
+
 if __name__ == "__main__": 
 
     unittest.main()
\ No newline at end of file
@@ -14,7 +14,7 @@ class ThermoAddTestCase(unittest.TestCase):
     def test_mix_1fuel(self): 
 
         p = om.Problem()
-        p.model = ThermoAdd(mix_mode='reactant', mix_composition='FAR', mix_names='fuel')
+        p.model.add_subsystem('thermo_add', ThermoAdd(mix_mode='reactant', mix_composition='FAR', mix_names='fuel'), promotes=['*'])
 
         p.setup(force_alloc_complex=True)
 
@@ -45,7 +45,7 @@ class ThermoAddTestCase(unittest.TestCase):
     def test_mix_2fuel(self): 
 
         p = om.Problem()
-        p.model = ThermoAdd(mix_mode='reactant', mix_composition='FAR', mix_names=['fuel1', 'fuel2'])
+        p.model.add_subsystem('thermo_add', ThermoAdd(mix_mode='reactant', mix_composition='FAR', mix_names=['fuel1', 'fuel2']), promotes=['*'])
 
         p.setup(force_alloc_complex=True)
 
@@ -77,7 +77,7 @@ class ThermoAddTestCase(unittest.TestCase):
     def test_mix_1flow(self): 
 
         p = om.Problem()
-        p.model = ThermoAdd(mix_mode='flow', mix_composition='FAR', mix_names='mix')
+        p.model.add_subsystem('thermo_add', ThermoAdd(mix_mode='flow', mix_composition='FAR', mix_names='mix'), promotes=['*'])
 
         p.setup(force_alloc_complex=True)
 
@@ -89,7 +89,6 @@ class ThermoAddTestCase(unittest.TestCase):
         p['mix:composition'] = [0.1]
         p['mix:h'] = 10.
 
-        p.setup(force_alloc_complex=True)
         p.run_model()
 
 
@@ -114,7 +113,7 @@ class ThermoAddTestCase(unittest.TestCase):
     def test_mix_2flow(self): 
 
         p = om.Problem()
-        p.model = ThermoAdd(mix_mode='flow', mix_composition='FAR', mix_names=['mix1', 'mix2'])
+        p.model.add_subsystem('thermo_add', ThermoAdd(mix_mode='flow', mix_composition='FAR', mix_names=['mix1', 'mix2']), promotes=['*'])
 
         p.setup(force_alloc_complex=True)
 
@@ -130,7 +129,6 @@ class ThermoAddTestCase(unittest.TestCase):
         p['mix2:composition'] = 0.1
         p['mix2:h'] = 20.
 
-        p.setup(force_alloc_complex=True)
         p.run_model()
 
 
@@ -159,8 +157,8 @@ class ThermoAddTestCase(unittest.TestCase):
     def test_mix_1flow2compo(self): 
 
         p = om.Problem()
-        p.model = ThermoAdd(mix_mode='flow', inflow_composition={'FAR':0., 'WAR':0.}, 
-                            mix_names='mix1')
+        p.model.add_subsystem('thermo_add', ThermoAdd(mix_mode='flow', inflow_composition={'FAR':0., 'WAR':0.}, 
+                            mix_names='mix1'), promotes=['*'])
 
         p.setup(force_alloc_complex=True)
 
@@ -173,7 +171,6 @@ class ThermoAddTestCase(unittest.TestCase):
         p['mix1:h'] = 2.
 
 
-        p.setup(force_alloc_complex=True)
         p.run_model()
 
         tol = 1e-6
@@ -186,8 +183,8 @@ class ThermoAddTestCase(unittest.TestCase):
     def test_mix_1fuel2compo(self): 
 
         p = om.Problem()
-        p.model = ThermoAdd(mix_mode='reactant', inflow_composition={'FAR':0., 'WAR':0.}, 
-                            mix_composition='FAR', mix_names='fuel1')
+        p.model.add_subsystem('thermo_add', ThermoAdd(mix_mode='reactant', inflow_composition={'FAR':0., 'WAR':0.}, 
+                            mix_composition='FAR', mix_names='fuel1'), promotes=['*'])
 
         p.setup(force_alloc_complex=True)
 
@@ -198,7 +195,6 @@ class ThermoAddTestCase(unittest.TestCase):
         p['fuel1:ratio'] = .01
         p['fuel1:h'] = 2.
 
-        p.setup(force_alloc_complex=True)
         p.run_model()
 
         W_air_in = p['Fl_I:stat:W']/(1+np.sum(p['Fl_I:tot:composition']))
@@ -221,8 +217,8 @@ class ThermoAddTestCase(unittest.TestCase):
     def test_mix_1water2compo(self): 
 
         p = om.Problem()
-        p.model = ThermoAdd(mix_mode='reactant', inflow_composition={'FAR':0., 'WAR':0.}, 
-                            mix_composition='WAR', mix_names='water1')
+        p.model.add_subsystem('thermo_add', ThermoAdd(mix_mode='reactant', inflow_composition={'FAR':0., 'WAR':0.}, 
+                            mix_composition='WAR', mix_names='water1'), promotes=['*'])
 
         p.setup(force_alloc_complex=True)
 
@@ -233,7 +229,6 @@ class ThermoAddTestCase(unittest.TestCase):
         p['water1:ratio'] = .01
         p['water1:h'] = 2.
 
-        p.setup(force_alloc_complex=True)
         p.run_model()
 
         W_air_in = p['Fl_I:stat:W']/(1+np.sum(p['Fl_I:tot:composition']))
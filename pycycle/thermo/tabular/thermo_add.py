@@ -2,7 +2,7 @@ import numpy as np
 
 import openmdao.api as om
 
-from pycycle.constants import AIR_JETA_TAB_SPEC, TAB_AIR_FUEL_COMPOSITION
+from pycycle.constants import TAB_AIR_FUEL_COMPOSITION
 
 class ThermoAdd(om.ExplicitComponent):
     """
@@ -16,7 +16,7 @@ class ThermoAdd(om.ExplicitComponent):
     """
 
     def initialize(self):
-        self.options.declare('spec', default=AIR_JETA_TAB_SPEC, recordable=False)
+        self.options.declare('spec', default=None, recordable=False)
         self.options.declare('inflow_composition', default=None, 
                              desc='composition present in the inflow')
 
@@ -43,6 +43,9 @@ class ThermoAdd(om.ExplicitComponent):
             reactant = self.options['mix_composition']
             self.idx_compo = self.sorted_compo.index(reactant)
 
+        # mixing only changes the ratios, the mixed flow has the same composition variables
+        return inflow_composition
+
     def setup(self):
 
         spec = self.options['spec']
@@ -57,10 +60,11 @@ class ThermoAdd(om.ExplicitComponent):
         if inflow_composition is None: 
             inflow_composition = TAB_AIR_FUEL_COMPOSITION
 
-        inflow_composition_vec = list(inflow_composition.values())
-
         self.output_port_data()
 
+        # in the (sorted) order of the composition vector of the tabular thermo
+        inflow_composition_vec = [inflow_composition[k] for k in self.sorted_compo]
+
         # inputs
         self.add_input('Fl_I:stat:W', val=0.0, desc='weight flow', units='lbm/s')
         self.add_input('Fl_I:tot:h', val=0.0, desc='total enthalpy', units='Btu/lbm')
@@ -0,0 +1,56 @@
+import io
+import unittest
+
+import numpy as np
+
+from pycycle.thermo.cea import species_data
+from pycycle.thermo.microbench import DATASETS, composition_vectors, state_grid, time_properties, time_chem_eq, \
+    time_tabular, report
+
+
+class MicrobenchTestCase(unittest.TestCase):
+
+    def test_compositions(self):
+        for dataset, (thermo_data, elements, base, addition, _, ratios) in DATASETS.items():
+            thermo = species_data.get_properties(thermo_data, elements)
+            b = composition_vectors(thermo, base, addition, ratios)
+            self.assertEqual(b.shape, (len(ratios), thermo.num_element))
+            # normalized to 1 g of mixture
+            np.testing.assert_allclose(b.dot(thermo.element_wt), 1., rtol=1e-12)
+
+        T, P, b = state_grid(np.array([300., 1000.]), np.array([1., 10., 20.]), np.eye(2))
+        self.assertEqual(T.shape, (12,))
+        self.assertEqual(b.shape, (12, 2))
+
+    def test_kernels(self):
+        T = np.array([400., 1500.])
+        P = np.array([1., 20.])
+
+        results = time_properties('janaf', T, repeat=2)
+        self.assertEqual([r['kernel'] for r in results], ['H0/S0/Cp0 (evaluate_all)', 'H0', 'S0', 'Cp0'])
+
+        for dataset in DATASETS:
+            for vectorize in (True, False):
+                results = time_chem_eq(dataset, T, P, vectorize=vectorize, repeat=1)
+                solve = results[0]
+                self.assertEqual(solve['kernel'], 'ChemEq (solve)')
+                self.assertEqual(solve['num_states'], 12)
+                self.assertGreater(solve['newton_iters'], 0)
+                kernels = {r['kernel'] for r in results}
+                for kernel in ('ChemEq.apply_nonlinear', 'ChemEq.linearize', 'PropsRHS.compute', 'PropsCalcs.compute'):
+                    self.assertIn(kernel, kernels)
+                for r in results:
+                    self.assertGreater(r['states_per_sec'], 0.)
+
+        results = time_tabular(T, P, FAR=(0., 0.02), repeat=1)
+        self.assertEqual(results[0]['num_states'], 8)
+        self.assertEqual({r['kernel'] for r in results[1:]}, {'tabular TabularLookup.compute',
+                                                              'tabular TabularLookup.compute_partials'})
+
+        stream = io.StringIO()
+        report(results, out_stream=stream)
+        self.assertIn('TabularLookup', stream.getvalue())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -181,6 +181,32 @@ class TestSetTotalTabular(unittest.TestCase):
         check(3000., 30.)
         check(1500., 80.)
 
+    def test_inverse_lookup(self): 
+        # without a balance on T there is nothing left to converge
+        for mode, prop in (('total_hP', 'h'), ('total_SP', 'S'), ('static_Ps', 'S')): 
+            p = om.Problem(reports=False)
+            thermo = p.model.add_subsystem('thermo', Thermo(mode=mode, 
+                                                            method='TABULAR', 
+                                                            thermo_kwargs={'composition': constants.TAB_AIR_FUEL_COMPOSITION, 
+                                                                           'spec': constants.AIR_JETA_TAB_SPEC }))
+            p.setup()
+
+            self.assertEqual(thermo.inverse.options['prop'], prop)
+            self.assertFalse(hasattr(thermo, 'balance'))
+            self.assertIsInstance(thermo.nonlinear_solver, om.NonlinearRunOnce)
+
+        # other interpolation methods keep the balance
+        p = om.Problem(reports=False)
+        thermo = p.model.add_subsystem('thermo', Thermo(mode='total_hP', 
+                                                        method='TABULAR', 
+                                                        thermo_kwargs={'composition': constants.TAB_AIR_FUEL_COMPOSITION, 
+                                                                       'spec': constants.AIR_JETA_TAB_SPEC, 
+                                                                       'interp_method': 'lagrange2'}))
+        p.setup()
+        self.assertTrue(hasattr(thermo, 'balance'))
+        self.assertIsInstance(thermo.nonlinear_solver, om.NewtonSolver)
+
+
 
 class TestStaticTabular(unittest.TestCase): 
 
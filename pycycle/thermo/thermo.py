@@ -6,6 +6,7 @@ from pycycle.thermo.unit_comps import EngUnitStaticProps, EngUnitProps
 
 from pycycle.thermo.cea import chem_eq as cea_thermo
 from pycycle.thermo.cea import thermo_add as cea_thermo_add
+from pycycle.thermo.cea import frozen as frozen_thermo
 from pycycle.constants import ALLOWED_THERMOS
 
 from pycycle.thermo.tabular import tabular_thermo as tab_thermo
@@ -27,6 +28,7 @@ class Thermo(om.Group):
         # thermo_kwargs should be a dictionary containing all the information needed to setup
         # the thermo calculations:
         #       - For CEA this would be the elements and thermo_data
+        #       - For Frozen this is the same as CEA, plus optional T_ref, P_ref for the reference equilibrium
         #       - For Ideal this would be gamma, MW, h_base, T_base, Cp, S_data
         #       - For Tabular this would be the thermo data table
         # The user should define one or more of these dictionaries at the top of their model
@@ -47,6 +49,10 @@ class Thermo(om.Group):
         if method == 'CEA':
             base_thermo = cea_thermo.SetTotalTP(**thermo_kwargs)
 
+        # composition is fixed at a reference equilibrium, so there is no ChemEq to converge
+        elif method == 'FROZEN':
+            base_thermo = frozen_thermo.SetTotalTP(**thermo_kwargs)
+
         # elif method == 'Ideal':
         #     # base_thermo = IdealThermo(thermo_data=xx)
         #     pass
@@ -72,13 +78,23 @@ class Thermo(om.Group):
             in_vars += (('P', 'Ps'),)
             out_vars += ('h', )
         
+        # the linearly interpolated tables are inverted directly, without a balance on T
+        inverse_lookup = (method == 'TABULAR' and mode != 'total_TP' and 
+                          thermo_kwargs.get('interp_method', 'slinear') == 'slinear')
+        if inverse_lookup: 
+            prop = 'h' if 'hP' in mode else 'S'
+            self.add_subsystem('inverse', tab_thermo.TabularInverse(prop=prop, spec=thermo_kwargs.get('spec'), 
+                                                                    composition=thermo_kwargs.get('composition')), 
+                               promotes_inputs=('composition', in_vars[-1], prop), 
+                               promotes_outputs=('T',))
+
         self.add_subsystem('base_thermo', base_thermo, 
                            promotes_inputs=in_vars, 
                            promotes_outputs=out_vars)
            
         # Add implicit components/balances to depending on the mode and connect them to
         # the properties calculation components
-        if mode != "total_TP": 
+        if mode != "total_TP" and not inverse_lookup: 
             bal = self.add_subsystem('balance', om.BalanceComp(), promotes_outputs=['T'])
 
             # TODO: need to add some kind of T/P ranges to the tabular thermo somehow
@@ -98,9 +114,10 @@ class Thermo(om.Group):
                 self.promotes('balance', inputs=[('rhs:T','h')])
                 self.connect('base_thermo.h', 'balance.lhs:T')
 
-            ##############################################
-            #extra stuff for statics beyond the S balance
-            ##############################################
+        ##############################################
+        #extra stuff for statics beyond the S balance
+        ##############################################
+        if 'static' in mode: 
             if 'Ps' in mode: 
                 self.add_subsystem('ps_calc', PsCalc(),
                                    promotes_inputs=['gamma', 'R', 'ht', 'W', 'rho',
@@ -160,25 +177,30 @@ class Thermo(om.Group):
                 self.set_input_defaults('S', 1., units='cal/(g*degK)')
 
 
-        newton = self.nonlinear_solver = om.NewtonSolver()
-        newton.options['maxiter'] = 100
-        # newton.options['max_sub_solves'] = 100
-        newton.options['atol'] = 1e-10
-        newton.options['rtol'] = 1e-10
-        newton.options['stall_limit'] = 4
-        newton.options['stall_tol'] = 1e-10
-        newton.options['solve_subsystems'] = True
+        # the tabular thermo without a balance is explicit (unless the static MN or area is set), 
+        # so the default solvers just run it once
+        explicit = (method == 'TABULAR' and (mode == 'total_TP' or inverse_lookup) and 
+                    mode not in ('static_MN', 'static_A'))
+        if not explicit: 
+            newton = self.nonlinear_solver = om.NewtonSolver()
+            newton.options['maxiter'] = 100
+            # newton.options['max_sub_solves'] = 100
+            newton.options['atol'] = 1e-10
+            newton.options['rtol'] = 1e-10
+            newton.options['stall_limit'] = 4
+            newton.options['stall_tol'] = 1e-10
+            newton.options['solve_subsystems'] = True
 
-        newton.options['iprint'] = -1
+            newton.options['iprint'] = -1
 
-        self.options['assembled_jac_type'] = 'dense'
-        self.linear_solver = om.DirectSolver()
+            self.options['assembled_jac_type'] = 'dense'
+            self.linear_solver = om.DirectSolver()
 
-        # ln_bt = newton.linesearch = om.BoundsEnforceLS()
-        ln_bt = newton.linesearch = om.ArmijoGoldsteinLS()
-        ln_bt.options['maxiter'] = 2
-        # ln_bt.options['rho'] = 0.5
-        ln_bt.options['iprint'] = 2
+            # ln_bt = newton.linesearch = om.BoundsEnforceLS()
+            ln_bt = newton.linesearch = om.ArmijoGoldsteinLS()
+            ln_bt.options['maxiter'] = 2
+            # ln_bt.options['rho'] = 0.5
+            ln_bt.options['iprint'] = 2
 
     def configure(self): 
         composition = self.base_thermo.composition
@@ -213,10 +235,13 @@ class ThermoAdd(om.Group):
         thermo_kwargs = self.options['thermo_kwargs']
 
         if self.thermo_adder is None: # just in case output_port_data is not called
-            if method == 'CEA': 
+            # frozen thermo uses the same elemental compositions as CEA
+            if method in ('CEA', 'FROZEN'): 
+                # the reference equilibrium of the frozen thermo plays no part in the mixing
+                adder_kwargs = {k: v for k, v in thermo_kwargs.items() if k not in ('T_ref', 'P_ref')}
                 self.thermo_adder = cea_thermo_add.ThermoAdd(mix_mode=mix_mode, 
                                                              mix_names=mix_names, 
-                                                             **thermo_kwargs)
+                                                             **adder_kwargs)
 
             if method == 'TABULAR': 
                 self.thermo_adder = tab_thermo_add.ThermoAdd(mix_mode=mix_mode, 
@@ -235,10 +260,13 @@ class ThermoAdd(om.Group):
         thermo_kwargs = self.options['thermo_kwargs']
 
         if self.thermo_adder is None: # they might call this twice, so just in case we check to make sure it hasn't been set already
-            if method == 'CEA': 
+            # frozen thermo uses the same elemental compositions as CEA
+            if method in ('CEA', 'FROZEN'): 
+                # the reference equilibrium of the frozen thermo plays no part in the mixing
+                adder_kwargs = {k: v for k, v in thermo_kwargs.items() if k not in ('T_ref', 'P_ref')}
                 self.thermo_adder = cea_thermo_add.ThermoAdd(mix_mode=mix_mode, 
                                                              mix_names=mix_names, 
-                                                             **thermo_kwargs)
+                                                             **adder_kwargs)
 
             if method == 'TABULAR': 
                 self.thermo_adder = tab_thermo_add.ThermoAdd(mix_mode=mix_mode, 